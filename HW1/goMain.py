@@ -1,10 +1,83 @@
+import os
 import sys
-from irrFind import irrFind
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from irrFind import irrFind, irrFindBatch, irrFindAll, checkRateRange
+
+
+def _solveChunk(lines):
+    """解析一個 chunk 的輸入行成 NumPy 陣列，再交給 irrFindBatch 一次求解。"""
+    rows = [np.array(line.split(), dtype=np.int64) for line in lines]
+    lengths = np.array([len(r) - 2 for r in rows])
+    cashFlows = np.zeros((len(rows), lengths.max()))
+    for i, r in enumerate(rows):
+        cashFlows[i, :lengths[i]] = r[:-2]
+    cashFlowPeriod = np.array([r[-2] for r in rows])
+    compoundPeriod = np.array([r[-1] for r in rows])
+    irr = irrFindBatch(cashFlows, cashFlowPeriod, compoundPeriod, lengths=lengths)
+    return [f'{round(float(x) * 100, 4):.4f}' for x in irr]
+
+
+def _readChunks(stream, chunkLines):
+    chunk = []
+    for line in stream:
+        if line.strip():
+            chunk.append(line)
+        if len(chunk) >= chunkLines:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def runStream(stream, out, chunkLines=4096, workers=None):
+    """
+    串流模式：逐 chunk 讀 stdin，丟給 process pool 求解，依輸入順序輸出。
+    同時在途的 chunk 數上限為 2 * workers，因此記憶體用量有上界。
+    """
+    workers = workers or os.cpu_count() or 1
+    maxInFlight = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in _readChunks(stream, chunkLines):
+            pending.append(pool.submit(_solveChunk, chunk))
+            if len(pending) >= maxInFlight:
+                out.write("\n".join(pending.popleft().result()) + "\n")
+        while pending:
+            out.write("\n".join(pending.popleft().result()) + "\n")
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stream", action="store_true",
+                        help="chunked stdin + multiprocess solver (for very large inputs)")
+    parser.add_argument("--chunk-lines", type=int, default=4096)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--all", action="store_true",
+                        help="report every IRR in [--lo, --hi] plus a convergence status")
+    parser.add_argument("--lo", type=float, default=-0.99)
+    parser.add_argument("--hi", type=float, default=1.0)
+    args = parser.parse_args()
+    if args.all and not args.lo < args.hi:
+        parser.error(f"--lo must be below --hi (got {args.lo} and {args.hi})")
+
+    if args.stream:
+        runStream(sys.stdin, sys.stdout, args.chunk_lines, args.workers)
+        sys.exit(0)
+
     for i, input_line in enumerate(sys.stdin.readlines()):
         input_numbers = [int(x) for x in input_line.strip().split()]
         cashFlowPeriod, compoundPeriod = input_numbers[-2:]
         cashFlowVec = input_numbers[:-2]
+        if args.all:
+            try:
+                checkRateRange(args.lo, args.hi, compoundPeriod)
+            except ValueError as e:
+                parser.error(f"line {i + 1}: {e}")
+            roots, status = irrFindAll(cashFlowVec, cashFlowPeriod, compoundPeriod, args.lo, args.hi)
+            print(" ".join([*(f'{round(r * 100, 4):.4f}' for r in roots), status]))
+            continue
         irr = irrFind(cashFlowVec, cashFlowPeriod, compoundPeriod)
-        print(f'{round(irr * 100, 4):.4f}') # IRR in percentage
\ No newline at end of file
+        print(f'{round(irr * 100, 4):.4f}') # IRR in percentage
@@ -1,23 +1,101 @@
-def irrFind(cashFlowVec, cashFlowPeriod, compoundPeriod):
+from functools import lru_cache
+import numpy as np
+
+
+def _discountPowers(cashFlowPeriod, compoundPeriod, r, n):
+    """
+    回傳 [1, inv, inv^2, ..., inv^(n-1)]，inv 為相鄰兩筆現金流之間的折現因子。
+    （不快取：二分法／割線法的探測利率幾乎不重複，LRU 快取在 input.txt 上只命中 1.8%。）
+    """
+    m = 12.0 / compoundPeriod            # 每年複利次數 m（例如月複利 m=12、季複利 m=4、年複利 m=1）
+    d = float(cashFlowPeriod) / float(compoundPeriod)   # 每兩筆現金流之間跨越的複利期數 d
+    base = 1.0 + r / m                   # 每個「複利期」的名目利率
+    inv = 1.0 / (base ** d)              # 折現一步的因子
+    powers = np.empty(n)
+    powers[0] = 1.0
+    # cumprod 的連乘順序與逐項 factor *= inv 相同
+    np.cumprod(np.full(n - 1, inv), out=powers[1:])
+    return powers
+
+
+def _hornerNpv(cashFlowVec, v):
+    """
+    把 NPV 視為一步折現因子 v 的多項式 P(v) = Σ CF_i * v^i，
+    一次 Horner 迴圈同時算出 P(v)、P'(v)、P''(v)。
+    """
+    p = float(cashFlowVec[-1])
+    dp = 0.0
+    ddp = 0.0
+    for c in reversed(cashFlowVec[:-1]):
+        ddp = ddp * v + dp
+        dp = dp * v + p
+        p = p * v + c
+    return p, dp, 2.0 * ddp
+
+
+def _polishRoot(cashFlowVec, vlo, vhi, plo, v, method, counter, tol=1e-13, max_iter=100):
+    """
+    在 v 空間的夾擊區間 [vlo, vhi]（plo = P(vlo)）內做保護式牛頓／哈雷迭代，
+    步長跨出區間或無法前進時退回二分。回傳 (v, 是否收斂)。
+    """
+    for _ in range(max_iter):
+        counter["iterations"] += 1
+        counter["evaluations"] += 1
+        p, dp, ddp = _hornerNpv(cashFlowVec, v)
+        if p == 0.0 or abs(p) < tol:
+            return v, True
+        # 依 P(v) 的符號收緊夾擊區間
+        if (p < 0.0) == (plo < 0.0):
+            vlo, plo = v, p
+        else:
+            vhi = v
+        step = p / dp if dp != 0.0 else 0.0
+        if method == "halley" and dp != 0.0:
+            denom = 1.0 - 0.5 * step * ddp / dp
+            if denom != 0.0:
+                step = step / denom
+        if step != 0.0 and abs(step) <= 1e-15 * v:
+            return v - step, True           # 步長已低於機器精度，視為收斂
+        vn = v - step
+        # 保護：跨出區間、無法前進時退回二分
+        if step == 0.0 or not (vlo < vn < vhi):
+            vn = 0.5 * (vlo + vhi)
+        if (vhi - vlo) <= 1e-15 * vhi:
+            return vn, True
+        v = vn
+    return v, False
+
+
+def irrFind(cashFlowVec, cashFlowPeriod, compoundPeriod, method="bisect", stats=None):
+    """
+    method : "bisect"（預設，二分法＋割線法）、"newton" 或 "halley"
+             （以 Horner 計算 NPV 與導數，在夾擊區間內做保護式牛頓／哈雷迭代，
+              跨出區間或收斂變慢時退回二分法）
+    stats  : 若傳入 dict，會寫入 {"iterations": ..., "evaluations": ...} 供 benchmark 比較
+    """
+    if method not in ("bisect", "newton", "halley"):
+        raise ValueError(f"unknown method: {method!r}")
+    counter = {"iterations": 0, "evaluations": 0}
+    irr = _irrSolve(cashFlowVec, cashFlowPeriod, compoundPeriod, method, counter)
+    if stats is not None:
+        stats.update(counter)
+    return irr
+
+
+def _irrSolve(cashFlowVec, cashFlowPeriod, compoundPeriod, method, counter):
     tol=1e-13
     max_iter=100
     # 每年複利次數 m（例如月複利 m=12、季複利 m=4、年複利 m=1）
     # 每兩筆現金流之間跨越的複利期數 d
+    m = 12.0 / compoundPeriod
+    d = float(cashFlowPeriod) / float(compoundPeriod)
+    cf = np.asarray(cashFlowVec, dtype=float)
+    n = len(cf)
     def npv(r):
-        m = 12.0 / compoundPeriod
-        d = float(cashFlowPeriod) / float(compoundPeriod)
-        base = 1.0 + r / m               # 每個「複利期」的名目利率
-        step = base ** d                  # 相鄰兩筆現金流間的成長因子
-        inv = 1.0 / step                  # 折現一步的因子
-        factor = 1.0                      # i=0 時折現因子為 1
-        s = 0.0
         # NPV = Σ CF_i / (1 + r/m)^{m * (i * cashFlowPeriod/12)}
-        #     = Σ CF_i * (1/step)^i
-        for i, c in enumerate(cashFlowVec):
-            if i > 0:
-                factor *= inv
-            s += c * factor
-        return s
+        #     = Σ CF_i * (1/step)^i：一次 cumprod 算出折現冪次，再做一次內積
+        counter["evaluations"] += 1
+        return float(np.dot(cf, _discountPowers(cashFlowPeriod, compoundPeriod, r, n)))
 
     a, b = -0.1, 0.1
     fa, fb = npv(a), npv(b)
@@ -27,11 +105,21 @@ def irrFind(cashFlowVec, cashFlowPeriod, compoundPeriod):
     if fb == 0.0:
         return b
 
+    # 有夾擊到根且指定 newton/halley：在 v 空間求多項式的根
+    if fa * fb < 0.0 and method != "bisect":
+        # r 越大 v 越小，所以 r=b 對應區間左端
+        vlo, vhi = (1.0 + b / m) ** (-d), (1.0 + a / m) ** (-d)
+        plo = fb
+        v0 = 1.0 if vlo < 1.0 < vhi else 0.5 * (vlo + vhi)   # 從 r=0 出發
+        v, _ = _polishRoot(cashFlowVec, vlo, vhi, plo, v0, method, counter, tol, max_iter)
+        return m * (v ** (-1.0 / d) - 1.0)
+
     # 若有夾擊到根，優先用二分法（穩）
     if fa * fb < 0.0:
         lo, hi = a, b
         flo, fhi = fa, fb
         for _ in range(max_iter):
+            counter["iterations"] += 1
             mid = 0.5 * (lo + hi)
             fm = npv(mid)
             if abs(fm) < tol or (hi - lo) < tol:
@@ -46,6 +134,7 @@ def irrFind(cashFlowVec, cashFlowPeriod, compoundPeriod):
     x0, x1 = a, b
     f0, f1 = fa, fb
     for _ in range(max_iter):
+        counter["iterations"] += 1
         denom = (f1 - f0)
         if abs(denom) < 1e-18:
             break
@@ -59,4 +148,242 @@ def irrFind(cashFlowVec, cashFlowPeriod, compoundPeriod):
         x0, f0, x1, f1 = x1, f1, x2, f2
 
     # 最後保底：回傳中點（理論上很少走到這裡）
-    return (a + b) * 0.5
\ No newline at end of file
+    return (a + b) * 0.5
+
+
+def _toPadded(cashFlows, lengths=None):
+    """把 ragged list 或「補零 2-D 陣列 + 長度」整理成 (rows, maxLen) float 陣列。"""
+    if isinstance(cashFlows, np.ndarray) and cashFlows.ndim == 2:
+        mat = np.array(cashFlows, dtype=float)
+        if lengths is not None:
+            lengths = np.asarray(lengths, dtype=int)
+            # 長度之後的欄位一律視為 0（補零不影響 NPV）
+            mat[np.arange(mat.shape[1])[None, :] >= lengths[:, None]] = 0.0
+        return mat
+    rows = [np.asarray(c, dtype=float).ravel() for c in cashFlows]
+    maxLen = max((len(c) for c in rows), default=0)
+    mat = np.zeros((len(rows), maxLen))
+    for i, c in enumerate(rows):
+        mat[i, :len(c)] = c
+    return mat
+
+
+def irrFindBatch(cashFlows, cashFlowPeriod, compoundPeriod, lengths=None):
+    """
+    一次求解多筆現金流的 IRR（NumPy 向量化版本的 irrFind）。
+
+    cashFlows      : ragged list（每列一組現金流），或補零的 2-D 陣列搭配 lengths
+    cashFlowPeriod : 純量或每列一個值
+    compoundPeriod : 純量或每列一個值
+    回傳長度為 rows 的 IRR 陣列；每一列的二分法／割線法步驟與 irrFind 相同，
+    已收斂的列會被遮罩掉，不再參與後續迭代。
+    """
+    tol = 1e-13
+    max_iter = 100
+    cf = _toPadded(cashFlows, lengths)
+    rows, cols = cf.shape
+    cfp = np.broadcast_to(np.asarray(cashFlowPeriod, dtype=float), (rows,))
+    cp = np.broadcast_to(np.asarray(compoundPeriod, dtype=float), (rows,))
+    m_all = 12.0 / cp
+    d_all = cfp / cp
+
+    def npv(r, idx):
+        # 與 irrFind.npv 相同的運算順序：factor 逐項連乘、s 逐項累加
+        base = 1.0 + r / m_all[idx]
+        inv = 1.0 / (base ** d_all[idx])
+        c = cf[idx]
+        factor = np.ones(len(idx))
+        s = c[:, 0] * factor if cols else np.zeros(len(idx))
+        for i in range(1, cols):
+            factor = factor * inv
+            s = s + c[:, i] * factor
+        return s
+
+    allIdx = np.arange(rows)
+    a, b = -0.1, 0.1
+    fa = npv(np.full(rows, a), allIdx)
+    fb = npv(np.full(rows, b), allIdx)
+
+    result = np.full(rows, 0.5 * (a + b))   # 最後保底：中點
+    pending = np.ones(rows, dtype=bool)
+    hitA = fa == 0.0
+    result[hitA] = a
+    pending &= ~hitA
+    hitB = pending & (fb == 0.0)
+    result[hitB] = b
+    pending &= ~hitB
+
+    # 有夾擊到根的列：向量化二分法
+    idx = np.flatnonzero(pending & (fa * fb < 0.0))
+    lo, hi = np.full(len(idx), a), np.full(len(idx), b)
+    flo = fa[idx]
+    for _ in range(max_iter):
+        if len(idx) == 0:
+            break
+        mid = 0.5 * (lo + hi)
+        fm = npv(mid, idx)
+        done = (np.abs(fm) < tol) | ((hi - lo) < tol)
+        result[idx[done]] = mid[done]
+        left = flo * fm <= 0.0
+        hi = np.where(left, mid, hi)
+        lo = np.where(left, lo, mid)
+        flo = np.where(left, flo, fm)
+        keep = ~done
+        idx, lo, hi, flo = idx[keep], lo[keep], hi[keep], flo[keep]
+    result[idx] = 0.5 * (lo + hi)   # 用完 max_iter 仍未收斂的列
+
+    # 其餘列：向量化「區間內割線法」
+    idx = np.flatnonzero(pending & ~(fa * fb < 0.0))
+    x0, x1 = np.full(len(idx), a), np.full(len(idx), b)
+    f0, f1 = fa[idx], fb[idx]
+    for _ in range(max_iter):
+        if len(idx) == 0:
+            break
+        denom = f1 - f0
+        ok = np.abs(denom) >= 1e-18     # 分母過小的列直接放棄，保留中點
+        idx, x0, x1, f0, f1, denom = idx[ok], x0[ok], x1[ok], f0[ok], f1[ok], denom[ok]
+        if len(idx) == 0:
+            break
+        x2 = np.clip(x1 - f1 * (x1 - x0) / denom, a, b)
+        f2 = npv(x2, idx)
+        done = np.abs(f2) < tol
+        result[idx[done]] = x2[done]
+        keep = ~done
+        idx, x0, f0, x1, f1 = idx[keep], x1[keep], f1[keep], x2[keep], f2[keep]
+
+    return result
+
+
+def descartesBound(cashFlowVec):
+    """
+    Descartes 符號法則：P(v) = Σ CF_i v^i 的正根個數 ≤ 係數的變號次數
+    （v > 0 對應所有 r > -m 的利率，所以這也是 IRR 個數的上界）。
+    """
+    signs = np.sign(np.asarray(cashFlowVec, dtype=float))
+    signs = signs[signs != 0]
+    return int(np.count_nonzero(signs[1:] != signs[:-1]))
+
+
+@lru_cache(maxsize=64)
+def _gridPowers(n, cashFlowPeriod, compoundPeriod, lo, hi, gridSize):
+    """
+    利率網格與縮放後的折現冪次矩陣（g：網格點，i：期數）：
+        v_g <= 1：V[g, i] = v_g^i
+        v_g >  1：V[g, i] = (1/v_g)^(n-1-i)，即 P(v) / v^(n-1)，與 P(v) 同號
+    負利率區（v > 1）的 v^i 在長現金流下會溢位成 inf、NPV 變成 NaN；縮放後每項都 <= 1，
+    網格上的 NPV 符號（找變號區間只需要符號）在整個 [lo, hi] 都有定義。
+    以 (長度, 週期, 區間, 網格數) 為 key 快取，同長度同週期的列可共用。
+    """
+    m = 12.0 / compoundPeriod
+    d = float(cashFlowPeriod) / float(compoundPeriod)
+    rates = np.linspace(lo, hi, gridSize)
+    v = (1.0 + rates / m) ** (-d)
+    big = v > 1.0
+    u = np.where(big, 1.0 / v, v)
+    powers = np.ones((gridSize, n))
+    if n > 1:
+        powers[:, 1:] = np.cumprod(np.broadcast_to(u[:, None], (gridSize, n - 1)), axis=1)
+        powers[big] = powers[big, ::-1]
+    powers.setflags(write=False)
+    return rates, v, powers
+
+
+def checkRateRange(lo, hi, compoundPeriod):
+    """
+    掃描區間必須滿足 -m < lo < hi（m = 12 / compoundPeriod 為每年複利次數）：
+    r <= -m 時 1 + r/m <= 0，折現因子沒有定義（inf / NaN）。不符合時丟 ValueError。
+    """
+    m = 12.0 / float(compoundPeriod)
+    if not (-m < lo < hi):
+        raise ValueError(f"rate range must satisfy -{m:g} < lo < hi for compoundPeriod={compoundPeriod}, "
+                         f"got lo={lo}, hi={hi}")
+
+
+def _rootsFromGrid(cashFlowVec, cashFlowPeriod, compoundPeriod, rates, v, values, method, counter):
+    """回傳 (roots, converged, complete)；complete 為 False 表示網格上有非有限值、根可能被漏掉。"""
+    m = 12.0 / compoundPeriod
+    d = float(cashFlowPeriod) / float(compoundPeriod)
+    roots, converged = [], True
+    complete = bool(np.all(np.isfinite(values)))
+    for g in np.flatnonzero(values == 0.0):
+        roots.append(float(rates[g]))
+    # 相鄰網格點 NPV 變號 → 夾擊到一個根（v 隨 r 遞減，所以 v[g+1] < v[g]）
+    for g in np.flatnonzero(values[:-1] * values[1:] < 0.0):
+        vlo, vhi = v[g + 1], v[g]
+        if vlo >= 1.0:
+            # v > 1 的區間改在 w = 1/v 上精修反序多項式 Q(w) = Σ CF_{n-1-i} w^i（與 P(v) 同號、不溢位）
+            wlo, whi = 1.0 / vhi, 1.0 / vlo
+            wr, ok = _polishRoot(cashFlowVec[::-1], wlo, whi, values[g], 0.5 * (wlo + whi), method, counter)
+            converged &= ok
+            roots.append(float(m * (wr ** (1.0 / d) - 1.0)))
+            continue
+        vr, ok = _polishRoot(cashFlowVec, vlo, vhi, values[g + 1], 0.5 * (vlo + vhi), method, counter)
+        converged &= ok
+        roots.append(float(m * (vr ** (-1.0 / d) - 1.0)))
+    return sorted(roots), converged, complete
+
+
+def _status(roots, converged, complete=True):
+    if not complete:
+        return "incomplete"
+    if not roots:
+        return "no_root"
+    return "converged" if converged else "max_iter"
+
+
+def irrFindAll(cashFlowVec, cashFlowPeriod, compoundPeriod, lo=-0.99, hi=1.0, gridSize=2001,
+               method="halley", stats=None):
+    """
+    在 [lo, hi] 內找出所有 IRR（現金流多次變號時可能有多個根）。
+
+    先用 Descartes 符號法則判斷根的個數上界（為 0 時直接回傳），
+    再以快取的網格矩陣一次算出整個網格的 NPV，逐一精修每個變號區間。
+    偶數重根（NPV 只碰到 0 不變號）不會被網格掃描偵測到。
+    區間需滿足 -m < lo < hi（m = 12 / compoundPeriod），否則丟 ValueError。
+
+    回傳 (roots, status)，status 為 "converged"、"max_iter"（精修用完迭代次數）、
+    "no_root" 或 "incomplete"（網格上有非有限的 NPV，該處的根無法判斷）。
+    """
+    checkRateRange(lo, hi, compoundPeriod)
+    counter = {"iterations": 0, "evaluations": 0, "descartes": descartesBound(cashFlowVec)}
+    roots, converged, complete = [], True, True
+    if counter["descartes"] > 0:
+        rates, v, powers = _gridPowers(len(cashFlowVec), cashFlowPeriod, compoundPeriod, lo, hi, gridSize)
+        values = powers @ np.asarray(cashFlowVec, dtype=float)
+        counter["evaluations"] += gridSize
+        roots, converged, complete = _rootsFromGrid(cashFlowVec, cashFlowPeriod, compoundPeriod,
+                                                    rates, v, values, method, counter)
+    if stats is not None:
+        stats.update(counter)
+    return roots, _status(roots, converged, complete)
+
+
+def irrFindAllBatch(cashFlows, cashFlowPeriod, compoundPeriod, lo=-0.99, hi=1.0, gridSize=2001,
+                    method="halley", stats=None):
+    """
+    irrFindAll 的批次版本。長度與週期相同的列共用一個網格矩陣，
+    並以一次矩陣乘法算出整組列在網格上的 NPV。回傳 [(roots, status), ...]。
+    stats 若傳入 dict，會寫入所有列合計的 {"iterations": ..., "evaluations": ...}。
+    """
+    rows = [list(c) for c in cashFlows]
+    cfp = np.broadcast_to(np.asarray(cashFlowPeriod), (len(rows),))
+    cp = np.broadcast_to(np.asarray(compoundPeriod), (len(rows),))
+    for q in np.unique(cp):
+        checkRateRange(lo, hi, q.item())
+    groups = {}
+    for i, c in enumerate(rows):
+        if descartesBound(c) > 0:
+            groups.setdefault((len(c), cfp[i].item(), cp[i].item()), []).append(i)
+
+    results = [([], "no_root") for _ in rows]
+    counter = {"iterations": 0, "evaluations": 0}
+    for (n, p, q), idx in groups.items():
+        rates, v, powers = _gridPowers(n, p, q, lo, hi, gridSize)
+        values = powers @ np.array([rows[i] for i in idx], dtype=float).T
+        counter["evaluations"] += gridSize * len(idx)
+        for j, i in enumerate(idx):
+            roots, converged, complete = _rootsFromGrid(rows[i], p, q, rates, v, values[:, j], method, counter)
+            results[i] = (roots, _status(roots, converged, complete))
+    if stats is not None:
+        stats.update(counter)
+    return results
@@ -1,8 +1,14 @@
 # auto_tune_atr_ema_macd.py
 # Grid-search ATR/EMA/MACD params on <csv>, write best back, then run rrEstimate.py
+# The grid runs in-process through sweep.py (CSV read once, process pool, explicit params);
+# myStrategy.py is only written once, with the final best combo (atomically).
+# Progress is checkpointed to <csv dir>/sweep_atr_ema_macd.ckpt.json: after an interruption, rerunning
+# the same command resumes the grid where it stopped (--fresh starts over). Throughput, ETA
+# and per-worker utilization are printed while it runs.
 import sys, re, json, subprocess
 from pathlib import Path
-import pandas as pd
+from price_store import load_columns
+from sweep import grid, run_sweep, write_text_atomic, format_indicator_stats, format_prune_stats
 
 EMA_TREND_GRID   = [160,180,200,220]
 ATR_WIN_GRID     = [10,14,20]
@@ -18,6 +24,15 @@ MINHOLD_GRID     = [0,1,2]
 
 def valid(f,s): return (s >= f + 6)
 
+SPACE = {
+    "EMA_TREND": EMA_TREND_GRID, "ATR_WIN": ATR_WIN_GRID,
+    "ATR_SL_MULT": ATR_SL_MULT_GRID, "ATR_TR_MULT": ATR_TR_MULT_GRID, "ATR_MIN": ATR_MIN_GRID,
+    "MACD_FAST": MACD_FAST_GRID, "MACD_SLOW": MACD_SLOW_GRID, "MACD_SIGNAL": MACD_SIGNAL_GRID,
+    "AE_CONFIRM_UP": CONF_UP_GRID, "AE_COOLDOWN": COOLDOWN_GRID, "AE_MIN_HOLD": MINHOLD_GRID,
+}
+
+def valid_params(params): return valid(params["MACD_FAST"], params["MACD_SLOW"])
+
 def patch(src, params):
     src = re.sub(r'STRATEGY\s*=\s*".*?"', 'STRATEGY = "ATR_EMA_MACD"', src)
     rep = {
@@ -46,50 +61,40 @@ def run_rr(csv_path):
 
 def main():
     if len(sys.argv)<2:
-        print("Usage: python auto_tune_atr_ema_macd.py <csv_path>"); sys.exit(1)
+        print("Usage: python auto_tune_atr_ema_macd.py <csv_path> [--prune] [--fresh]"); sys.exit(1)
     csv_path = sys.argv[1]
     if not Path(csv_path).exists(): print("CSV not found:", csv_path); sys.exit(2)
-    cols = pd.read_csv(csv_path, nrows=1).columns.tolist()
-    if "Adj Close" not in cols: print('CSV must contain "Adj Close". Found:', cols); sys.exit(3)
+    cols = load_columns(csv_path)
+    if "Adj Close" not in cols: print('CSV must contain "Adj Close". Found:', list(cols)); sys.exit(3)
 
     ms = Path("myStrategy.py")
     if not ms.exists(): print("myStrategy.py not found."); sys.exit(4)
     original = ms.read_text(encoding="utf-8")
 
-    best = {"rr": -1e18}
-    for et in EMA_TREND_GRID:
-        for aw in ATR_WIN_GRID:
-            for sl in ATR_SL_MULT_GRID:
-                for tr in ATR_TR_MULT_GRID:
-                    for amin in ATR_MIN_GRID:
-                        for f in MACD_FAST_GRID:
-                            for s in MACD_SLOW_GRID:
-                                if not valid(f,s): continue
-                                for sig in MACD_SIGNAL_GRID:
-                                    for cu in CONF_UP_GRID:
-                                        for cd in COOLDOWN_GRID:
-                                            for mh in MINHOLD_GRID:
-                                                params = {
-                                                    "EMA_TREND": et, "ATR_WIN": aw,
-                                                    "ATR_SL_MULT": sl, "ATR_TR_MULT": tr, "ATR_MIN": amin,
-                                                    "MACD_FAST": f, "MACD_SLOW": s, "MACD_SIGNAL": sig,
-                                                    "AE_CONFIRM_UP": cu, "AE_COOLDOWN": cd, "AE_MIN_HOLD": mh
-                                                }
-                                                patched = patch(original, params)
-                                                ms.write_text(patched, encoding="utf-8")
-                                                try:
-                                                    rr = run_rr(csv_path)
-                                                except subprocess.CalledProcessError as e:
-                                                    print("rrEstimate failed:\n", e.output); continue
-                                                if rr is not None and rr > best["rr"]:
-                                                    best = {"rr": rr, **params}
-                                                    print(f"[BEST so far] rr={rr:.6f} params={json.dumps(params)}", flush=True)
+    price = cols["Adj Close"]
+    out_table = Path(csv_path).with_name("sweep_atr_ema_macd.csv")
+    stats = {}
+    show = lambda params, rr: print(f"[BEST so far] rr={rr:.6f} params={json.dumps(params)}", flush=True)
+    prune = "--prune" in sys.argv[2:]
+    ckpt = Path(csv_path).with_name("sweep_atr_ema_macd.ckpt.json")
+    if "--fresh" in sys.argv[2:] and ckpt.exists(): ckpt.unlink()
+    try:
+        params, rr, n = run_sweep(price, grid(SPACE, valid_params), "ATR_EMA_MACD",
+                                  results_path=out_table, on_best=show, stats=stats, prune=prune,
+                                  checkpoint=ckpt, on_progress=lambda line: print("[progress]", line, flush=True))
+    except KeyboardInterrupt:
+        print(f"Interrupted; progress saved to {ckpt} (myStrategy.py untouched). Rerun to resume.")
+        sys.exit(130)
+    if stats["resumed"]: print(f"resumed from checkpoint: {stats['resumed']} combos were already done")
+    print(f"evaluated {n} combos, results table: {out_table}")
+    print(format_indicator_stats(stats))
+    if prune: print(format_prune_stats(stats, n))
+    best = {"rr": rr, **{k: params[k] for k in SPACE}} if params else {"rr": -1e18}
 
     if best["rr"] <= -1e17:
-        print("No valid combo found. Restoring original.")
-        ms.write_text(original, encoding="utf-8"); sys.exit(5)
-    final_src = patch(original, best)
-    ms.write_text(final_src, encoding="utf-8")
+        print("No valid combo found. myStrategy.py left unchanged.")
+        sys.exit(5)
+    write_text_atomic(ms, patch(original, best))
     print("==== FINAL BEST (ATR_EMA_MACD) ====")
     print(json.dumps(best, indent=2))
     print(f"rr={best['rr']:.6f}")
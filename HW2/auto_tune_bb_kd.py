@@ -1,8 +1,14 @@
 # auto_tune_bb_kd.py
 # Grid-search BB+KD params on <csv>, write best back to myStrategy.py, then run rrEstimate.py
+# The grid runs in-process through sweep.py (CSV read once, process pool, explicit params);
+# myStrategy.py is only written once, with the final best combo (atomically).
+# Progress is checkpointed to <csv dir>/sweep_bb_kd.ckpt.json: after an interruption, rerunning
+# the same command resumes the grid where it stopped (--fresh starts over). Throughput, ETA
+# and per-worker utilization are printed while it runs.
 import sys, re, json, subprocess
 from pathlib import Path
-import pandas as pd
+from price_store import load_columns
+from sweep import grid, run_sweep, write_text_atomic, format_indicator_stats, format_prune_stats
 
 # 你可以依需求擴/縮網格
 BB_WIN_GRID   = [18,20,22,24]
@@ -13,6 +19,13 @@ CONF_UP_GRID  = [1,2]
 COOLDOWN_GRID = [0,2,3]
 MINHOLD_GRID  = [0,1,2]
 
+SPACE = {
+    "BB_WIN": BB_WIN_GRID, "BB_K": BB_K_GRID, "K_N": K_N_GRID, "KD_NEAR": KD_NEAR_GRID,
+    "BB_CONFIRM_UP": CONF_UP_GRID, "BB_COOLDOWN": COOLDOWN_GRID, "BB_MIN_HOLD": MINHOLD_GRID,
+}
+
+def valid_params(params): return True
+
 def patch(src, params):
     src = re.sub(r'STRATEGY\s*=\s*".*?"', 'STRATEGY = "BB_KD"', src)
     rep = {
@@ -37,43 +50,40 @@ def run_rr(csv_path):
 
 def main():
     if len(sys.argv)<2:
-        print("Usage: python auto_tune_bb_kd.py <csv_path>"); sys.exit(1)
+        print("Usage: python auto_tune_bb_kd.py <csv_path> [--prune] [--fresh]"); sys.exit(1)
     csv_path = sys.argv[1]
     if not Path(csv_path).exists(): print("CSV not found:", csv_path); sys.exit(2)
-    cols = pd.read_csv(csv_path, nrows=1).columns.tolist()
-    if "Adj Close" not in cols: print('CSV must contain "Adj Close". Found:', cols); sys.exit(3)
+    cols = load_columns(csv_path)
+    if "Adj Close" not in cols: print('CSV must contain "Adj Close". Found:', list(cols)); sys.exit(3)
 
     ms = Path("myStrategy.py")
     if not ms.exists(): print("myStrategy.py not found."); sys.exit(4)
     original = ms.read_text(encoding="utf-8")
 
-    best = {"rr": -1e18}
-    for bbwin in BB_WIN_GRID:
-        for bbk in BB_K_GRID:
-            for kn in K_N_GRID:
-                for kdnear in KD_NEAR_GRID:
-                    for cu in CONF_UP_GRID:
-                        for cd in COOLDOWN_GRID:
-                            for mh in MINHOLD_GRID:
-                                params = {
-                                    "BB_WIN": bbwin, "BB_K": bbk, "K_N": kn, "KD_NEAR": kdnear,
-                                    "BB_CONFIRM_UP": cu, "BB_COOLDOWN": cd, "BB_MIN_HOLD": mh
-                                }
-                                patched = patch(original, params)
-                                ms.write_text(patched, encoding="utf-8")
-                                try:
-                                    rr = run_rr(csv_path)
-                                except subprocess.CalledProcessError as e:
-                                    print("rrEstimate failed:\n", e.output); continue
-                                if rr is not None and rr > best["rr"]:
-                                    best = {"rr": rr, **params}
-                                    print(f"[BEST so far] rr={rr:.6f} params={json.dumps(params)}", flush=True)
+    price = cols["Adj Close"]
+    out_table = Path(csv_path).with_name("sweep_bb_kd.csv")
+    stats = {}
+    show = lambda params, rr: print(f"[BEST so far] rr={rr:.6f} params={json.dumps(params)}", flush=True)
+    prune = "--prune" in sys.argv[2:]
+    ckpt = Path(csv_path).with_name("sweep_bb_kd.ckpt.json")
+    if "--fresh" in sys.argv[2:] and ckpt.exists(): ckpt.unlink()
+    try:
+        params, rr, n = run_sweep(price, grid(SPACE, valid_params), "BB_KD",
+                                  results_path=out_table, on_best=show, stats=stats, prune=prune,
+                                  checkpoint=ckpt, on_progress=lambda line: print("[progress]", line, flush=True))
+    except KeyboardInterrupt:
+        print(f"Interrupted; progress saved to {ckpt} (myStrategy.py untouched). Rerun to resume.")
+        sys.exit(130)
+    if stats["resumed"]: print(f"resumed from checkpoint: {stats['resumed']} combos were already done")
+    print(f"evaluated {n} combos, results table: {out_table}")
+    print(format_indicator_stats(stats))
+    if prune: print(format_prune_stats(stats, n))
+    best = {"rr": rr, **{k: params[k] for k in SPACE}} if params else {"rr": -1e18}
 
     if best["rr"] <= -1e17:
-        print("No valid combo found. Restoring original.")
-        ms.write_text(original, encoding="utf-8"); sys.exit(5)
-    final_src = patch(original, best)
-    ms.write_text(final_src, encoding="utf-8")
+        print("No valid combo found. myStrategy.py left unchanged.")
+        sys.exit(5)
+    write_text_atomic(ms, patch(original, best))
     print("==== FINAL BEST (BB_KD) ====")
     print(json.dumps(best, indent=2))
     print(f"rr={best['rr']:.6f}")
@@ -0,0 +1,118 @@
+# bar_engine.py
+# Incremental (push-style) backtest engine for myStrategy.
+#  - rrEstimate.py hands myStrategy a fresh slice priceVec[0:ic] every day and the strategy
+#    np.append()s today's price onto it -> O(n^2) copying over the whole series.
+#  - Here prices are pushed one bar at a time into a preallocated ring buffer that keeps
+#    only the longest window the indicators read (myStrategy.required_window()), and the
+#    strategy step runs on a zero-copy contiguous view of that window.
+# Actions are bit-identical to the myStrategy(pastPriceVec, currentPrice) contract.
+#
+# Usage (benchmark both paths):
+#   python bar_engine.py public.csv [--repeat 20]
+#
+import sys, time, argparse
+import numpy as np
+
+import myStrategy as strat
+
+
+class PriceRing:
+    """
+    Fixed-capacity ring buffer of floats. Every value is written twice (at i and i+capacity),
+    so the last min(count, capacity) values are always one contiguous slice -> window() is a view.
+    """
+    __slots__ = ("capacity", "count", "_buf", "_pos")
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._buf = np.zeros(2 * self.capacity)
+        self._pos = 0
+        self.count = 0
+
+    def push(self, x):
+        x = float(x)
+        self._buf[self._pos] = x
+        self._buf[self._pos + self.capacity] = x
+        self._pos = (self._pos + 1) % self.capacity
+        self.count += 1
+
+    def window(self):
+        n = min(self.count, self.capacity)
+        end = self._pos + self.capacity
+        return self._buf[end - n:end]
+
+
+class StreamingStrategy:
+    """
+    on_bar(price) -> action for myStrategy, without passing the whole history around.
+    Wraps its own strategy instance (myStrategy.make_strategy); unspecified parameters
+    default to the knobs in myStrategy.py.
+    """
+
+    def __init__(self, strategy=None, **params):
+        self.strategy = strat.make_strategy(strategy, **params)
+        self.ring = PriceRing(self.strategy.required_window())
+
+    def on_bar(self, price):
+        self.ring.push(price)
+        return self.strategy.step(self.ring.window(), float(price))
+
+
+def run_actions(priceVec, strategy=None, **params):
+    """Suggested action for every bar, streaming version."""
+    engine = StreamingStrategy(strategy, **params)
+    return np.array([engine.on_bar(p) for p in priceVec], dtype=int)
+
+
+def rr_from_actions(priceVec, actions):
+    """Same all-in/all-out bookkeeping as rrEstimate.rrEstimate, on plain floats."""
+    capital, stock = 1000.0, 0.0
+    for p, a in zip(priceVec, actions):
+        if a == 1 and stock == 0:
+            stock = capital / p; capital = 0.0
+        elif a == -1 and stock > 0:
+            capital = stock * p; stock = 0.0
+    total = capital + stock * priceVec[-1]
+    return (total - 1000.0) / 1000.0
+
+
+def rr_stream(priceVec):
+    return rr_from_actions(priceVec, run_actions(priceVec))
+
+
+def slice_actions(priceVec):
+    """Reference path: exactly what rrEstimate does (priceVec[0:ic] every day)."""
+    return np.array([strat.myStrategy(priceVec[0:ic], priceVec[ic]) for ic in range(len(priceVec))], dtype=int)
+
+
+def benchmark(priceVec, repeat=1):
+    priceVec = np.asarray(priceVec, dtype=float)
+    if repeat > 1:
+        # longer synthetic series: chain the returns of the input `repeat` times
+        rets = priceVec[1:] / priceVec[:-1]
+        priceVec = priceVec[0] * np.concatenate([[1.0], np.cumprod(np.tile(rets, repeat))])
+
+    t0 = time.perf_counter(); ref = slice_actions(priceVec); t1 = time.perf_counter()
+    new = run_actions(priceVec); t2 = time.perf_counter()
+    same = bool(np.array_equal(ref, new))
+    print(f"bars={len(priceVec)} strategy={strat.STRATEGY}")
+    print(f"  slice-per-day (rrEstimate) : {t1 - t0:8.3f}s")
+    print(f"  ring-buffer on_bar         : {t2 - t1:8.3f}s   speedup x{(t1 - t0) / max(t2 - t1, 1e-12):.2f}")
+    print(f"  identical actions          : {same}")
+    print(f"  rr={rr_from_actions(priceVec, new) * 100:f}%")
+    return same
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("csv")
+    ap.add_argument("--repeat", type=int, default=1, help="tile the return series N times")
+    args = ap.parse_args()
+    from price_store import load_column
+    priceVec = load_column(args.csv, "Adj Close")
+    ok = benchmark(priceVec, args.repeat)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# batch_backtest.py
+# N parameter sets of myStrategy advanced together, one bar at a time, in a single pass over
+# the price series (instead of one backtest loop per parameter dict).
+#  - atr_ema_macd_kernel / bb_kd_kernel: the entry/exit state machine of fast_backtest with
+#    every state variable (_confirm_up, _confirm_dn, _cooldown, _hold_days, _entry, _peak,
+#    position, previous hist / K-D) and the all-in/all-out account of rrEstimate held as
+#    per-row arrays; every branch of step() is a mask. The parameters are scalars or per-row
+#    arrays, so the same kernels run a batch of parameter sets (here) and a batch of price
+#    paths (monte_carlo.py)
+#  - indicator series (trend EMA, MACD hist, ATR proxy, Bollinger mean/std, K-D) come from
+#    fast_backtest.IndicatorMemo, once per distinct parameter value, and each row reads its
+#    column of the (bars x distinct) table one bar at a time
+# The Python overhead is paid once per bar, not once per bar per parameter set. Actions and rr
+# are identical to myStrategy's for every parameter set (python batch_backtest.py --check).
+#
+# Usage:
+#   rr = batch_rr(price, [params1, params2, ...], "ATR_EMA_MACD")
+#   python batch_backtest.py public.csv [--strategy BB_KD] [--check 200]
+#
+import sys, time, argparse
+import numpy as np
+
+import fast_backtest as fb
+
+
+def _column(params_list, key, dtype):
+    return np.array([p[key] for p in params_list], dtype=dtype)
+
+
+def _distinct(params_list, keys, fn):
+    """(table, cols): table (bars, distinct) holds fn(*values) once per distinct value tuple of
+    `keys`, row j of the batch reads column cols[j]."""
+    index, series, cols = {}, [], []
+    for p in params_list:
+        k = tuple(p[key] for key in keys)
+        if k not in index:
+            index[k] = len(series)
+            series.append(fn(*k))
+        cols.append(index[k])
+    return np.stack(series, axis=1), np.array(cols, dtype=np.intp)
+
+
+def _reader(x):
+    """Per-bar row of an indicator input: a bar-major (bars, rows) array or a (table, cols) pair."""
+    if isinstance(x, tuple):
+        tab, cols = x
+        return (lambda t: tab[t, cols]), len(cols)
+    return (lambda t: x[t]), x.shape[1]
+
+
+# ------------------------------ batched state machines ------------------------------
+# fast_backtest._atr_ema_macd_machine / _bb_kd_machine over a batch of rows: every scalar state
+# variable becomes a (rows,) array and every branch a mask. A row is one parameter set on the
+# shared price series (batch_rr, price 1-D) or one price path with shared parameters
+# (monte_carlo, price bar-major (bars, rows)); the parameters are scalars or (rows,) arrays.
+# NaN marks "indicator not available yet", per row. Returns (final equity, filled trades,
+# (bars, rows) int8 actions or None).
+
+def atr_ema_macd_kernel(price, trend, hist, atr, sl_mult, tr_mult, atr_min, confirm_up_n, cooldown_n,
+                        min_hold, record=False):
+    trend, hist, (atr, R) = _reader(trend)[0], _reader(hist)[0], _reader(atr)
+    n = len(price)
+    need_up = np.maximum(1, confirm_up_n); cooldown_n = np.maximum(0, cooldown_n)
+    min_hold = np.maximum(0, min_hold)
+    pos = np.zeros(R, dtype=bool); entry = np.zeros(R); peak = np.zeros(R)
+    hold = np.zeros(R, dtype=np.int64); cooldown = np.zeros(R, dtype=np.int64)
+    confirm_up = np.zeros(R, dtype=np.int64); confirm_dn = np.zeros(R, dtype=np.int64)
+    prev_hist = np.zeros(R); has_prev = np.zeros(R, dtype=bool)
+    capital = np.full(R, 1000.0); stock = np.zeros(R)
+    trades = np.zeros(R, dtype=np.int64)
+    actions = np.zeros((n, R), dtype=np.int8) if record else None
+    for t in range(n):
+        p = price[t]
+        h = hist(t)
+        ready = ~np.isnan(h)            # MACD available: t >= max(fast, slow) - 1
+        if not ready.any():
+            cooldown -= cooldown > 0
+            hold += pos
+            continue
+        hist_up = ready & has_prev & (prev_hist <= 0.0) & (h > 0.0)
+        hist_dn = ready & has_prev & (prev_hist >= 0.0) & (h < 0.0)
+        tr = trend(t)
+        trend_seeded = ~np.isnan(tr)
+        trend_ok = ~trend_seeded | (p > tr)
+        trend_bad = trend_seeded & (p < tr)
+        a = atr(t)
+        atr_ok = ~np.isnan(a)
+        vol_ok = ~atr_ok | (a > atr_min)
+
+        held = ready & pos
+        peak = np.where(held, np.maximum(peak, p), peak)
+        stops = held & atr_ok
+        hard_stop = stops & (p <= entry - sl_mult * a)
+        trail_stop = stops & (p <= peak - tr_mult * a)
+
+        cooldown -= cooldown > 0
+        entry_cond = vol_ok & trend_ok & (hist_up | (h > 0.0))
+        exit_cond = hist_dn | trend_bad | hard_stop | trail_stop
+        confirm_up = np.where(ready, np.where(entry_cond, confirm_up + 1, 0), confirm_up)
+        confirm_dn = np.where(ready, np.where(exit_cond, confirm_dn + 1, 0), confirm_dn)
+
+        buy = ready & ~pos & (cooldown == 0) & (confirm_up >= need_up)
+        sell = held & ((hold >= min_hold) | hard_stop | trend_bad) & (confirm_dn >= 1)
+        entry = np.where(buy, p, entry); peak = np.where(buy, p, peak)
+        hold = np.where(buy | sell, 0, hold + (pos & ~sell))
+        confirm_up[buy] = 0
+        cooldown = np.where(sell, cooldown_n, cooldown); confirm_dn[sell] = 0
+        pos = (pos | buy) & ~sell
+        prev_hist = np.where(ready, h, prev_hist); has_prev |= ready
+
+        capital, stock = _fill(capital, stock, buy, sell, p, trades)
+        if record: actions[t] = buy.astype(np.int8) - sell.astype(np.int8)
+    return (capital + stock * price[-1] if n else capital), trades, actions
+
+
+def bb_kd_kernel(price, mu, sd, kd, bb_k, kd_near, confirm_up_n, cooldown_n, min_hold, record=False):
+    mu, sd, (kd, R) = _reader(mu)[0], _reader(sd)[0], _reader(kd)
+    n = len(price)
+    need_up = np.maximum(1, confirm_up_n); cooldown_n = np.maximum(0, cooldown_n)
+    min_hold = np.maximum(0, min_hold)
+    pos = np.zeros(R, dtype=bool)
+    hold = np.zeros(R, dtype=np.int64); cooldown = np.zeros(R, dtype=np.int64)
+    confirm_up = np.zeros(R, dtype=np.int64); confirm_dn = np.zeros(R, dtype=np.int64)
+    prev_kd = np.zeros(R); has_prev = np.zeros(R, dtype=bool)
+    capital = np.full(R, 1000.0); stock = np.zeros(R)
+    trades = np.zeros(R, dtype=np.int64)
+    actions = np.zeros((n, R), dtype=np.int8) if record else None
+    for t in range(n):
+        p = price[t]
+        m, s = mu(t), sd(t)
+        active = ~np.isnan(m) & (s > 1e-12)
+        if not active.any():
+            cooldown -= cooldown > 0
+            hold += pos
+            continue
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = (p - m) / s
+        near_lower = z <= -(bb_k - kd_near)
+        near_upper = z >= (bb_k - kd_near)
+        k = kd(t)
+        kd_ok = active & ~np.isnan(k)
+        kd_up = kd_ok & has_prev & (prev_kd <= 0.0) & (k > 0.0)
+        kd_dn = kd_ok & has_prev & (prev_kd >= 0.0) & (k < 0.0)
+
+        entry_cond = near_lower & kd_up
+        exit_cond = near_upper | kd_dn
+        confirm_up = np.where(active, np.where(entry_cond, confirm_up + 1, 0), confirm_up)
+        confirm_dn = np.where(active, np.where(exit_cond, confirm_dn + 1, 0), confirm_dn)
+        cooldown -= cooldown > 0
+
+        buy = active & ~pos & (cooldown == 0) & (confirm_up >= need_up)
+        sell = active & pos & ((hold >= min_hold) | exit_cond) & (confirm_dn >= 1)
+        hold = np.where(buy | sell, 0, hold + (pos & ~sell))
+        confirm_up[buy] = 0
+        cooldown = np.where(sell, cooldown_n, cooldown); confirm_dn[sell] = 0
+        pos = (pos | buy) & ~sell
+        prev_kd = np.where(kd_ok, k, prev_kd); has_prev |= kd_ok
+
+        capital, stock = _fill(capital, stock, buy, sell, p, trades)
+        if record: actions[t] = buy.astype(np.int8) - sell.astype(np.int8)
+    return (capital + stock * price[-1] if n else capital), trades, actions
+
+
+def _fill(capital, stock, buy, sell, p, trades):
+    """rrEstimate's all-in/all-out bookkeeping for every row; counts filled orders in `trades`."""
+    b = buy & (stock == 0.0)
+    stock = np.where(b, capital / p, stock); capital = np.where(b, 0.0, capital)
+    s = sell & (stock > 0.0)
+    capital = np.where(s, stock * p, capital); stock = np.where(s, 0.0, stock)
+    trades += b | s
+    return capital, stock
+
+
+# ------------------------------ parameter batches ------------------------------
+def run_atr_ema_macd(price, params_list, record=False):
+    """rr (N,) for ATR_EMA_MACD parameter dicts; record=True also returns (bars, N) int8 actions."""
+    price = np.asarray(price, dtype=float)
+    memo = fb.IndicatorMemo(price)
+    final, _, actions = atr_ema_macd_kernel(
+        price,
+        _distinct(params_list, ("EMA_TREND",), memo.ema),
+        _distinct(params_list, ("MACD_FAST", "MACD_SLOW", "MACD_SIGNAL"), memo.hist),
+        _distinct(params_list, ("ATR_WIN",), memo.atr),
+        _column(params_list, "ATR_SL_MULT", float), _column(params_list, "ATR_TR_MULT", float),
+        _column(params_list, "ATR_MIN", float), _column(params_list, "AE_CONFIRM_UP", np.int64),
+        _column(params_list, "AE_COOLDOWN", np.int64), _column(params_list, "AE_MIN_HOLD", np.int64),
+        record)
+    rr = (final - 1000.0) / 1000.0
+    return (rr, actions) if record else rr
+
+
+def run_bb_kd(price, params_list, record=False):
+    """rr (N,) for BB_KD parameter dicts; record=True also returns (bars, N) int8 actions."""
+    price = np.asarray(price, dtype=float)
+    memo = fb.IndicatorMemo(price)
+    final, _, actions = bb_kd_kernel(
+        price,
+        _distinct(params_list, ("BB_WIN",), lambda win: memo.bb(win)[0]),
+        _distinct(params_list, ("BB_WIN",), lambda win: memo.bb(win)[1]),
+        _distinct(params_list, ("K_N", "D_N"), memo.kd),
+        _column(params_list, "BB_K", float), _column(params_list, "KD_NEAR", float),
+        _column(params_list, "BB_CONFIRM_UP", np.int64), _column(params_list, "BB_COOLDOWN", np.int64),
+        _column(params_list, "BB_MIN_HOLD", np.int64),
+        record)
+    rr = (final - 1000.0) / 1000.0
+    return (rr, actions) if record else rr
+
+
+def batch_rr(price, params_list, strategy="ATR_EMA_MACD", record=False):
+    """rr of every parameter dict (missing knobs default to myStrategy's) in one pass."""
+    defaults = fb.default_params(strategy)
+    full = [{**defaults, **p} for p in params_list]
+    if not full:
+        return (np.zeros(0), np.zeros((len(price), 0), dtype=np.int8)) if record else np.zeros(0)
+    run = run_bb_kd if strategy == "BB_KD" else run_atr_ema_macd
+    return run(price, full, record)
+
+
+# ------------------------------ check / benchmark ------------------------------
+def _random_params(strategy, count, seed=0):
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(count):
+        if strategy == "BB_KD":
+            out.append({"BB_WIN": int(rng.integers(5, 40)), "BB_K": float(rng.choice([1.0, 1.5, 1.8, 2.0, 2.5])),
+                        "K_N": int(rng.integers(3, 20)), "D_N": int(rng.integers(1, 5)),
+                        "KD_NEAR": float(rng.choice([0.0, 0.2, 0.3, 0.5])),
+                        "BB_CONFIRM_UP": int(rng.integers(0, 3)), "BB_COOLDOWN": int(rng.integers(0, 4)),
+                        "BB_MIN_HOLD": int(rng.integers(0, 4))})
+        else:
+            fast = int(rng.integers(3, 20))
+            out.append({"EMA_TREND": int(rng.integers(20, 260)), "MACD_FAST": fast,
+                        "MACD_SLOW": int(rng.integers(fast + 1, fast + 30)), "MACD_SIGNAL": int(rng.integers(2, 15)),
+                        "ATR_WIN": int(rng.integers(3, 30)), "ATR_SL_MULT": float(rng.choice([0.5, 1.0, 1.5, 2.0, 2.5])),
+                        "ATR_TR_MULT": float(rng.choice([1.0, 1.5, 2.0, 2.5])),
+                        "ATR_MIN": float(rng.choice([0.0, 1e-3, 0.5])), "AE_CONFIRM_UP": int(rng.integers(0, 3)),
+                        "AE_COOLDOWN": int(rng.integers(0, 4)), "AE_MIN_HOLD": int(rng.integers(0, 4))})
+    return out
+
+
+def check(price, strategy, count, seed=0):
+    """Actions and rr of `count` random parameter sets vs myStrategy instances fed bar by bar."""
+    import bar_engine as be
+    params_list = _random_params(strategy, count, seed)
+    t0 = time.perf_counter()
+    rr, actions = batch_rr(price, params_list, strategy, record=True)
+    t1 = time.perf_counter()
+    bad = 0
+    for j, params in enumerate(params_list):
+        ref = be.run_actions(price, strategy, **params)
+        if not np.array_equal(ref, actions[:, j]) or be.rr_from_actions(price, ref) != rr[j]:
+            bad += 1
+    t2 = time.perf_counter()
+    print(f"{strategy}: {count} random parameter sets, {len(price)} bars")
+    print(f"  batch (one pass)          : {t1 - t0:8.3f}s")
+    print(f"  myStrategy, one run each  : {t2 - t1:8.3f}s")
+    print(f"  mismatching sets (actions or rr): {bad}  trading sets: {int(np.count_nonzero(np.any(actions, axis=0)))}")
+    return bad == 0
+
+
+def benchmark(price, strategy, sizes=(100, 1000, 10000)):
+    for size in sizes:
+        params_list = _random_params(strategy, size, seed=1)
+        t0 = time.perf_counter()
+        rr = batch_rr(price, params_list, strategy)
+        t1 = time.perf_counter()
+        m = min(size, 200)
+        for params in params_list[:m]:
+            fb.evaluate_rr(price, {**fb.default_params(strategy), **params}, strategy)
+        t2 = time.perf_counter()
+        print(f"  N={size:>6}: batch {t1 - t0:7.3f}s ({(t1 - t0) / size * 1e3:7.3f} ms/set)   "
+              f"fast_backtest per set {(t2 - t1) / m * 1e3:7.3f} ms/set   best rr={rr.max():.4f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("csv")
+    ap.add_argument("--strategy", default="ATR_EMA_MACD", choices=["ATR_EMA_MACD", "BB_KD"])
+    ap.add_argument("--check", type=int, default=200, help="random parameter sets compared with myStrategy")
+    ap.add_argument("--bench", action="store_true", help="timings for N = 100 / 1000 / 10000")
+    args = ap.parse_args()
+    from price_store import load_column
+    price = load_column(args.csv, "Adj Close")
+    ok = check(price, args.strategy, args.check) if args.check else True
+    if args.bench:
+        benchmark(price, args.strategy)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,24 @@
 import sys
 import numpy as np
-import pandas as pd
+from price_store import load_column
+from macd_engine import MACDEngine
 
-# Global variables to store MACD history
+# Global variables to store MACD history (myStrategyFull) / the incremental MACD state (myStrategy)
 macd_history = []
+_engine = None
 
-# Decision of the current day by the current price, with MACD parameters
+# Decision of the current day by the current price, with MACD parameters.
+# Incremental: O(1) per day instead of recomputing both EMAs over the whole history.
+# Same actions as myStrategyFull, as long as the days are fed in order starting with day 0.
 def myStrategy(pastPriceVec, currentPrice, fast_period, slow_period, signal_period):
+    global _engine
+    if len(pastPriceVec) == 0 or _engine is None or \
+            (_engine.fast, _engine.slow, _engine.signal) != (fast_period, slow_period, signal_period):
+        _engine = MACDEngine(fast_period, slow_period, signal_period)
+    return _engine.on_bar(currentPrice)
+
+# Reference implementation: recomputes the EMAs from scratch every day (O(n) per day)
+def myStrategyFull(pastPriceVec, currentPrice, fast_period, slow_period, signal_period):
     global macd_history
     
     # Reset MACD history if starting fresh (dataLen = 0)
@@ -62,9 +74,10 @@ def myStrategy(pastPriceVec, currentPrice, fast_period, slow_period, signal_peri
     return action
 
 # Compute return rate over a given price vector, with MACD parameters
-def computeReturnRate(priceVec, fast_period, slow_period, signal_period):
-    global macd_history
+def computeReturnRate(priceVec, fast_period, slow_period, signal_period, strategy=myStrategy):
+    global macd_history, _engine
     macd_history = []  # Reset for each test
+    _engine = None
     
     capital = 1000  # Initial available capital
     capitalOrig = capital  # original capital
@@ -77,7 +90,7 @@ def computeReturnRate(priceVec, fast_period, slow_period, signal_period):
     # Run through each day
     for ic in range(dataCount):
         currentPrice = priceVec[ic]  # current price
-        suggestedAction[ic] = myStrategy(priceVec[0:ic], currentPrice, fast_period, slow_period, signal_period)
+        suggestedAction[ic] = strategy(priceVec[0:ic], currentPrice, fast_period, slow_period, signal_period)
         
         # get real action by suggested action
         if ic > 0:
@@ -105,8 +118,7 @@ def computeReturnRate(priceVec, fast_period, slow_period, signal_period):
 
 if __name__ == '__main__':
     returnRateBest = -1.00  # Initial best return rate
-    df = pd.read_csv(sys.argv[1])  # read stock file
-    adjClose = df["Adj Close"].values  # get adj close as the price vector
+    adjClose = load_column(sys.argv[1], "Adj Close")  # read stock file, get adj close as the price vector
     
     # Parameter ranges for MACD - try more traditional values
     fast_periods = [8, 10, 12]  # Traditional: 12
@@ -0,0 +1,186 @@
+# eval_cache.py
+# Persistent evaluation cache for the tuners (SQLite, one row per evaluated parameter set).
+#  - key = (data fingerprint, strategy version, canonical params [+ window])
+#      data fingerprint : sha256 of the float64 price vector
+#      strategy version : hash of myStrategy's source (knob values blanked), of the engine modules
+#                         that compute the rr (indicators, fast_backtest, batch_backtest, ...)
+#                         and of the caller's evaluation functions, so editing the trading logic
+#                         or an engine invalidates old results but re-tuning the knobs does not
+#      canonical params : the full parameter dict (missing knobs filled from myStrategy), keys
+#                         sorted, numbers as floats -> {"ATR_WIN": 10} == {"ATR_WIN": 10.0}
+#  - the database survives across runs; every process opens its own connection in WAL mode,
+#    so parallel workers can read and append at the same time (INSERT OR IGNORE, busy timeout)
+#  - an in-memory dict sits in front of SQLite; new results are written in batches
+#
+# Usage:
+#   cache = EvalCache("tune_cache.sqlite", adj, evaluators=(evaluate_rr,))
+#   rr = cache.evaluate(params, lambda p: evaluate_rr(adj, p))
+#   rrs = cache.evaluate_many(params_list, lambda ps: evaluate_many(adj, ps))   # misses in one batch
+#   python eval_cache.py tune_cache.sqlite          # per (data, version) row counts
+#
+import os, re, sys, json, hashlib, inspect, sqlite3
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS evals (
+    data    TEXT NOT NULL,
+    version TEXT NOT NULL,
+    params  TEXT NOT NULL,
+    rr      REAL NOT NULL,
+    PRIMARY KEY (data, version, params)
+)"""
+
+
+def data_fingerprint(price):
+    price = np.ascontiguousarray(price, dtype=np.float64)
+    return hashlib.sha256(price.tobytes()).hexdigest()[:32]
+
+
+ENGINE_MODULES = ("rolling", "indicators", "fast_backtest", "batch_backtest")   # hashed whole
+
+
+def _strategy_source(strat):
+    """myStrategy's source with the knob assignments (and the STRATEGY switch) blanked out."""
+    names = ("STRATEGY",) + strat.BB_KD_PARAMS + strat.ATR_EMA_MACD_PARAMS
+    knob = re.compile(r"^(%s)\s*=.*$" % "|".join(map(re.escape, names)), re.M)
+    return knob.sub(r"\1 = ...", inspect.getsource(strat))
+
+
+def strategy_version(strategy="ATR_EMA_MACD", evaluators=()):
+    """
+    Hash of the source the cached rr values depend on: the whole myStrategy module except the
+    module-level knob values, the engine modules that compute the rr for the tuners
+    (ENGINE_MODULES) and the evaluation functions passed in.
+    """
+    import importlib
+    import myStrategy as strat
+    parts = [strategy, _strategy_source(strat)]
+    parts += [importlib.import_module(name) for name in ENGINE_MODULES]
+    parts += list(evaluators)
+    h = hashlib.sha256()
+    for part in parts:
+        h.update((part if isinstance(part, str) else inspect.getsource(part)).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def canonical_params(params, strategy="ATR_EMA_MACD", window=None):
+    import fast_backtest as fb
+    full = {**fb.default_params(strategy), **params}
+    canon = {k: (float(v) if isinstance(v, (int, float, np.number)) else v) for k, v in full.items()}
+    if window is not None:
+        canon["__window__"] = [int(window[0]), int(window[1])]
+    return json.dumps(canon, sort_keys=True, separators=(",", ":"))
+
+
+class EvalCache:
+    """rr results for one price vector and strategy, backed by a shared SQLite file."""
+
+    def __init__(self, path, price, strategy="ATR_EMA_MACD", batch=256, timeout=60.0, evaluators=()):
+        self.path = str(path)
+        self.strategy = strategy
+        self.data = data_fingerprint(price)
+        self.version = strategy_version(strategy, evaluators)
+        self.batch = batch
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._mem = {}
+        self._pending = []
+        self._conn = None
+        self._pid = None
+        self._load()
+
+    # connections are not shared across fork(): (re)open lazily in whichever process uses us
+    def _db(self):
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=self.timeout)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SCHEMA)
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _load(self):
+        rows = self._db().execute("SELECT params, rr FROM evals WHERE data=? AND version=?",
+                                  (self.data, self.version))
+        self._mem.update(rows)
+
+    def key(self, params, window=None):
+        return canonical_params(params, self.strategy, window)
+
+    def get(self, params, window=None):
+        k = self.key(params, window)
+        rr = self._mem.get(k)
+        if rr is None:
+            # another worker may have stored it since we loaded
+            row = self._db().execute("SELECT rr FROM evals WHERE data=? AND version=? AND params=?",
+                                     (self.data, self.version, k)).fetchone()
+            if row is not None:
+                rr = self._mem[k] = row[0]
+        return rr
+
+    def put(self, params, rr, window=None):
+        k = self.key(params, window)
+        self._mem[k] = float(rr)
+        self._pending.append((self.data, self.version, k, float(rr)))
+        if len(self._pending) >= self.batch:
+            self.flush()
+
+    def evaluate(self, params, fn, window=None):
+        """Cached fn(params): a hit skips the backtest entirely."""
+        rr = self.get(params, window)
+        if rr is not None:
+            self.hits += 1
+            return rr
+        self.misses += 1
+        rr = fn(params)
+        self.put(params, rr, window)
+        return rr
+
+    def evaluate_many(self, params_list, fn_many, window=None):
+        """Cached fn_many(list of params) -> list of rr: only the misses go to fn_many, in one call."""
+        out = [self.get(params, window) for params in params_list]
+        todo = [i for i, rr in enumerate(out) if rr is None]
+        self.hits += len(out) - len(todo)
+        self.misses += len(todo)
+        if todo:
+            for i, rr in zip(todo, fn_many([params_list[i] for i in todo])):
+                out[i] = float(rr)
+                self.put(params_list[i], out[i], window)
+        return out
+
+    def flush(self):
+        if not self._pending:
+            return
+        db = self._db()
+        with db:
+            db.executemany("INSERT OR IGNORE INTO evals VALUES (?, ?, ?, ?)", self._pending)
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def __len__(self):
+        return len(self._mem)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return (f"cache {self.path}: {self.hits} hits / {total} lookups "
+                f"({self.hits / max(total, 1):.0%}), {len(self)} stored for this data+version")
+
+
+def main():
+    if len(sys.argv) != 2 or not os.path.exists(sys.argv[1]):
+        print("usage: python eval_cache.py <existing cache.sqlite>")
+        sys.exit(1)
+    db = sqlite3.connect(sys.argv[1])
+    for data, version, n in db.execute("SELECT data, version, COUNT(*) FROM evals GROUP BY data, version"):
+        print(f"data={data} version={version} rows={n}")
+
+
+if __name__ == "__main__":
+    main()
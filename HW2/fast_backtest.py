@@ -0,0 +1,395 @@
+# fast_backtest.py
+# Whole-series backtest of myStrategy without per-bar myStrategy() calls.
+#  1) indicators for the whole price vector are precomputed with indicators.py
+#  2) the path-dependent entry/exit state machine (_confirm_up, _cooldown, _hold_days,
+#     _peak trailing stop, ...) runs as one tight loop over those arrays, together with
+#     rrEstimate's all-in/all-out bookkeeping.
+# The loop is JIT-compiled with Numba when it is installed; otherwise the same function runs
+# as plain Python over lists. Actions and rr are identical to rrEstimate + myStrategy.
+# Optional early abort (sweeps): given the suffix growth bound G[t] of the price vector
+# (suffix_growth) and a floor on the final equity (the incumbent best), a run stops as soon as
+# equity_t * G[t] < floor -- it can no longer reach the incumbent.
+# Numba is imported (and the kernels compiled / loaded from cache) on the first backtest,
+# so importing this module stays cheap.
+#
+# Usage:
+#   python fast_backtest.py public.csv [--strategy ATR_EMA_MACD|BB_KD] [--repeat 200]
+#
+import sys, time, argparse
+import numpy as np
+
+import indicators as ind
+from myStrategy import ATR_EMA_MACD_PARAMS, BB_KD_PARAMS   # the knob names, defined once
+
+
+def default_params(strategy=None):
+    """Current module-level knobs of myStrategy.py as an explicit params dict."""
+    import myStrategy as strat
+    strategy = strategy or strat.STRATEGY
+    keys = BB_KD_PARAMS if strategy == "BB_KD" else ATR_EMA_MACD_PARAMS
+    return {k: getattr(strat, k) for k in keys}
+
+
+# ---------------------------- state machines ----------------------------
+# Written so the very same source runs under Numba (arrays) and CPython (lists).
+# NaN marks "indicator not available yet" (None in myStrategy); x != x tests for it.
+# [start, end) selects a window: the position starts flat with 1000 cash at `start`, while the
+# indicators (and the previous hist / K-D value passed in as has_prev0/prev0) carry the state
+# the strategy had accumulated over the history before it -- i.e. a checkpoint, no replay.
+# floor > 0 enables the early abort: the machine then returns -(bars run) instead of the final
+# equity once equity * growth[t] drops below floor (growth is not read when floor <= 0).
+
+_PRUNE_SLACK = 1.0 + 1e-9   # covers rounding in the bound and in the capital/stock updates
+
+def _atr_ema_macd_machine(price, trend, hist, atr, growth, macd_start,
+                          sl_mult, tr_mult, atr_min, confirm_up_n, cooldown_n, min_hold,
+                          start, end, has_prev0, prev0, floor, out):
+    pos = 0; entry = 0.0; peak = 0.0; hold = 0; cooldown = 0
+    confirm_up = 0; confirm_dn = 0
+    has_prev = has_prev0; prev_hist = prev0
+    capital = 1000.0; stock = 0.0
+    need_up = max(1, confirm_up_n)
+    for t in range(start, end):
+        p = price[t]
+        action = 0
+        if t < macd_start:
+            if cooldown > 0: cooldown -= 1
+            if pos == 1: hold += 1
+            out[t] = 0
+            continue
+        h = hist[t]
+        hist_up = has_prev and (prev_hist <= 0.0) and (h > 0.0)
+        hist_dn = has_prev and (prev_hist >= 0.0) and (h < 0.0)
+        tr = trend[t]
+        trend_seeded = not (tr != tr)
+        trend_ok = (not trend_seeded) or (p > tr)
+        trend_bad = trend_seeded and (p < tr)
+        a = atr[t]
+        atr_ok = not (a != a)
+        vol_ok = (not atr_ok) or (a > atr_min)
+
+        hard_stop = False; trail_stop = False
+        if pos == 1:
+            peak = max(peak, p)
+            if atr_ok:
+                hard_stop = p <= entry - sl_mult * a
+                trail_stop = p <= peak - tr_mult * a
+
+        if cooldown > 0: cooldown -= 1
+        entry_cond = vol_ok and trend_ok and (hist_up or h > 0.0)
+        exit_cond = hist_dn or trend_bad or hard_stop or trail_stop
+        confirm_up = confirm_up + 1 if entry_cond else 0
+        confirm_dn = confirm_dn + 1 if exit_cond else 0
+
+        if pos == 0:
+            if cooldown == 0 and confirm_up >= need_up:
+                action = 1; pos = 1; entry = p; peak = p; hold = 0; confirm_up = 0
+        else:
+            can_exit = (hold >= max(0, min_hold)) or hard_stop or trend_bad
+            if can_exit and confirm_dn >= 1:
+                action = -1; pos = 0
+                cooldown = max(0, cooldown_n); hold = 0; confirm_dn = 0
+            else:
+                hold += 1
+        prev_hist = h; has_prev = True
+
+        if action == 1 and stock == 0.0:
+            stock = capital / p; capital = 0.0
+        elif action == -1 and stock > 0.0:
+            capital = stock * p; stock = 0.0
+        out[t] = action
+        if floor > 0.0 and (capital + stock * p) * growth[t] * _PRUNE_SLACK < floor:
+            return -(t - start + 1.0)
+    return capital + stock * price[end - 1]
+
+
+def _bb_kd_machine(price, mu, sd, kd, growth, bb_k, kd_near, confirm_up_n, cooldown_n, min_hold,
+                   start, end, has_prev0, prev0, floor, out):
+    pos = 0; peak = 0.0; hold = 0; cooldown = 0
+    confirm_up = 0; confirm_dn = 0
+    has_prev = has_prev0; prev_kd = prev0
+    capital = 1000.0; stock = 0.0
+    need_up = max(1, confirm_up_n)
+    for t in range(start, end):
+        p = price[t]
+        action = 0
+        m = mu[t]; s = sd[t]
+        if (m != m) or s <= 1e-12:
+            if cooldown > 0: cooldown -= 1
+            if pos == 1: hold += 1
+            out[t] = 0
+            continue
+        z = (p - m) / s
+        near_lower = z <= -(bb_k - kd_near)
+        near_upper = z >= (bb_k - kd_near)
+        k = kd[t]
+        k_ok = not (k != k)
+        kd_up = False; kd_dn = False
+        if k_ok and has_prev:
+            kd_up = (prev_kd <= 0.0) and (k > 0.0)
+            kd_dn = (prev_kd >= 0.0) and (k < 0.0)
+
+        entry_cond = near_lower and kd_up
+        exit_cond = near_upper or kd_dn
+        confirm_up = confirm_up + 1 if entry_cond else 0
+        confirm_dn = confirm_dn + 1 if exit_cond else 0
+        if cooldown > 0: cooldown -= 1
+
+        if pos == 0:
+            if cooldown == 0 and confirm_up >= need_up:
+                action = 1; pos = 1; peak = p; hold = 0; confirm_up = 0
+        else:
+            can_exit = (hold >= max(0, min_hold)) or exit_cond
+            if can_exit and confirm_dn >= 1:
+                action = -1; pos = 0
+                cooldown = max(0, cooldown_n); hold = 0; confirm_dn = 0
+            else:
+                peak = max(peak, p)
+                hold += 1
+        if k_ok:
+            prev_kd = k; has_prev = True
+
+        if action == 1 and stock == 0.0:
+            stock = capital / p; capital = 0.0
+        elif action == -1 and stock > 0.0:
+            capital = stock * p; stock = 0.0
+        out[t] = action
+        if floor > 0.0 and (capital + stock * p) * growth[t] * _PRUNE_SLACK < floor:
+            return -(t - start + 1.0)
+    return capital + stock * price[end - 1]
+
+
+_JIT = {}
+
+
+def _njit():
+    """numba.njit, or None when Numba is not installed (imported on first use)."""
+    if "njit" not in _JIT:
+        try:
+            from numba import njit
+        except ImportError:  # Numba is optional
+            njit = None
+        _JIT["njit"] = njit
+    return _JIT["njit"]
+
+
+def _kernel(machine):
+    kernel = _JIT.get(machine)
+    if kernel is None:
+        njit = _njit()
+        kernel = _JIT[machine] = njit(cache=True)(machine) if njit else machine
+    return kernel
+
+
+def _run(machine, arrays, scalars, n, start, end, has_prev0, prev0, floor=0.0):
+    """(actions of the bars run, final equity or None when the run was aborted)."""
+    kernel = _kernel(machine)
+    if _njit() is not None:
+        out = np.zeros(n, dtype=np.int64)
+        final = kernel(*arrays, *scalars, start, end, has_prev0, prev0, float(floor), out)
+    else:
+        out = [0] * n
+        final = kernel(*[a.tolist() for a in arrays], *scalars, start, end, has_prev0, prev0, float(floor), out)
+    stop = end if final >= 0.0 else start + int(-final)
+    return np.asarray(out[start:stop], dtype=np.int64), (final if final >= 0.0 else None)
+
+
+def _window(n, start, end):
+    start = 0 if start is None else int(start)
+    end = n if end is None else int(end)
+    if not 0 <= start < end <= n:
+        raise ValueError(f"bad window [{start}, {end}) for {n} bars")
+    return start, end
+
+
+def suffix_growth(price, end=None):
+    """
+    G[t] = prod_{t <= i < end-1} max(1, price[i+1] / price[i]): the largest factor an all-in /
+    all-out long-only account can still grow by from the close of bar t to the close of bar
+    end-1 (hold through every up day, sit out every down day). G[end-1] = 1.
+    """
+    price = np.asarray(price, dtype=float)
+    end = len(price) if end is None else int(end)
+    g = np.ones(len(price))
+    if end > 1:
+        up = np.maximum(price[1:end] / price[:end - 1], 1.0)
+        g[:end - 1] = np.cumprod(up[::-1])[::-1]
+    return g
+
+
+def _floor_equity(best_rr):
+    """Final-equity floor for the early abort from an incumbent return rate (0 = off)."""
+    return 0.0 if best_rr is None or not np.isfinite(best_rr) else max(1000.0 * (1.0 + best_rr), 0.0)
+
+
+# ------------------------------ public API ------------------------------
+def atr_ema_macd_indicators(price, params):
+    """Precomputed arrays for the ATR_EMA_MACD state machine."""
+    price = np.asarray(price, dtype=float)
+    _, _, hist = ind.macd_series(price, params["MACD_FAST"], params["MACD_SLOW"], params["MACD_SIGNAL"])
+    return {
+        "trend": ind.ema_series(price, params["EMA_TREND"]),
+        "hist": hist,
+        "atr": ind.atr_proxy_series(price, params["ATR_WIN"]),
+    }
+
+
+def bb_kd_indicators(price, params):
+    """Precomputed arrays for the BB_KD state machine (kd = K - D)."""
+    price = np.asarray(price, dtype=float)
+    mu, sd, _, _ = ind.bb_series(price, params["BB_WIN"], params["BB_K"])
+    K, D = ind.kd_series(price, params["K_N"], params["D_N"])
+    return {"mu": mu, "sd": sd, "kd": K - D}
+
+
+class IndicatorMemo:
+    """
+    Memoised indicator dependency graph for one price vector, shared by every combo of a sweep.
+    Nodes are keyed by the parameters they actually depend on:
+        ("ema", p)                   <- EMA_TREND, MACD_FAST, MACD_SLOW
+        ("hist", fast, slow, signal) <- ("ema", fast), ("ema", slow)
+        ("atr", win)
+        ("bb", win) -> (mu, sd)      (BB_K only scales the bands the state machine derives itself)
+        ("kd", k_n, d_n)
+    so a combo that differs only in stop/confirmation knobs reuses every series. `naive` counts
+    the series a per-combo atr_ema_macd_indicators / bb_kd_indicators call would compute.
+    """
+
+    def __init__(self, price):
+        self.price = np.asarray(price, dtype=float)
+        self._nodes = {}
+        self.computed = 0
+        self.naive = 0
+
+    def _node(self, key, fn):
+        v = self._nodes.get(key)
+        if v is None:
+            v = self._nodes[key] = fn()
+            self.computed += 1
+        return v
+
+    def ema(self, period):
+        return self._node(("ema", period), lambda: ind.ema_series(self.price, period))
+
+    def hist(self, fast, slow, signal):
+        return self._node(("hist", fast, slow, signal),
+                          lambda: ind.macd_from_emas(self.ema(fast), self.ema(slow), fast, slow, signal)[2])
+
+    def atr(self, win):
+        return self._node(("atr", win), lambda: ind.atr_proxy_series(self.price, win))
+
+    def bb(self, win):
+        return self._node(("bb", win), lambda: ind.bb_series(self.price, win)[:2])
+
+    def kd(self, k_n, d_n):
+        def build():
+            K, D = ind.kd_series(self.price, k_n, d_n)
+            return K - D
+        return self._node(("kd", k_n, d_n), build)
+
+    def atr_ema_macd(self, params):
+        self.naive += 5                 # trend EMA, fast EMA, slow EMA, signal/hist, ATR
+        return {
+            "trend": self.ema(params["EMA_TREND"]),
+            "hist": self.hist(params["MACD_FAST"], params["MACD_SLOW"], params["MACD_SIGNAL"]),
+            "atr": self.atr(params["ATR_WIN"]),
+        }
+
+    def bb_kd(self, params):
+        self.naive += 2                 # Bollinger mean/std, KD
+        mu, sd = self.bb(params["BB_WIN"])
+        return {"mu": mu, "sd": sd, "kd": self.kd(params["K_N"], params["D_N"])}
+
+    def indicators(self, params, strategy="ATR_EMA_MACD"):
+        return self.bb_kd(params) if strategy == "BB_KD" else self.atr_ema_macd(params)
+
+    @property
+    def avoided(self):
+        return self.naive - self.computed
+
+
+def run_atr_ema_macd(price, params, pre=None, start=None, end=None, growth=None, best_rr=None):
+    """
+    (actions, rr) for the ATR_EMA_MACD branch; `pre` = atr_ema_macd_indicators(...) to reuse.
+    start/end: trade only bars [start, end) with indicator state warmed on all bars before.
+    growth = suffix_growth(price, end) and best_rr = incumbent: abort as soon as rr can no longer
+    reach best_rr -> rr is None and actions stop at the bar where the run was cut.
+    """
+    price = np.asarray(price, dtype=float)
+    start, end = _window(len(price), start, end)
+    pre = pre if pre is not None else atr_ema_macd_indicators(price, params)
+    macd_start = max(params["MACD_FAST"], params["MACD_SLOW"]) - 1
+    has_prev = start - 1 >= macd_start
+    prev = float(pre["hist"][start - 1]) if has_prev else 0.0
+    floor = _floor_equity(best_rr) if growth is not None else 0.0
+    actions, final = _run(_atr_ema_macd_machine,
+                          (price, pre["trend"], pre["hist"], pre["atr"], price if growth is None else growth),
+                          (macd_start, float(params["ATR_SL_MULT"]), float(params["ATR_TR_MULT"]),
+                           float(params["ATR_MIN"]), int(params["AE_CONFIRM_UP"]),
+                           int(params["AE_COOLDOWN"]), int(params["AE_MIN_HOLD"])),
+                          len(price), start, end, has_prev, prev, floor)
+    return actions, (None if final is None else (final - 1000.0) / 1000.0)
+
+
+def run_bb_kd(price, params, pre=None, start=None, end=None, growth=None, best_rr=None):
+    """(actions, rr) for the BB_KD branch; `pre` = bb_kd_indicators(...) to reuse. See run_atr_ema_macd."""
+    price = np.asarray(price, dtype=float)
+    start, end = _window(len(price), start, end)
+    pre = pre if pre is not None else bb_kd_indicators(price, params)
+    # K-D is only remembered on bars where the band and K are both available
+    seen = np.flatnonzero(~np.isnan(pre["mu"][:start]) & (pre["sd"][:start] > 1e-12)
+                          & ~np.isnan(pre["kd"][:start]))
+    has_prev = len(seen) > 0
+    prev = float(pre["kd"][seen[-1]]) if has_prev else 0.0
+    floor = _floor_equity(best_rr) if growth is not None else 0.0
+    actions, final = _run(_bb_kd_machine,
+                          (price, pre["mu"], pre["sd"], pre["kd"], price if growth is None else growth),
+                          (float(params["BB_K"]), float(params["KD_NEAR"]), int(params["BB_CONFIRM_UP"]),
+                           int(params["BB_COOLDOWN"]), int(params["BB_MIN_HOLD"])),
+                          len(price), start, end, has_prev, prev, floor)
+    return actions, (None if final is None else (final - 1000.0) / 1000.0)
+
+
+def run_backtest(price, params, strategy="ATR_EMA_MACD", pre=None, start=None, end=None,
+                 growth=None, best_rr=None):
+    if strategy == "BB_KD":
+        return run_bb_kd(price, params, pre, start, end, growth, best_rr)
+    return run_atr_ema_macd(price, params, pre, start, end, growth, best_rr)
+
+
+def evaluate_rr(price, params, strategy="ATR_EMA_MACD"):
+    return run_backtest(price, params, strategy)[1]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("csv")
+    ap.add_argument("--strategy", default=None, choices=["ATR_EMA_MACD", "BB_KD"])
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+    from price_store import load_column
+    import myStrategy as strat
+    from rrEstimate import rrEstimate
+
+    price = load_column(args.csv, "Adj Close")
+    strategy = args.strategy or strat.STRATEGY
+    strat.STRATEGY = strategy
+    params = default_params(strategy)
+
+    t0 = time.perf_counter(); rr_ref = rrEstimate(price); t1 = time.perf_counter()
+    pre = (bb_kd_indicators if strategy == "BB_KD" else atr_ema_macd_indicators)(price, params)
+    t2 = time.perf_counter()
+    run_backtest(price, params, strategy, pre)          # warm-up (JIT compile)
+    t3 = time.perf_counter()
+    for _ in range(args.repeat):
+        _, rr = run_backtest(price, params, strategy, pre)
+    t4 = time.perf_counter()
+    print(f"strategy={strategy} bars={len(price)} jit={'numba' if _njit() else 'off (pure Python)'}")
+    print(f"  rrEstimate           : rr={rr_ref * 100:f}%  {(t1 - t0) * 1e3:9.3f} ms")
+    print(f"  indicators (once)    : {(t2 - t1) * 1e3:9.3f} ms")
+    print(f"  state machine / run  : rr={rr * 100:f}%  {(t4 - t3) / args.repeat * 1e3:9.3f} ms")
+    print(f"  identical rr         : {rr == rr_ref}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# indicators.py
+# Whole-series (vectorized) versions of the indicators used by myStrategy.py.
+#  - Each function returns the value myStrategy would compute on bar t, for every t at once
+#    (NaN where the per-bar function returns None / the EMA is not seeded yet).
+#  - Work along the last axis, so a 2-D (paths x bars) array is handled in one call.
+#  - exact=True (default) reduces each trailing window with the same NumPy reductions as
+#    the per-bar helpers -> bit-identical results. exact=False uses O(n) cumulative sums
+#    (faster for long windows; close, but not equal to the last bit -- the cumsum std
+#    loses a few digits to cancellation, so keep exact=True when signals must match).
+#  - EMA recurrences use scipy.signal.lfilter when SciPy is installed, otherwise a loop
+#    over bars that is still vectorized across rows. Both reproduce _ema_update exactly.
+#    scipy.signal is imported on the first EMA (it costs ~1 s of startup), not at import.
+#
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+_lfilter = None      # resolved by _get_lfilter(); False = SciPy not installed
+
+
+def _get_lfilter():
+    global _lfilter
+    if _lfilter is None:
+        try:
+            from scipy.signal import lfilter
+            _lfilter = lfilter
+        except ImportError:  # SciPy is optional
+            _lfilter = False
+    return _lfilter
+
+
+def _alpha(p): return 2.0 / (p + 1.0)
+
+
+def _nan_like(x):
+    return np.full(np.shape(x), np.nan)
+
+
+def _windows(x, win):
+    """(..., n-win+1, win) view of trailing windows; row j is x[..., j:j+win]."""
+    return sliding_window_view(x, win, axis=-1)
+
+
+def _rolling_sum_cumsum(x, win):
+    c = np.cumsum(x, axis=-1)
+    out = c[..., win - 1:].copy()
+    out[..., 1:] -= c[..., :-win]
+    return out
+
+
+# --------------------------- rolling stats ---------------------------
+def rolling_mean(x, win, exact=True):
+    """out[..., t] = np.mean(x[..., t-win+1:t+1]) for t >= win-1, NaN before."""
+    x = np.asarray(x, dtype=float)
+    out = _nan_like(x)
+    if win < 1 or x.shape[-1] < win:
+        return out
+    if exact:
+        out[..., win - 1:] = np.mean(_windows(x, win), axis=-1)
+    else:
+        out[..., win - 1:] = _rolling_sum_cumsum(x, win) / win
+    return out
+
+
+def rolling_std(x, win, exact=True):
+    """Population std (ddof=0) of the trailing window, as in _bb_from_close."""
+    x = np.asarray(x, dtype=float)
+    out = _nan_like(x)
+    if win < 1 or x.shape[-1] < win:
+        return out
+    if exact:
+        out[..., win - 1:] = np.std(_windows(x, win), axis=-1, ddof=0)
+    else:
+        mu = _rolling_sum_cumsum(x, win) / win
+        var = _rolling_sum_cumsum(x * x, win) / win - mu * mu
+        out[..., win - 1:] = np.sqrt(np.maximum(var, 0.0))
+    return out
+
+
+def rolling_max(x, win):
+    x = np.asarray(x, dtype=float)
+    out = _nan_like(x)
+    if win >= 1 and x.shape[-1] >= win:
+        out[..., win - 1:] = np.max(_windows(x, win), axis=-1)
+    return out
+
+
+def rolling_min(x, win):
+    x = np.asarray(x, dtype=float)
+    out = _nan_like(x)
+    if win >= 1 and x.shape[-1] >= win:
+        out[..., win - 1:] = np.min(_windows(x, win), axis=-1)
+    return out
+
+
+# ------------------------------- EMA --------------------------------
+def _ema_recurrence(x, a, y0):
+    """y[..., 0] = a*x[..., 0] + (1-a)*y0, y[..., t] = a*x[..., t] + (1-a)*y[..., t-1]."""
+    if x.shape[-1] == 0:
+        return x.copy()
+    lfilter = _get_lfilter()
+    if lfilter:
+        zi = ((1.0 - a) * np.asarray(y0, dtype=float))[..., None]
+        y, _ = lfilter([a, 0.0], [1.0, -(1.0 - a)], x, axis=-1, zi=zi)
+        return y
+    y = np.empty_like(x)
+    prev = np.asarray(y0, dtype=float)
+    b = 1.0 - a
+    for t in range(x.shape[-1]):
+        prev = a * x[..., t] + b * prev
+        y[..., t] = prev
+    return y
+
+
+def ema_series(x, period):
+    """
+    EMA with myStrategy's seeding rule: on the first bar with `period` prices the EMA is
+    seeded with their mean (_ema_seed_from_slice) and immediately updated with that bar.
+    """
+    x = np.asarray(x, dtype=float)
+    out = _nan_like(x)
+    t0 = period - 1
+    if period < 1 or x.shape[-1] <= t0:
+        return out
+    seed = np.mean(x[..., :period], axis=-1)
+    out[..., t0:] = _ema_recurrence(x[..., t0:], _alpha(period), seed)
+    return out
+
+
+def macd_series(x, fast, slow, signal):
+    """
+    (macd, signal, hist) as in ATREMAMACDStrategy.step: MACD starts once both EMAs are seeded,
+    the signal EMA is seeded with the first MACD value (no update on that bar).
+    """
+    x = np.asarray(x, dtype=float)
+    return macd_from_emas(ema_series(x, fast), ema_series(x, slow), fast, slow, signal)
+
+
+def macd_from_emas(fast_ema, slow_ema, fast, slow, signal):
+    """macd_series from already computed ema_series(x, fast) / ema_series(x, slow)."""
+    macd = fast_ema - slow_ema
+    sig = _nan_like(macd)
+    t0 = max(fast, slow) - 1
+    if macd.shape[-1] > t0:
+        m = macd[..., t0:]
+        sig[..., t0] = m[..., 0]
+        if m.shape[-1] > 1:
+            sig[..., t0 + 1:] = _ema_recurrence(m[..., 1:], _alpha(signal), m[..., 0])
+    return macd, sig, macd - sig
+
+
+# ----------------------------- BB / KD / ATR ----------------------------
+def bb_series(x, win=20, k=2.0, exact=True):
+    """(mu, sd, upper, lower) series matching _bb_from_close."""
+    mu = rolling_mean(x, win, exact)
+    sd = rolling_std(x, win, exact)
+    return mu, sd, mu + k * sd, mu - k * sd
+
+
+def kd_series(x, k_n=9, d_n=3):
+    """(K, D) series matching _kd_from_close(prev_K=None) -- D is the same light approx (D = K)."""
+    x = np.asarray(x, dtype=float)
+    hi, lo = rolling_max(x, k_n), rolling_min(x, k_n)
+    flat = hi == lo
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rsv = np.where(flat, 50.0, (x - lo) / np.where(flat, 1.0, hi - lo) * 100.0)
+    rsv[np.isnan(hi)] = np.nan
+    K = (2.0 / 3.0) * rsv + (1.0 / 3.0) * rsv
+    return K, K.copy()
+
+
+def atr_proxy_series(x, win=14, exact=True):
+    """Mean |Δclose| over the last `win` differences, matching _atr_proxy_from_close."""
+    x = np.asarray(x, dtype=float)
+    out = _nan_like(x)
+    if win < 1 or x.shape[-1] < win + 1:
+        return out
+    out[..., 1:] = rolling_mean(np.abs(np.diff(x, axis=-1)), win, exact)
+    return out
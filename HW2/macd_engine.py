@@ -0,0 +1,207 @@
+# macd_engine.py
+# MACD crossover strategy of bestParamByExhaustiveSearch.py without the O(n^2) recomputation.
+#  - the original recomputes both EMAs over the whole history every day, and the signal line
+#    twice over the whole MACD history -> O(n^2) per backtest
+#  - MACDEngine: incremental, O(1) per bar, same seeding (EMA starts at the first price -- or is
+#    the plain mean while fewer than `period` prices exist --, the signal EMA starts at the first
+#    MACD value, MACD values are recorded from day `slow` on)
+#  - macd_actions: the same actions for the whole series at once (vectorized EMA recurrences)
+#  - macd_sweep: fast x slow x signal grid on a process pool; every EMA period is computed once
+#    per worker, each (fast, slow) task builds the MACD line once for all signal periods
+# All three reproduce the original actions / return rate bit for bit.
+#
+# Usage:
+#   python macd_engine.py public.csv [--fast 5:30] [--slow 10:60] [--signal 3:20] [--workers N] [--check]
+#
+import time, argparse
+import numpy as np
+
+import indicators as ind
+
+
+class MACDEngine:
+    """on_bar(price) -> action of bestParamByExhaustiveSearch.myStrategy for the next day."""
+    __slots__ = ("fast", "slow", "signal", "_af", "_as", "_ag", "_t", "_fast_ema", "_slow_ema",
+                 "_head", "_sig", "_n_macd", "_prev_macd", "_prev_sig")
+
+    def __init__(self, fast, slow, signal):
+        self.fast, self.slow, self.signal = fast, slow, signal
+        self._af = 2 / (fast + 1); self._as = 2 / (slow + 1); self._ag = 2 / (signal + 1)
+        self.reset()
+
+    def reset(self):
+        self._t = 0
+        self._fast_ema = self._slow_ema = self._sig = None
+        self._head = []                     # first prices, while the fast EMA is still a mean
+        self._n_macd = 0
+        self._prev_macd = self._prev_sig = None
+
+    def on_bar(self, price):
+        if self._t == 0:
+            self._fast_ema = self._slow_ema = price
+        else:
+            self._fast_ema = self._af * price + (1 - self._af) * self._fast_ema
+            self._slow_ema = self._as * price + (1 - self._as) * self._slow_ema
+        t = self._t
+        self._t = t + 1
+        if t + 1 < self.fast:               # calculate_ema: len(data) < period -> np.mean(data)
+            self._head.append(price)
+        if t < self.slow:                   # dataLen < slow_period
+            return 0
+        fast_ema = np.mean(np.array(self._head)) if t + 1 < self.fast else self._fast_ema
+        macd = fast_ema - self._slow_ema
+        if self._n_macd == 0:
+            sig = macd
+        else:
+            sig = self._ag * macd + (1 - self._ag) * self._sig
+        self._n_macd += 1
+        prev_macd, prev_sig = self._prev_macd, self._prev_sig
+        self._sig = self._prev_sig = sig
+        self._prev_macd = macd
+        if self._n_macd < self.signal + 1:  # need signal_period + 1 MACD values for a crossover
+            return 0
+        if macd > sig and prev_macd <= prev_sig:
+            return 1
+        if macd < sig and prev_macd >= prev_sig:
+            return -1
+        return 0
+
+
+def _ema_from_first(x, period):
+    """
+    out[t] = calculate_ema(x[:t+1], period): the EMA seeded with x[0] (ema = data[0], then
+    ema = a*p + (1-a)*ema), or np.mean(x[:t+1]) while t+1 < period.
+    """
+    out = np.empty_like(x)
+    if len(x):
+        out[0] = x[0]
+        out[1:] = ind._ema_recurrence(x[1:], 2 / (period + 1), x[0])
+        for t in range(min(period - 1, len(x))):
+            out[t] = np.mean(x[:t + 1])
+    return out
+
+
+def _actions_from_ema(fast_ema, slow_ema, slow, signal):
+    n = len(fast_ema)
+    actions = np.zeros(n, dtype=np.int64)
+    if n <= slow:
+        return actions
+    macd = fast_ema[slow:] - slow_ema[slow:]
+    sig = np.empty_like(macd)               # seeded with the first MACD value (k >= signal only)
+    sig[0] = macd[0]
+    sig[1:] = ind._ema_recurrence(macd[1:], 2 / (signal + 1), macd[0])
+    k = np.arange(len(macd))
+    ok = k >= signal                        # len(macd_history) >= signal_period + 1
+    prev_macd = np.concatenate([[np.nan], macd[:-1]])
+    prev_sig = np.concatenate([[np.nan], sig[:-1]])
+    buy = ok & (macd > sig) & (prev_macd <= prev_sig)
+    sell = ok & ~buy & (macd < sig) & (prev_macd >= prev_sig)
+    actions[slow:] = buy.astype(np.int64) - sell.astype(np.int64)
+    return actions
+
+
+def macd_actions(price, fast, slow, signal):
+    price = np.asarray(price, dtype=float)
+    return _actions_from_ema(_ema_from_first(price, fast), _ema_from_first(price, slow), slow, signal)
+
+
+def rr_from_actions(price, actions):
+    """computeReturnRate's all-in/all-out bookkeeping, visiting only the days with an action."""
+    capital, stock = 1000, 0.0
+    for ic in np.flatnonzero(actions).tolist():
+        p = price[ic]
+        if actions[ic] == 1 and stock == 0:
+            stock = capital / p; capital = 0
+        elif actions[ic] == -1 and stock > 0:
+            capital = stock * p; stock = 0.0
+    total = capital + stock * price[-1]
+    return (total - 1000) / 1000
+
+
+# ------------------------------ parallel sweep ------------------------------
+_W = {}
+
+
+def _init_worker(price):
+    _W["price"] = price
+    _W["ema"] = {}
+
+
+def _ema(period):
+    e = _W["ema"].get(period)
+    if e is None:
+        e = _W["ema"][period] = _ema_from_first(_W["price"], period)
+    return e
+
+
+def _eval_pair(task):
+    fast, slow, signals = task
+    price = _W["price"]
+    fe, se = _ema(fast), _ema(slow)
+    return [(fast, slow, sig, rr_from_actions(price, _actions_from_ema(fe, se, slow, sig))) for sig in signals]
+
+
+def macd_sweep(price, fast_periods, slow_periods, signal_periods, workers=None):
+    """[(fast, slow, signal, rr), ...] in nested-loop order; best = first max, like the script."""
+    price = np.ascontiguousarray(price, dtype=float)
+    tasks = [(f, s, list(signal_periods)) for f in fast_periods for s in slow_periods]
+    if workers == 1:
+        _init_worker(price)
+        rows = [r for t in tasks for r in _eval_pair(t)]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(price,)) as pool:
+            rows = [r for chunk in pool.map(_eval_pair, tasks, chunksize=4) for r in chunk]
+    return rows
+
+
+def best_of(rows):
+    best = None
+    for row in rows:
+        if best is None or row[3] > best[3]:
+            best = row
+    return best
+
+
+def _range(text):
+    lo, hi = (int(v) for v in text.split(":"))
+    return list(range(lo, hi + 1))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("csv")
+    ap.add_argument("--fast", default="5:30", help="lo:hi (inclusive)")
+    ap.add_argument("--slow", default="10:60")
+    ap.add_argument("--signal", default="3:20")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--check", action="store_true",
+                    help="also run bestParamByExhaustiveSearch (original and incremental strategy) on its 27-combo grid and compare")
+    args = ap.parse_args()
+    from price_store import load_column
+    price = load_column(args.csv, "Adj Close")
+
+    if args.check:
+        import bestParamByExhaustiveSearch as orig
+        grid = ([8, 10, 12], [20, 24, 26], [5, 7, 9])
+        t0 = time.perf_counter()
+        ref = [(f, s, g, orig.computeReturnRate(price, f, s, g, strategy=orig.myStrategyFull)) for f in grid[0] for s in grid[1] for g in grid[2]]
+        t1 = time.perf_counter()
+        new = macd_sweep(price, *grid, workers=1)
+        t2 = time.perf_counter()
+        inc = [(f, s, g, orig.computeReturnRate(price, f, s, g)) for f in grid[0] for s in grid[1] for g in grid[2]]
+        t3 = time.perf_counter()
+        print(f"27-combo grid: original {t1 - t0:.2f}s, incremental {t3 - t2:.3f}s, vectorized {t2 - t1:.3f}s")
+        print(f"  identical rr: incremental={inc == ref} vectorized={new == ref}")
+
+    fast, slow, sig = _range(args.fast), _range(args.slow), _range(args.signal)
+    t0 = time.perf_counter()
+    rows = macd_sweep(price, fast, slow, sig, workers=args.workers)
+    dt = time.perf_counter() - t0
+    f, s, g, rr = best_of(rows)
+    print(f"{len(rows)} combos in {dt:.2f}s ({len(rows) / max(dt, 1e-9):.0f} combos/s)")
+    print(f"Best settings: fast_period={f}, slow_period={s}, signal_period={g} ==> returnRate={rr:f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# monte_carlo.py
+# Robustness of one myStrategy parameter set over resampled price paths (not a single rr).
+#  - paths: stationary block bootstrap (Politis & Romano) of the log returns of the input:
+#    blocks start at uniform random bars, have geometric lengths with mean --block, and wrap
+#    around the end; optional Gaussian noise (--noise x std of the returns) on every return.
+#    Each path starts at the first input price and has the same number of bars.
+#  - paths are generated and evaluated in blocks of PATH_BLOCK rows, each with its own seed
+#    derived from (--seed, block number); a block is always drawn whole and then cut to
+#    --paths, so path i is the same for any --paths > i and any --workers (blocks are
+#    independent; --workers N spreads them over a process pool)
+#  - indicators run once on the whole (paths x bars) block (indicators.py works along the last
+#    axis); batch_backtest's batched state machine advances all paths together, one bar at a
+#    time, with the per-path state held in arrays -> same actions as the scalar backtest on
+#    every path (--check K compares the first K paths with fast_backtest)
+#  - output: quantiles / mean / std of rr, P(rr < 0), P(rr < rr on the input series);
+#    --out saves the per-path rr vector (.npy)
+#
+# Usage:
+#   python monte_carlo.py public.csv [--strategy ATR_EMA_MACD] [--paths 10000] [--block 20]
+#                         [--noise 0.0] [--seed 0] [--param MACD_FAST=12 ...] [--workers 4] [--check 20]
+#                         [--out rr.npy]
+#
+import sys, time, argparse
+import numpy as np
+
+import indicators as ind
+import fast_backtest as fb
+from batch_backtest import atr_ema_macd_kernel, bb_kd_kernel
+
+PATH_BLOCK = 1024            # paths generated / evaluated together
+_ROLL_BYTES = 256 << 20      # cap on the temporaries of exact rolling std over (rows, bars, win)
+
+
+# ------------------------------ path generation ------------------------------
+def bootstrap_returns(rets, n_paths, mean_block, rng):
+    """(n_paths, len(rets)) stationary-bootstrap resample of `rets`."""
+    m = len(rets)
+    new = rng.random((n_paths, m)) < 1.0 / max(mean_block, 1.0)
+    new[:, 0] = True
+    start = rng.integers(0, m, size=(n_paths, m))
+    t = np.arange(m)
+    last = np.maximum.accumulate(np.where(new, t, 0), axis=1)       # bar where the current block began
+    idx = (np.take_along_axis(start, last, axis=1) + (t - last)) % m
+    return rets[idx]
+
+
+def simulate_paths(price, n_paths, mean_block=20.0, noise=0.0, seed=0, first=0):
+    """
+    (n_paths, len(price)) price paths number first .. first+n_paths-1. Path block b (paths
+    b*PATH_BLOCK ..) is always drawn whole from its own generator seeded with (seed, b) and then
+    sliced, so a path does not depend on how many paths are requested around it.
+    """
+    price = np.asarray(price, dtype=float)
+    rets = np.diff(np.log(price))
+    parts = []
+    for b in range(first // PATH_BLOCK, -(-(first + n_paths) // PATH_BLOCK)):
+        rng = np.random.default_rng([seed, b])
+        r = bootstrap_returns(rets, PATH_BLOCK, mean_block, rng)
+        if noise > 0.0:
+            r += rng.normal(0.0, noise * rets.std(), size=r.shape)
+        lo = max(first - b * PATH_BLOCK, 0)
+        parts.append(r[lo:min(first + n_paths - b * PATH_BLOCK, PATH_BLOCK)])
+    r = np.concatenate(parts) if parts else np.empty((0, len(rets)))
+    out = np.empty((n_paths, len(price)))
+    out[:, 0] = price[0]
+    out[:, 1:] = price[0] * np.exp(np.cumsum(r, axis=1))
+    return out
+
+
+# ------------------------------ batched indicators ------------------------------
+def _by_rows(fn, paths, per_row_bytes):
+    """fn over row chunks of `paths`, so (rows x bars x win) temporaries stay under _ROLL_BYTES."""
+    rows = max(1, _ROLL_BYTES // max(per_row_bytes, 1))
+    if rows >= len(paths):
+        return fn(paths)
+    parts = [fn(paths[i:i + rows]) for i in range(0, len(paths), rows)]
+    return tuple(np.concatenate(cols) for cols in zip(*parts))
+
+
+def batch_indicators(paths, params, strategy="ATR_EMA_MACD"):
+    """fast_backtest's indicator dict, each entry (paths x bars)."""
+    if strategy == "BB_KD":
+        n = paths.shape[1]
+        mu, sd = _by_rows(lambda x: ind.bb_series(x, params["BB_WIN"])[:2], paths, n * params["BB_WIN"] * 8)
+        K, D = ind.kd_series(paths, params["K_N"], params["D_N"])
+        return {"mu": mu, "sd": sd, "kd": K - D}
+    return fb.atr_ema_macd_indicators(paths, params)
+
+
+def batch_rr(paths, params, strategy="ATR_EMA_MACD", pre=None):
+    """(rr per path, filled trades per path) for a (paths x bars) price array."""
+    paths = np.asarray(paths, dtype=float)
+    pre = batch_indicators(paths, params, strategy) if pre is None else pre
+    bar_major = lambda x: np.ascontiguousarray(x.T)
+    if strategy == "BB_KD":
+        final, trades, _ = bb_kd_kernel(bar_major(paths), bar_major(pre["mu"]), bar_major(pre["sd"]),
+                                        bar_major(pre["kd"]), float(params["BB_K"]), float(params["KD_NEAR"]),
+                                        int(params["BB_CONFIRM_UP"]), int(params["BB_COOLDOWN"]),
+                                        int(params["BB_MIN_HOLD"]))
+    else:
+        final, trades, _ = atr_ema_macd_kernel(bar_major(paths), bar_major(pre["trend"]), bar_major(pre["hist"]),
+                                               bar_major(pre["atr"]), float(params["ATR_SL_MULT"]),
+                                               float(params["ATR_TR_MULT"]), float(params["ATR_MIN"]),
+                                               int(params["AE_CONFIRM_UP"]), int(params["AE_COOLDOWN"]),
+                                               int(params["AE_MIN_HOLD"]))
+    return (final - 1000.0) / 1000.0, trades
+
+
+# ------------------------------ driver ------------------------------
+def _eval_block(task):
+    """One path block: (first path index, rr, trades, (generate, indicators, state machine) s, mismatches)."""
+    price, params, strategy, lo, hi, mean_block, noise, seed, check = task
+    t0 = time.perf_counter()
+    paths = simulate_paths(price, hi - lo, mean_block, noise, seed, lo)
+    t1 = time.perf_counter()
+    pre = batch_indicators(paths, params, strategy)
+    t2 = time.perf_counter()
+    rr, trades = batch_rr(paths, params, strategy, pre)
+    t3 = time.perf_counter()
+    mismatches = sum(fb.evaluate_rr(paths[i], params, strategy) != rr[i]
+                     for i in range(max(0, min(check - lo, hi - lo))))
+    return lo, rr, trades, (t1 - t0, t2 - t1, t3 - t2), int(mismatches)
+
+
+def run(price, params, strategy="ATR_EMA_MACD", n_paths=10000, mean_block=20.0, noise=0.0, seed=0,
+        check=0, timings=None, workers=1):
+    """
+    rr and trade count for n_paths bootstrap paths; check=K re-runs the first K paths through
+    the scalar fast_backtest. workers > 1 evaluates path blocks on a process pool.
+    """
+    price = np.ascontiguousarray(price, dtype=float)
+    rr = np.empty(n_paths); trades = np.empty(n_paths, dtype=np.int64)
+    tasks = [(price, params, strategy, lo, min(lo + PATH_BLOCK, n_paths), mean_block, noise, seed, check)
+             for lo in range(0, n_paths, PATH_BLOCK)]
+    if workers == 1:
+        results = list(map(_eval_block, tasks))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:   # shut down even if a block raises
+            results = list(pool.map(_eval_block, tasks))
+    spent = np.zeros(3)
+    mismatches = 0
+    for lo, r, tr, secs, bad in results:
+        rr[lo:lo + len(r)] = r; trades[lo:lo + len(r)] = tr
+        spent += secs; mismatches += bad
+    if timings is not None:
+        timings.update(generate=spent[0], indicators=spent[1], state_machine=spent[2], check_mismatches=mismatches)
+    return rr, trades
+
+
+def summarize(rr, trades, rr_input):
+    q = np.quantile(rr, [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99])
+    lines = [f"paths={len(rr)}  rr on the input series={rr_input * 100:.2f}%",
+             f"  mean={rr.mean() * 100:.2f}%  std={rr.std() * 100:.2f}%  "
+             f"P(rr<0)={np.mean(rr < 0):.1%}  P(rr<input)={np.mean(rr < rr_input):.1%}  "
+             f"trades/path={trades.mean():.1f}",
+             "  quantiles: " + "  ".join(f"q{int(k * 100):02d}={v * 100:.2f}%"
+                                         for k, v in zip((0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99), q))]
+    return "\n".join(lines)
+
+
+def _parse_params(items):
+    params = {}
+    for item in items:
+        k, v = item.split("=", 1)
+        params[k] = float(v) if any(c in v for c in ".eE") else int(v)
+    return params
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("csv")
+    ap.add_argument("--strategy", default=None, choices=["ATR_EMA_MACD", "BB_KD"])
+    ap.add_argument("--paths", type=int, default=10000)
+    ap.add_argument("--block", type=float, default=20.0, help="mean block length (bars)")
+    ap.add_argument("--noise", type=float, default=0.0, help="Gaussian return noise, in return std units")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--param", action="append", default=[], help="KNOB=value, repeatable")
+    ap.add_argument("--workers", type=int, default=1, help="process pool over path blocks")
+    ap.add_argument("--check", type=int, default=0, help="verify the first K paths against fast_backtest")
+    ap.add_argument("--out", default=None, help="save per-path rr (.npy)")
+    args = ap.parse_args()
+    from price_store import load_column
+    import myStrategy as strat
+
+    price = load_column(args.csv, "Adj Close")
+    strategy = args.strategy or strat.STRATEGY
+    params = {**fb.default_params(strategy), **_parse_params(args.param)}
+    rr_input = fb.evaluate_rr(price, params, strategy)
+
+    timings = {}
+    t0 = time.perf_counter()
+    rr, trades = run(price, params, strategy, args.paths, args.block, args.noise, args.seed, args.check, timings,
+                    args.workers)
+    dt = time.perf_counter() - t0
+    print(f"strategy={strategy} bars={len(price)} block={args.block} noise={args.noise} seed={args.seed}")
+    print(summarize(rr, trades, rr_input))
+    print(f"  wall {dt:.2f}s ({args.paths / max(dt, 1e-9):.0f} paths/s); summed over blocks: generate "
+          f"{timings['generate']:.2f}s, indicators {timings['indicators']:.2f}s, state machine {timings['state_machine']:.2f}s")
+    if args.check:
+        print(f"  check: {timings['check_mismatches']} of the first {min(args.check, args.paths)} paths differ "
+              f"from fast_backtest")
+    if args.out:
+        np.save(args.out, rr)
+    sys.exit(1 if timings["check_mismatches"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,14 @@
 # Rules:
 # - Uses Adj Close only. No ML/DP. Per-call O(1) or tiny slices. Compatible with rrEstimate.py.
 # - Added robustness knobs: signal confirmation, cooldown days, min hold days, volatility filters.
+# - All per-run state lives in strategy instances (BBKDStrategy / ATREMAMACDStrategy), so many
+#   parameter sets / symbols can run side by side. myStrategy() wraps a default instance built
+#   from the module-level knobs below.
+# - Bollinger mean/std, the KD high/low and the ATR proxy are kept in O(1) rolling objects
+#   (rolling.py) updated once per bar; they match the slice helpers below to 1e-12.
 
 import numpy as np
+from rolling import RollingMoments, RollingMinMax, RollingAbsDiffMean
 
 # =============== choose strategy here ===============
 STRATEGY = "ATR_EMA_MACD"   # "BB_KD" or "ATR_EMA_MACD"
@@ -39,32 +45,6 @@ AE_COOLDOWN     = 0  # cooldown days after exit
 AE_MIN_HOLD     = 2  # minimum hold days
 # -------------------------------------------
 
-# ------------- persistent states -------------
-_initialized = False
-# EMA Trend
-_trend_seeded = False
-_trend_ema = 0.0
-# MACD EMAs
-_fast_seeded = False
-_slow_seeded = False
-_sig_seeded  = False
-_fast_ema = 0.0
-_slow_ema = 0.0
-_sig_ema  = 0.0
-_prev_hist = None
-# KD prev diff
-_prev_K_minus_D = None
-# position & stops
-_pos = 0
-_entry = None
-_peak  = None
-_hold_days = 0
-_cooldown = 0
-# confirmations
-_confirm_up = 0
-_confirm_dn = 0
-# --------------------------------------------
-
 def _alpha(p): return 2.0 / (p + 1.0)
 def _ema_seed_from_slice(arr, period):
     if len(arr) < period: return None
@@ -76,7 +56,10 @@ def _ema_update(x, prev, period, seeded):
 def _kd_from_close(close, k_n=9, d_n=3, prev_K=None):
     if len(close) < k_n: return None, None
     seg = close[-k_n:]; hi, lo = float(np.max(seg)), float(np.min(seg))
-    rsv = 50.0 if hi==lo else (float(close[-1])-lo)/(hi-lo)*100.0
+    return _kd_from_range(float(close[-1]), hi, lo, prev_K)
+
+def _kd_from_range(c, hi, lo, prev_K=None):
+    rsv = 50.0 if hi==lo else (c-lo)/(hi-lo)*100.0
     K = (2.0/3.0)*((prev_K if prev_K is not None else rsv)) + (1.0/3.0)*rsv
     D = K  # light approx
     return K, D
@@ -90,143 +73,216 @@ def _atr_proxy_from_close(close, win=14):
     if len(close) < win+1: return None
     rets = np.abs(np.diff(close[-(win+1):])); return float(np.mean(rets))
 
-def _reset_states():
-    global _initialized, _trend_seeded, _trend_ema, _fast_seeded, _slow_seeded, _sig_seeded
-    global _fast_ema, _slow_ema, _sig_ema, _prev_hist, _prev_K_minus_D
-    global _pos, _entry, _peak, _hold_days, _cooldown, _confirm_up, _confirm_dn
-    _initialized=True
-    _trend_seeded=False; _trend_ema=0.0
-    _fast_seeded=False; _slow_seeded=False; _sig_seeded=False
-    _fast_ema=0.0; _slow_ema=0.0; _sig_ema=0.0; _prev_hist=None
-    _prev_K_minus_D=None
-    _pos=0; _entry=None; _peak=None
-    _hold_days=0; _cooldown=0
-    _confirm_up=0; _confirm_dn=0
-
-def _logic_bb_kd(pastPriceVec, price):
-    global _prev_K_minus_D, _pos, _entry, _peak, _hold_days, _cooldown, _confirm_up, _confirm_dn
-    prices = np.append(pastPriceVec, price)
-    action = 0
-
-    mu, sd, upper, lower = _bb_from_close(prices, win=BB_WIN, k=BB_K)
-    if mu is None or sd <= 1e-12:
-        # update counters
-        if _cooldown>0: _cooldown -= 1
-        if _pos==1: _hold_days += 1
-        return 0
-
-    z = (price - mu) / sd
-    near_lower = (z <= -(BB_K - KD_NEAR))
-    near_upper = (z >=  (BB_K - KD_NEAR))
-
-    K, D = _kd_from_close(prices, k_n=K_N, d_n=D_N, prev_K=None)
-    kd_up = kd_dn = False
-    if K is not None and D is not None and _prev_K_minus_D is not None:
-        kd_up = (_prev_K_minus_D <= 0.0) and ((K-D) > 0.0)
-        kd_dn = (_prev_K_minus_D >= 0.0) and ((K-D) < 0.0)
-
-    # confirmation logic
-    entry_cond = near_lower and kd_up
-    exit_cond  = near_upper or kd_dn
-
-    _confirm_up = _confirm_up + 1 if entry_cond else 0
-    _confirm_dn = _confirm_dn + 1 if exit_cond  else 0
-
-    # cooldown tick
-    if _cooldown > 0: _cooldown -= 1
-
-    if _pos == 0:
-        if _cooldown == 0 and _confirm_up >= max(1, BB_CONFIRM_UP):
-            action=1; _pos=1; _entry=float(price); _peak=float(price)
-            _hold_days=0; _confirm_up=0
-    else:
-        # allow exit if min hold reached, or hard exit condition (kd_dn/near_upper)
-        can_exit = (_hold_days >= max(0, BB_MIN_HOLD)) or exit_cond
-        if can_exit and _confirm_dn >= 1:
-            action=-1; _pos=0; _entry=None; _peak=None
-            _cooldown = max(0, BB_COOLDOWN); _hold_days=0; _confirm_dn=0
+BB_KD_PARAMS = ("BB_WIN", "BB_K", "K_N", "D_N", "KD_NEAR",
+                "BB_CONFIRM_UP", "BB_COOLDOWN", "BB_MIN_HOLD")
+ATR_EMA_MACD_PARAMS = ("EMA_TREND", "MACD_FAST", "MACD_SLOW", "MACD_SIGNAL", "ATR_WIN",
+                       "ATR_SL_MULT", "ATR_TR_MULT", "ATR_MIN",
+                       "AE_CONFIRM_UP", "AE_COOLDOWN", "AE_MIN_HOLD")
+
+class _StrategyBase:
+    """Shared position/confirmation state; subclasses add indicator state and step()."""
+    __slots__ = ("_pos", "_entry", "_peak", "_hold_days", "_cooldown", "_confirm_up", "_confirm_dn",
+                 "_rolling", "_primed")
+    PARAMS = ()
+
+    def __init__(self, **params):
+        unknown = set(params) - set(self.PARAMS)
+        if unknown: raise TypeError(f"unknown parameter(s) for {type(self).__name__}: {sorted(unknown)}")
+        g = globals()
+        for k in self.PARAMS:
+            setattr(self, k, params.get(k, g[k]))   # default = module-level knob
+        self.reset()
+
+    def reset(self):
+        self._pos=0; self._entry=None; self._peak=None
+        self._hold_days=0; self._cooldown=0
+        self._confirm_up=0; self._confirm_dn=0
+        self._rolling=(); self._primed=False
+
+    def _push(self, prices, price):
+        """Feed today's price to the rolling windows; the first bar after reset() primes them
+        from the history, so an instance can also start on a mid-series slice."""
+        if not self._primed:
+            for x in prices[-self.required_window():-1]:
+                for r in self._rolling: r.push(x)
+            self._primed=True
+        for r in self._rolling: r.push(price)
+
+    def params(self):
+        return {k: getattr(self, k) for k in self.PARAMS}
+
+    def __call__(self, pastPriceVec, currentPrice):
+        """myStrategy(pastPriceVec, currentPrice) contract for this instance."""
+        if len(pastPriceVec)==0: self.reset()
+        p=float(currentPrice)
+        return self.step(np.append(pastPriceVec, p), p)
+
+class BBKDStrategy(_StrategyBase):
+    __slots__ = BB_KD_PARAMS + ("_prev_K_minus_D", "_bb", "_hl")
+    PARAMS = BB_KD_PARAMS
+
+    def reset(self):
+        _StrategyBase.reset(self)
+        self._prev_K_minus_D=None
+        self._bb=RollingMoments(self.BB_WIN); self._hl=RollingMinMax(self.K_N)
+        self._rolling=(self._bb, self._hl)
+
+    def required_window(self):
+        """Longest trailing history (incl. today) any indicator reads; enough for a ring buffer."""
+        return max(self.BB_WIN, self.K_N, 1)
+
+    def step(self, prices, price):
+        # prices: history *including* today's price (a slice or a ring-buffer view)
+        action = 0
+        self._push(prices, price)
+
+        bb = self._bb
+        mu, sd = (bb.mean, bb.std) if bb.ready else (None, None)
+        if mu is None or sd <= 1e-12:
+            # update counters
+            if self._cooldown>0: self._cooldown -= 1
+            if self._pos==1: self._hold_days += 1
+            return 0
+
+        z = (price - mu) / sd
+        near_lower = (z <= -(self.BB_K - self.KD_NEAR))
+        near_upper = (z >=  (self.BB_K - self.KD_NEAR))
+
+        hl = self._hl
+        K, D = _kd_from_range(float(price), hl.max, hl.min, prev_K=None) if hl.ready else (None, None)
+        kd_up = kd_dn = False
+        if K is not None and D is not None and self._prev_K_minus_D is not None:
+            kd_up = (self._prev_K_minus_D <= 0.0) and ((K-D) > 0.0)
+            kd_dn = (self._prev_K_minus_D >= 0.0) and ((K-D) < 0.0)
+
+        # confirmation logic
+        entry_cond = near_lower and kd_up
+        exit_cond  = near_upper or kd_dn
+
+        self._confirm_up = self._confirm_up + 1 if entry_cond else 0
+        self._confirm_dn = self._confirm_dn + 1 if exit_cond  else 0
+
+        # cooldown tick
+        if self._cooldown > 0: self._cooldown -= 1
+
+        if self._pos == 0:
+            if self._cooldown == 0 and self._confirm_up >= max(1, self.BB_CONFIRM_UP):
+                action=1; self._pos=1; self._entry=float(price); self._peak=float(price)
+                self._hold_days=0; self._confirm_up=0
         else:
-            _peak = max(_peak, float(price)) if _peak is not None else float(price)
-            _hold_days += 1
-
-    _prev_K_minus_D = (K-D) if (K is not None and D is not None) else _prev_K_minus_D
-    return action
-
-def _logic_atr_ema_macd(pastPriceVec, price):
-    global _trend_seeded, _trend_ema, _fast_seeded, _slow_seeded, _sig_seeded
-    global _fast_ema, _slow_ema, _sig_ema, _prev_hist
-    global _pos, _entry, _peak, _hold_days, _cooldown, _confirm_up, _confirm_dn
-
-    p=float(price); prices=np.append(pastPriceVec, p); action=0
-
-    # Trend EMA
-    if not _trend_seeded and len(prices) >= EMA_TREND:
-        seed=_ema_seed_from_slice(prices, EMA_TREND)
-        if seed is not None: _trend_ema, _trend_seeded = float(seed), True
-    if _trend_seeded: _trend_ema,_=_ema_update(p,_trend_ema,EMA_TREND,True)
-
-    # MACD EMAs
-    if not _fast_seeded and len(prices) >= MACD_FAST:
-        seed=_ema_seed_from_slice(prices, MACD_FAST)
-        if seed is not None: _fast_ema,_fast_seeded=float(seed),True
-    if not _slow_seeded and len(prices) >= MACD_SLOW:
-        seed=_ema_seed_from_slice(prices, MACD_SLOW)
-        if seed is not None: _slow_ema,_slow_seeded=float(seed),True
-
-    if _fast_seeded: _fast_ema,_=_ema_update(p,_fast_ema,MACD_FAST,True)
-    if _slow_seeded: _slow_ema,_=_ema_update(p,_slow_ema,MACD_SLOW,True)
-    if not (_fast_seeded and _slow_seeded):
-        if _cooldown>0: _cooldown -= 1
-        if _pos==1: _hold_days += 1
-        return 0
-
-    macd=_fast_ema-_slow_ema
-    if not _sig_seeded: _sig_ema,_sig_seeded=macd,True
-    else: _sig_ema,_=_ema_update(macd,_sig_ema,MACD_SIGNAL,True)
-    hist=macd-_sig_ema
-
-    hist_up = (_prev_hist is not None) and (_prev_hist <= 0.0) and (hist > 0.0)
-    hist_dn = (_prev_hist is not None) and (_prev_hist >= 0.0) and (hist < 0.0)
-    trend_ok  = (not _trend_seeded) or (p > _trend_ema)
-    trend_bad = _trend_seeded and (p < _trend_ema)
-
-    atr = _atr_proxy_from_close(prices, win=ATR_WIN)
-    vol_ok = (atr is None) or (atr > ATR_MIN)
-
-    hard_stop = trail_stop = False
-    if _pos==1:
-        _peak = max(_peak,p) if _peak is not None else p
-        if atr is not None:
-            hard_stop  = (_entry is not None) and (p <= _entry - ATR_SL_MULT*atr)
-            trail_stop = (_peak  is not None) and (p <= _peak  - ATR_TR_MULT*atr)
-
-    # confirmation and cooldown
-    if _cooldown > 0: _cooldown -= 1
-
-    entry_cond = vol_ok and trend_ok and (hist_up or hist > 0.0)
-    exit_cond  = (hist_dn or trend_bad or hard_stop or trail_stop)
-
-    _confirm_up = _confirm_up + 1 if entry_cond else 0
-    _confirm_dn = _confirm_dn + 1 if exit_cond  else 0
-
-    if _pos==0:
-        if _cooldown==0 and _confirm_up >= max(1, AE_CONFIRM_UP):
-            action=1; _pos=1; _entry=p; _peak=p; _hold_days=0; _confirm_up=0
-    else:
-        can_exit = (_hold_days >= max(0, AE_MIN_HOLD)) or hard_stop or trend_bad
-        if can_exit and _confirm_dn >= 1:
-            action=-1; _pos=0; _entry=None; _peak=None
-            _cooldown = max(0, AE_COOLDOWN); _hold_days=0; _confirm_dn=0
+            # allow exit if min hold reached, or hard exit condition (kd_dn/near_upper)
+            can_exit = (self._hold_days >= max(0, self.BB_MIN_HOLD)) or exit_cond
+            if can_exit and self._confirm_dn >= 1:
+                action=-1; self._pos=0; self._entry=None; self._peak=None
+                self._cooldown = max(0, self.BB_COOLDOWN); self._hold_days=0; self._confirm_dn=0
+            else:
+                self._peak = max(self._peak, float(price)) if self._peak is not None else float(price)
+                self._hold_days += 1
+
+        self._prev_K_minus_D = (K-D) if (K is not None and D is not None) else self._prev_K_minus_D
+        return action
+
+class ATREMAMACDStrategy(_StrategyBase):
+    __slots__ = ATR_EMA_MACD_PARAMS + (
+        "_trend_seeded", "_trend_ema", "_fast_seeded", "_slow_seeded", "_sig_seeded",
+        "_fast_ema", "_slow_ema", "_sig_ema", "_prev_hist", "_atr")
+    PARAMS = ATR_EMA_MACD_PARAMS
+
+    def reset(self):
+        _StrategyBase.reset(self)
+        self._trend_seeded=False; self._trend_ema=0.0
+        self._fast_seeded=False; self._slow_seeded=False; self._sig_seeded=False
+        self._fast_ema=0.0; self._slow_ema=0.0; self._sig_ema=0.0; self._prev_hist=None
+        self._atr=RollingAbsDiffMean(self.ATR_WIN); self._rolling=(self._atr,)
+
+    def required_window(self):
+        """Longest trailing history (incl. today) any indicator reads; enough for a ring buffer."""
+        return max(self.EMA_TREND, self.MACD_FAST, self.MACD_SLOW, self.ATR_WIN + 1, 1)
+
+    def step(self, prices, price):
+        # prices: history *including* today's price (a slice or a ring-buffer view)
+        p=float(price); action=0
+        self._push(prices, p)
+
+        # Trend EMA
+        if not self._trend_seeded and len(prices) >= self.EMA_TREND:
+            seed=_ema_seed_from_slice(prices, self.EMA_TREND)
+            if seed is not None: self._trend_ema, self._trend_seeded = float(seed), True
+        if self._trend_seeded: self._trend_ema,_=_ema_update(p,self._trend_ema,self.EMA_TREND,True)
+
+        # MACD EMAs
+        if not self._fast_seeded and len(prices) >= self.MACD_FAST:
+            seed=_ema_seed_from_slice(prices, self.MACD_FAST)
+            if seed is not None: self._fast_ema,self._fast_seeded=float(seed),True
+        if not self._slow_seeded and len(prices) >= self.MACD_SLOW:
+            seed=_ema_seed_from_slice(prices, self.MACD_SLOW)
+            if seed is not None: self._slow_ema,self._slow_seeded=float(seed),True
+
+        if self._fast_seeded: self._fast_ema,_=_ema_update(p,self._fast_ema,self.MACD_FAST,True)
+        if self._slow_seeded: self._slow_ema,_=_ema_update(p,self._slow_ema,self.MACD_SLOW,True)
+        if not (self._fast_seeded and self._slow_seeded):
+            if self._cooldown>0: self._cooldown -= 1
+            if self._pos==1: self._hold_days += 1
+            return 0
+
+        macd=self._fast_ema-self._slow_ema
+        if not self._sig_seeded: self._sig_ema,self._sig_seeded=macd,True
+        else: self._sig_ema,_=_ema_update(macd,self._sig_ema,self.MACD_SIGNAL,True)
+        hist=macd-self._sig_ema
+
+        prev_hist=self._prev_hist
+        hist_up = (prev_hist is not None) and (prev_hist <= 0.0) and (hist > 0.0)
+        hist_dn = (prev_hist is not None) and (prev_hist >= 0.0) and (hist < 0.0)
+        trend_ok  = (not self._trend_seeded) or (p > self._trend_ema)
+        trend_bad = self._trend_seeded and (p < self._trend_ema)
+
+        atr = self._atr.mean if self._atr.ready else None
+        vol_ok = (atr is None) or (atr > self.ATR_MIN)
+
+        hard_stop = trail_stop = False
+        if self._pos==1:
+            self._peak = max(self._peak,p) if self._peak is not None else p
+            if atr is not None:
+                hard_stop  = (self._entry is not None) and (p <= self._entry - self.ATR_SL_MULT*atr)
+                trail_stop = (self._peak  is not None) and (p <= self._peak  - self.ATR_TR_MULT*atr)
+
+        # confirmation and cooldown
+        if self._cooldown > 0: self._cooldown -= 1
+
+        entry_cond = vol_ok and trend_ok and (hist_up or hist > 0.0)
+        exit_cond  = (hist_dn or trend_bad or hard_stop or trail_stop)
+
+        self._confirm_up = self._confirm_up + 1 if entry_cond else 0
+        self._confirm_dn = self._confirm_dn + 1 if exit_cond  else 0
+
+        if self._pos==0:
+            if self._cooldown==0 and self._confirm_up >= max(1, self.AE_CONFIRM_UP):
+                action=1; self._pos=1; self._entry=p; self._peak=p; self._hold_days=0; self._confirm_up=0
         else:
-            _hold_days += 1
+            can_exit = (self._hold_days >= max(0, self.AE_MIN_HOLD)) or hard_stop or trend_bad
+            if can_exit and self._confirm_dn >= 1:
+                action=-1; self._pos=0; self._entry=None; self._peak=None
+                self._cooldown = max(0, self.AE_COOLDOWN); self._hold_days=0; self._confirm_dn=0
+            else:
+                self._hold_days += 1
+
+        self._prev_hist = hist
+        return action
+
+def make_strategy(strategy=None, **params):
+    """New independent instance; strategy defaults to STRATEGY, params to the module knobs."""
+    strategy = strategy or STRATEGY
+    return BBKDStrategy(**params) if strategy=="BB_KD" else ATREMAMACDStrategy(**params)
+
+def required_window():
+    """Longest trailing history (incl. today) the current STRATEGY/knobs read."""
+    return make_strategy().required_window()
 
-    _prev_hist = hist
-    return action
+# default instance behind myStrategy(); rebuilt on every new run (len(pastPriceVec)==0) so it
+# picks up the current STRATEGY / knobs (the tuners patch or set them between runs)
+_default = None
 
 def myStrategy(pastPriceVec, currentPrice):
-    global _initialized
-    if len(pastPriceVec)==0: _reset_states()
-    if STRATEGY=="BB_KD":
-        return _logic_bb_kd(pastPriceVec, currentPrice)
-    else:
-        return _logic_atr_ema_macd(pastPriceVec, currentPrice)
+    global _default
+    if len(pastPriceVec)==0 or _default is None: _default = make_strategy()
+    return _default(pastPriceVec, currentPrice)
@@ -0,0 +1,120 @@
+# portfolio_backtest.py
+# Multi-symbol backtester with rrEstimate semantics (all-in/all-out per symbol, 1000 capital each).
+#  - input: 2-D price matrix (days x symbols); one myStrategy instance per column
+#  - all symbols advance together bar by bar; the price history is kept in a (symbols x window)
+#    ring buffer updated with one vectorized write per bar, and capital / holdings for the
+#    whole universe are updated with NumPy masks instead of one Python loop per symbol
+#  - only that bookkeeping is vectorized: every bar still makes one Python strategy call per
+#    symbol (myStrategy's step), which dominates the run time for large universes
+#  - reports per-symbol return and the aggregate (equal capital per symbol) return
+#
+# Usage:
+#   python portfolio_backtest.py public.csv --symbols 3000 [--bench 20]
+#   (the price matrix is synthesised by shuffling public.csv's daily returns per symbol)
+#
+import time, argparse
+import numpy as np
+
+import myStrategy as strat
+
+
+class PriceRingMatrix:
+    """Ring buffer for many series at once; row j of window() is symbol j's trailing history."""
+    __slots__ = ("capacity", "count", "_buf", "_pos")
+
+    def __init__(self, n_series, capacity):
+        self.capacity = int(capacity)
+        self._buf = np.zeros((n_series, 2 * self.capacity))
+        self._pos = 0
+        self.count = 0
+
+    def push(self, row):
+        self._buf[:, self._pos] = row
+        self._buf[:, self._pos + self.capacity] = row
+        self._pos = (self._pos + 1) % self.capacity
+        self.count += 1
+
+    def window(self):
+        n = min(self.count, self.capacity)
+        end = self._pos + self.capacity
+        return self._buf[:, end - n:end]
+
+
+def portfolio_backtest(priceMat, strategy=None, params=None, return_actions=False):
+    """
+    priceMat: (days, symbols). params: one dict for every symbol or a list with one per symbol.
+    Returns (per_symbol_rr, aggregate_rr[, actions (days, symbols)]); no days -> rr 0.
+    Each bar calls every symbol's strategy once in Python; the ring buffer and the capital /
+    holding updates are the vectorized part.
+    """
+    priceMat = np.asarray(priceMat, dtype=float)
+    days, n = priceMat.shape
+    if params is None or isinstance(params, dict):
+        params = [params or {}] * n
+    strategies = [strat.make_strategy(strategy, **p) for p in params]
+    steps = [s.step for s in strategies]
+    ring = PriceRingMatrix(n, max(s.required_window() for s in strategies))
+
+    capital = np.full(n, 1000.0)
+    stock = np.zeros(n)
+    actions = np.zeros((days, n), dtype=np.int8) if return_actions else None
+    act = np.zeros(n, dtype=np.int64)
+    for ic in range(days):
+        row = priceMat[ic]
+        ring.push(row)
+        win = ring.window()
+        prices = row.tolist()
+        for j in range(n):
+            act[j] = steps[j](win[j], prices[j])
+        buy = (act == 1) & (stock == 0.0)
+        sell = (act == -1) & (stock > 0.0)
+        stock[buy] = capital[buy] / row[buy]; capital[buy] = 0.0
+        capital[sell] = stock[sell] * row[sell]; stock[sell] = 0.0
+        if return_actions: actions[ic] = act
+    total = capital + stock * priceMat[-1] if days else capital     # empty input: nothing traded
+    rr = (total - 1000.0) / 1000.0
+    agg = (total.sum() - 1000.0 * n) / (1000.0 * n)
+    return (rr, agg, actions) if return_actions else (rr, agg)
+
+
+def synthetic_universe(price, n_symbols, seed=0):
+    """(days, n_symbols) matrix: each column replays `price`'s daily returns in a random order."""
+    rng = np.random.default_rng(seed)
+    rets = price[1:] / price[:-1]
+    cols = [price[0] * np.concatenate([[1.0], np.cumprod(rng.permutation(rets))]) for _ in range(n_symbols)]
+    return np.column_stack(cols)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("csv")
+    ap.add_argument("--symbols", type=int, default=200)
+    ap.add_argument("--bench", type=int, default=20,
+                    help="symbols to also run through rrEstimate one by one (timing is extrapolated)")
+    args = ap.parse_args()
+    from price_store import load_column
+    from rrEstimate import rrEstimate
+
+    price = load_column(args.csv, "Adj Close")
+    priceMat = synthetic_universe(price, args.symbols)
+    priceMat[:, 0] = price                      # column 0 is the real series
+
+    t0 = time.perf_counter()
+    rr, agg = portfolio_backtest(priceMat)
+    t1 = time.perf_counter()
+    k = min(args.bench, args.symbols)
+    ref = np.array([rrEstimate(priceMat[:, j]) for j in range(k)])
+    t2 = time.perf_counter()
+    per_sym = (t2 - t1) / max(k, 1)
+
+    print(f"days={priceMat.shape[0]} symbols={priceMat.shape[1]} strategy={strat.STRATEGY}")
+    print(f"  portfolio backtest : {t1 - t0:8.2f}s")
+    print(f"  rrEstimate loop    : {per_sym * args.symbols:8.2f}s (extrapolated from {k} symbols)")
+    print(f"  matches rrEstimate on first {k}: {bool(np.array_equal(rr[:k], ref))}")
+    print(f"  aggregate rr={agg * 100:f}%  median={np.median(rr) * 100:f}%  "
+          f"best={rr.max() * 100:f}%  worst={rr.min() * 100:f}%")
+    print(f"  symbol 0 (public.csv) rr={rr[0] * 100:f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# price_store.py
+# Columnar binary cache for the text price files (HW2 *.csv, HW4 priceMat*.txt).
+#  - the first load parses the text file and writes <file>.colcache next to it:
+#        b"PXSTORE1" | uint32 header length | JSON header | padding | float64 columns
+#    the header records the column names, row count and the source file's size, mtime and
+#    sha256; every column is stored contiguously (column-major), 64-byte aligned
+#  - later loads memory-map the data block (zero-copy, read-only) and return plain ndarray
+#    views of it; the arrays of the first (parsing) load are marked read-only as well, so
+#    every call returns the same kind of array -- copy before modifying in place
+#  - if the source's size/mtime changed, its sha256 is recomputed: same checksum -> the cache
+#    is still valid (header refreshed), different -> the text file is parsed again and the
+#    cache rewritten. The rewrite is atomic (tmp file + os.replace), so parallel readers only
+#    ever see a complete cache; if it cannot be written the parsed arrays are returned as is.
+#  - text parsing is pandas-free (csv header + np.loadtxt on the numeric columns); pandas is
+#    imported only as a fallback for files np.loadtxt cannot read (e.g. empty fields)
+#
+# Usage:
+#   from price_store import load_column, load_matrix
+#   priceVec = load_column("public.csv", "Adj Close")
+#   priceMat = load_matrix("priceMat0992.txt")          # (days, stocks)
+#   python price_store.py bench [--rows 2000000] [--cols 4]   # timing on synthetic files
+#
+import os, json, time, struct, hashlib
+import numpy as np
+
+MAGIC = b"PXSTORE1"
+SUFFIX = ".colcache"
+_ALIGN = 64
+
+
+def file_checksum(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while True:
+            block = fh.read(chunk)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_path(path):
+    return str(path) + SUFFIX
+
+
+# ----------------------------- text parsers -----------------------------
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _parse_csv(path):
+    """{column: float64 array} for every numeric column of a CSV with a header row."""
+    import csv
+    with open(path, newline="", encoding="utf-8") as fh:
+        rows = csv.reader(fh)
+        names = [c.strip() for c in next(rows)]
+        first = next(rows, None)
+    if first is None:
+        return {c: np.zeros(0) for c in names}
+    use = [j for j, v in enumerate(first) if _is_number(v)]
+    try:
+        block = np.loadtxt(path, delimiter=",", skiprows=1, usecols=use, ndmin=2, dtype=np.float64)
+    except ValueError:
+        return _parse_csv_pandas(path)
+    return {names[j]: np.ascontiguousarray(block[:, i]) for i, j in enumerate(use)}
+
+
+def _parse_csv_pandas(path):
+    import pandas as pd
+    df = pd.read_csv(path)
+    return {c: df[c].to_numpy(dtype=np.float64) for c in df.columns
+            if pd.api.types.is_numeric_dtype(df[c])}
+
+
+def _parse_matrix(path):
+    """{"c0": ..., "c1": ...} for a whitespace-delimited numeric matrix without header."""
+    try:
+        mat = np.loadtxt(path, ndmin=2, dtype=np.float64)
+    except ValueError:
+        import pandas as pd
+        mat = pd.read_csv(path, sep=r"\s+", header=None).to_numpy(dtype=np.float64)
+    return {f"c{j}": np.ascontiguousarray(mat[:, j]) for j in range(mat.shape[1])}
+
+
+_PARSERS = {"csv": _parse_csv, "matrix": _parse_matrix}
+
+
+# ----------------------------- cache file -----------------------------
+def _read_header(cpath):
+    with open(cpath, "rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            return None
+        (n,) = struct.unpack("<I", fh.read(4))
+        return json.loads(fh.read(n).decode("utf-8"))
+
+
+def _header_bytes(header):
+    # the data offset is part of the header, so size it with a placeholder first
+    header = dict(header, offset=0)
+    raw = json.dumps(header).encode("utf-8")
+    offset = -(-(len(MAGIC) + 4 + len(raw) + 16) // _ALIGN) * _ALIGN
+    header["offset"] = offset
+    raw = json.dumps(header).encode("utf-8")
+    assert len(MAGIC) + 4 + len(raw) <= offset
+    return MAGIC + struct.pack("<I", len(raw)) + raw.ljust(offset - len(MAGIC) - 4, b" "), header
+
+
+def _write_cache(cpath, header, data):
+    import tempfile
+    head, header = _header_bytes(header)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(cpath) + ".", dir=os.path.dirname(cpath) or ".")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(head)
+            fh.write(np.ascontiguousarray(data, dtype="<f8").tobytes())
+        os.replace(tmp, cpath)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return header
+
+
+def _rewrite_header(cpath, header):
+    """Same data, new stat fields (source touched but unchanged). Only if the size fits."""
+    head, new = _header_bytes(header)
+    if new["offset"] != header["offset"]:
+        return
+    with open(cpath, "r+b") as fh:
+        fh.write(head)
+
+
+def _source_stat(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def _load(path, kind, verify):
+    """(column names, (n_columns, rows) float64 block) -- a memory-mapped view when cached."""
+    path = str(path)
+    cpath = cache_path(path)
+    size, mtime = _source_stat(path)
+    header = None
+    if os.path.exists(cpath):
+        try:
+            header = _read_header(cpath)
+        except (OSError, ValueError, KeyError, struct.error):
+            header = None
+    if header is not None and header.get("kind") == kind:
+        fresh = header["size"] == size and header["mtime_ns"] == mtime and not verify
+        if not fresh and header["size"] == size and file_checksum(path) == header["sha256"]:
+            fresh = True
+            try:
+                _rewrite_header(cpath, dict(header, mtime_ns=mtime))
+            except OSError:
+                pass
+        if fresh:
+            names, rows = header["columns"], header["rows"]
+            if rows == 0 or not names:
+                block = np.zeros((len(names), rows))
+                block.setflags(write=False)
+                return names, block
+            mm = np.memmap(cpath, dtype="<f8", mode="r", offset=header["offset"], shape=(len(names), rows))
+            return names, mm.view(np.ndarray)
+
+    # missing / stale cache -> parse the text file and (re)write the cache
+    cols = _PARSERS[kind](path)
+    names = list(cols)
+    block = np.stack([cols[c] for c in names]) if names else np.zeros((0, 0))
+    try:
+        _write_cache(cpath, {"kind": kind, "columns": names, "rows": block.shape[1], "size": size,
+                             "mtime_ns": mtime, "sha256": file_checksum(path)}, block)
+    except OSError:
+        pass
+    block.setflags(write=False)     # same contract as the memory-mapped path
+    return names, block
+
+
+def load_columns(path, kind="csv", verify=False):
+    """
+    {column: float64 array} for a price file, via the binary cache when it is current.
+    kind: "csv" (header row, numeric columns) or "matrix" (whitespace-delimited, no header).
+    verify=True always recomputes the source checksum instead of trusting size + mtime.
+    """
+    names, block = _load(path, kind, verify)
+    return {name: block[j] for j, name in enumerate(names)}
+
+
+def load_column(path, name="Adj Close", verify=False):
+    cols = load_columns(path, "csv", verify)
+    if name not in cols:
+        raise ValueError(f'CSV must contain "{name}". Found: {list(cols)}')
+    return cols[name]
+
+
+def load_matrix(path, verify=False):
+    """(rows, cols) matrix of a whitespace-delimited file: a transposed view of the columnar block."""
+    return _load(path, "matrix", verify)[1].T
+
+
+# ------------------------------ benchmark ------------------------------
+def _synthetic(rows, cols, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, size=(rows, cols)), axis=0))
+
+
+def bench(rows, cols, repeat=3):
+    import tempfile
+    import pandas as pd
+    mat = _synthetic(rows, cols)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "prices.csv")
+        txt_path = os.path.join(tmp, "priceMat.txt")
+        names = ["Adj Close"] + [f"p{j}" for j in range(1, cols)]
+        pd.DataFrame(mat, columns=names).to_csv(csv_path, index=False, float_format="%.6f")
+        np.savetxt(txt_path, mat, fmt="%.6f")
+        for label, path, kind in (("csv", csv_path, "csv"), ("matrix", txt_path, "matrix")):
+            t0 = time.perf_counter()
+            ref = (pd.read_csv(path) if kind == "csv" else pd.read_csv(path, sep=r"\s+", header=None)).to_numpy()
+            t1 = time.perf_counter()
+            load_columns(path, kind)                       # parse + write cache
+            t2 = time.perf_counter()
+            for _ in range(repeat):
+                cached = load_columns(path, kind)
+                total = sum(float(c.sum()) for c in cached.values())
+            t3 = time.perf_counter()
+            for _ in range(repeat):
+                load_columns(path, kind, verify=True)
+            t4 = time.perf_counter()
+            same = np.array_equal(np.stack(list(cached.values()), axis=1), ref)
+            mb = os.path.getsize(path) / 2 ** 20
+            print(f"{label:>6}: {rows} x {cols} ({mb:.1f} MB text)  identical={same}  (sum={total:.3e})")
+            print(f"        pandas read            : {(t1 - t0) * 1e3:9.1f} ms")
+            print(f"        first load (+ cache)   : {(t2 - t1) * 1e3:9.1f} ms")
+            print(f"        cached mmap load + scan: {(t3 - t2) / repeat * 1e3:9.1f} ms")
+            print(f"        cached, verify=True    : {(t4 - t3) / repeat * 1e3:9.1f} ms")
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["bench"])
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--cols", type=int, default=4)
+    args = ap.parse_args()
+    bench(args.rows, args.cols)
+
+
+if __name__ == "__main__":
+    main()
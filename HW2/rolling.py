@@ -0,0 +1,199 @@
+# rolling.py
+# O(1)-per-bar trailing-window statistics for myStrategy (pure Python, no NumPy calls per bar).
+#  - RollingMoments     : mean / population std of the last `win` values (running sums of
+#                         x - K, K = the window mean at the last exact recompute, so the
+#                         variance never cancels against mean^2; recomputed exactly from the
+#                         window once per `win` pushes -> amortised O(1), and rounding cannot
+#                         drift on long streams; a window of identical values is detected by
+#                         its run length and gives exactly (x, 0.0) without a rescan)
+#  - RollingMinMax      : max / min of the last `win` values (monotonic deques, amortised O(1))
+#  - RollingAbsDiffMean : mean |Δx| over the last `win` differences (ATR proxy)
+# Each matches the per-bar helpers in myStrategy.py (_bb_from_close, _kd_from_close,
+# _atr_proxy_from_close) to 1e-12; max/min are exact. `ready` is False exactly where those
+# helpers return None.
+#
+# Usage:
+#   bb = RollingMoments(20)
+#   for p in prices: bb.push(p); mu, sd = (bb.mean, bb.std) if bb.ready else (None, None)
+#   python rolling.py public.csv          # max deviation vs the slice helpers + timing
+#
+import math
+from collections import deque
+
+RESYNC = 1024    # RollingAbsDiffMean: pushes between exact re-sums
+
+
+class RollingMoments:
+    __slots__ = ("win", "_buf", "_shift", "_s1", "_s2", "_since", "_run")
+
+    def __init__(self, win):
+        self.win = int(win)
+        self._buf = deque()
+        self._shift = 0.0        # K: sums are of (x - K), K = window mean at the last resync
+        self._s1 = 0.0
+        self._s2 = 0.0
+        self._since = 0
+        self._run = 0            # trailing run of identical values
+
+    def push(self, x):
+        x = float(x)
+        buf = self._buf
+        self._run = self._run + 1 if buf and buf[-1] == x else 1
+        if not buf:
+            self._shift = x
+        d = x - self._shift
+        if len(buf) < self.win:
+            buf.append(x)
+            self._s1 += d
+            self._s2 += d * d
+            if len(buf) == self.win:
+                self._resync()
+            return
+        e = buf.popleft() - self._shift
+        buf.append(x)
+        self._s1 += d - e
+        self._s2 += d * d - e * e
+        self._since += 1
+        if self._since >= self.win:
+            self._resync()
+
+    def _resync(self):
+        n = len(self._buf)
+        k = math.fsum(self._buf) / n
+        self._shift = k
+        self._s1 = math.fsum(v - k for v in self._buf)
+        self._s2 = math.fsum((v - k) * (v - k) for v in self._buf)
+        self._since = 0
+
+    @property
+    def ready(self):
+        return self.win >= 1 and len(self._buf) >= self.win
+
+    @property
+    def mean(self):
+        if self._run >= len(self._buf):
+            return self._buf[-1]
+        return self._shift + self._s1 / len(self._buf)
+
+    @property
+    def std(self):
+        n = len(self._buf)
+        if self._run >= n:
+            return 0.0
+        return math.sqrt(max(self._s2 - self._s1 * self._s1 / n, 0.0) / n)
+
+
+class RollingMinMax:
+    __slots__ = ("win", "_t", "_max", "_min")
+
+    def __init__(self, win):
+        self.win = int(win)
+        self._t = 0
+        self._max = deque()      # (t, x), values decreasing
+        self._min = deque()      # (t, x), values increasing
+
+    def push(self, x):
+        x = float(x)
+        t = self._t
+        mx, mn = self._max, self._min
+        while mx and mx[-1][1] <= x: mx.pop()
+        mx.append((t, x))
+        while mn and mn[-1][1] >= x: mn.pop()
+        mn.append((t, x))
+        lo = t - self.win
+        if mx[0][0] <= lo: mx.popleft()
+        if mn[0][0] <= lo: mn.popleft()
+        self._t = t + 1
+
+    @property
+    def ready(self):
+        return self.win >= 1 and self._t >= self.win
+
+    @property
+    def max(self):
+        return self._max[0][1]
+
+    @property
+    def min(self):
+        return self._min[0][1]
+
+
+class RollingAbsDiffMean:
+    __slots__ = ("win", "_prev", "_buf", "_sum", "_since")
+
+    def __init__(self, win):
+        self.win = int(win)
+        self._prev = None
+        self._buf = deque()
+        self._sum = 0.0
+        self._since = 0
+
+    def push(self, x):
+        x = float(x)
+        if self._prev is not None:
+            d = abs(x - self._prev)
+            self._buf.append(d)
+            self._sum += d
+            if len(self._buf) > self.win:
+                self._sum -= self._buf.popleft()
+                self._since += 1
+                if self._since >= RESYNC:
+                    self._sum = math.fsum(self._buf); self._since = 0
+        self._prev = x
+
+    @property
+    def ready(self):
+        return self.win >= 1 and len(self._buf) >= self.win
+
+    @property
+    def mean(self):
+        return self._sum / self.win
+
+
+def compare(prices, bb_win=18, k_n=9, atr_win=10):
+    """Max abs deviation of the rolling objects from myStrategy's slice helpers on `prices`."""
+    import numpy as np
+    import myStrategy as strat
+    bb, mm, atr = RollingMoments(bb_win), RollingMinMax(k_n), RollingAbsDiffMean(atr_win)
+    err = {"mean": 0.0, "std": 0.0, "max": 0.0, "min": 0.0, "atr": 0.0}
+    for i, p in enumerate(prices):
+        bb.push(p); mm.push(p); atr.push(p)
+        close = prices[:i + 1]
+        mu, sd, _, _ = strat._bb_from_close(close, win=bb_win)
+        assert (mu is None) == (not bb.ready)
+        if mu is not None:
+            err["mean"] = max(err["mean"], abs(bb.mean - mu)); err["std"] = max(err["std"], abs(bb.std - sd))
+        if len(close) >= k_n:
+            seg = close[-k_n:]
+            err["max"] = max(err["max"], abs(mm.max - float(np.max(seg))))
+            err["min"] = max(err["min"], abs(mm.min - float(np.min(seg))))
+        a = strat._atr_proxy_from_close(close, win=atr_win)
+        assert (a is None) == (not atr.ready)
+        if a is not None:
+            err["atr"] = max(err["atr"], abs(atr.mean - a))
+    return err
+
+
+def main():
+    import sys, time
+    from price_store import load_column
+    prices = load_column(sys.argv[1] if len(sys.argv) > 1 else "public.csv", "Adj Close")
+    print("max abs deviation vs slice helpers:", {k: f"{v:.2e}" for k, v in compare(prices).items()})
+    import myStrategy as strat
+    for win in (20, 200):
+        t0 = time.perf_counter()
+        for i in range(win, len(prices)):
+            strat._bb_from_close(prices[:i + 1], win=win)
+        t1 = time.perf_counter()
+        bb = RollingMoments(win)
+        for p in prices:
+            bb.push(p)
+            if bb.ready: bb.mean, bb.std
+        t2 = time.perf_counter()
+        n = len(prices)
+        print(f"  win={win:>3}: _bb_from_close {(t1 - t0) / n * 1e6:6.2f} us/bar, "
+              f"RollingMoments {(t2 - t1) / n * 1e6:6.2f} us/bar")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,36 @@
 # How to invoke this program:
-#	python rrEstimate.py SPY.csv
+#	python rrEstimate.py SPY.csv [--report]
 import sys
 import numpy as np
-import pandas as pd
 from myStrategy import myStrategy
+from price_store import load_column
+from trade_report import trades_from_actions, equity_curve
 
 # Estimate return rate over a given price vector
-def rrEstimate(priceVec):
+# (returnTrades=True also returns the executed trades, see trade_report.py for the equity curve and metrics)
+def rrEstimate(priceVec, returnTrades=False):
 	capital=1000	# Initial available capital
 	capitalOrig=capital		# original capital
 	dataCount=len(priceVec)				# day size
-	suggestedAction=np.zeros((dataCount,1))	# Vec of suggested actions
-	stockHolding=np.zeros((dataCount,1))  	# Vec of stock holdings
-	total=np.zeros((dataCount,1))	 	# Vec of total asset
-	realAction=np.zeros((dataCount,1))	# Real action, which might be different from suggested action. For instance, when the suggested action is 1 (buy) but you don't have any capital, then the real action is 0 (hold, or do nothing). 
-	# Run through each day
+	suggestedAction=np.zeros(dataCount)	# Vec of suggested actions
+	# Run through each day: only the strategy is called per day, the bookkeeping runs on the actions afterwards
 	for ic in range(dataCount):
-		currentPrice=priceVec[ic]	# current price
-		suggestedAction[ic]=myStrategy(priceVec[0:ic], currentPrice)		# Obtain the suggested action
-		# get real action by suggested action
-		if ic>0:
-			stockHolding[ic]=stockHolding[ic-1]	# The stock holding from the previous day
-		if suggestedAction[ic]==1:	# Suggested action is "buy"
-			if stockHolding[ic]==0:		# "buy" only if you don't have stock holding
-				stockHolding[ic]=capital/currentPrice # Buy stock using cash
-				capital=0	# Cash
-				realAction[ic]=1
-		elif suggestedAction[ic]==-1:	# Suggested action is "sell"
-			if stockHolding[ic]>0:		# "sell" only if you have stock holding
-				capital=stockHolding[ic]*currentPrice # Sell stock to have cash
-				stockHolding[ic]=0	# Stocking holding
-				realAction[ic]=-1
-		elif suggestedAction[ic]==0:	# No action
-			realAction[ic]=0
-		else:
-			assert False
-		total[ic]=capital+stockHolding[ic]*currentPrice	# Total asset, including stock holding and cash 
+		suggestedAction[ic]=myStrategy(priceVec[0:ic], priceVec[ic])		# Obtain the suggested action
+	# Real actions: "buy" only without stock holding, "sell" only with stock holding; one event per real action
+	trades=trades_from_actions(priceVec, suggestedAction, capital)
+	total=equity_curve(priceVec, trades, capital)[2]	# Total asset per day, including stock holding and cash
 	returnRate=(total[-1].item()-capitalOrig)/capitalOrig		# Return rate of this run
+	if returnTrades:
+		return returnRate, trades
 	return returnRate
 
 if __name__=='__main__':
 	file=sys.argv[1];	# input file
-	df=pd.read_csv(file)
-	priceVec=df["Adj Close"].values	# Get adj close as the price vector
-	rr=rrEstimate(priceVec)	# Compute return rate
-	print("rr=%f%%" %(rr*100))
\ No newline at end of file
+	priceVec=load_column(file, "Adj Close")	# Get adj close as the price vector (binary cache after the first run)
+	if "--report" in sys.argv[2:]:
+		from trade_report import summary, format_summary
+		rr, trades=rrEstimate(priceVec, returnTrades=True)
+		print(format_summary(summary(priceVec, trades)))
+	else:
+		rr=rrEstimate(priceVec)	# Compute return rate
+		print("rr=%f%%" %(rr*100))
@@ -0,0 +1,324 @@
+# search_drivers.py
+# Pluggable search drivers over a declared myStrategy parameter space.
+#  - ParamSpace: Int / Float / Choice dimensions + a repair() hook for constraints
+#    (ATR_EMA_MACD: MACD_SLOW >= MACD_FAST + 6)
+#  - Objective: rr of a params dict via fast_backtest, optionally on a prefix of the series;
+#    counts the budget in full-backtest equivalents (bars evaluated / series length)
+#  - drivers: random_search, successive_halving (prefix rungs), tpe_search (Parzen-estimator
+#    sampler), cma_search (CMA-style evolution strategy). All take a seed and are reproducible.
+#  - each driver returns a History; budget_to_reach() reports the budget spent until the
+#    best full-series rr came within 1% of a reference (the coarse-grid optimum in main()).
+#
+# Usage:
+#   python search_drivers.py public.csv [--budget 400] [--seed 0] [--space wide|grid]
+#
+import math, time, argparse
+import numpy as np
+
+import fast_backtest as fb
+
+
+# ------------------------------ space ------------------------------
+class Int:
+    def __init__(self, lo, hi, step=1):
+        self.values = list(range(lo, hi + 1, step))
+
+class Float:
+    def __init__(self, lo, hi, step):
+        k = int(round((hi - lo) / step))
+        self.values = [round(lo + i * step, 10) for i in range(k + 1)]
+
+class Choice:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class ParamSpace:
+    """
+    Every dimension is a finite ordered list of values, so each point maps to a unit cube
+    u in [0, 1]^d (index / (len-1)); drivers work in u-space and decode() back to a params dict.
+    """
+
+    def __init__(self, dims, repair=None):
+        self.dims = dict(dims)
+        self.keys = list(self.dims)
+        self._repair = repair
+
+    @property
+    def ndim(self): return len(self.keys)
+
+    def decode(self, u):
+        params = {}
+        for k, x in zip(self.keys, u):
+            vals = self.dims[k].values
+            i = int(round(float(np.clip(x, 0.0, 1.0)) * (len(vals) - 1)))
+            params[k] = vals[i]
+        return self.repair(params)
+
+    def encode(self, params):
+        u = []
+        for k in self.keys:
+            vals = self.dims[k].values
+            i = min(range(len(vals)), key=lambda j: abs(vals[j] - params[k]))
+            u.append(i / max(len(vals) - 1, 1))
+        return np.array(u)
+
+    def sample(self, rng):
+        return self.decode(rng.random(self.ndim))
+
+    def repair(self, params):
+        return self._repair(params) if self._repair else params
+
+
+def _repair_macd(params):
+    if params["MACD_SLOW"] < params["MACD_FAST"] + 6:
+        params["MACD_SLOW"] = params["MACD_FAST"] + 6
+    return params
+
+
+ATR_EMA_MACD_SPACE = ParamSpace({
+    "EMA_TREND":     Int(60, 300, 10),
+    "ATR_WIN":       Int(5, 30),
+    "ATR_SL_MULT":   Float(0.5, 3.0, 0.25),
+    "ATR_TR_MULT":   Float(0.5, 3.0, 0.25),
+    "ATR_MIN":       Choice([0.0, 1e-3]),
+    "MACD_FAST":     Int(4, 20),
+    "MACD_SLOW":     Int(10, 40),
+    "MACD_SIGNAL":   Int(3, 15),
+    "AE_CONFIRM_UP": Int(1, 3),
+    "AE_COOLDOWN":   Int(0, 5),
+    "AE_MIN_HOLD":   Int(0, 5),
+}, repair=_repair_macd)
+
+# the same values tune_atr_ema_macd_fast.coarse_grid() enumerates (23,328 points)
+ATR_EMA_MACD_GRID_SPACE = ParamSpace({
+    "EMA_TREND":     Choice([180, 200, 220]),
+    "ATR_WIN":       Choice([10, 14, 20]),
+    "ATR_SL_MULT":   Choice([1.0, 1.5, 2.0]),
+    "ATR_TR_MULT":   Choice([1.5, 2.0, 2.5]),
+    "ATR_MIN":       Choice([0.0, 1e-3]),
+    "MACD_FAST":     Choice([10, 12]),
+    "MACD_SLOW":     Choice([24, 26]),
+    "MACD_SIGNAL":   Choice([7, 9]),
+    "AE_CONFIRM_UP": Choice([1, 2]),
+    "AE_COOLDOWN":   Choice([0, 2, 3]),
+    "AE_MIN_HOLD":   Choice([0, 1, 2]),
+}, repair=_repair_macd)
+
+SPACES = {"wide": ATR_EMA_MACD_SPACE, "grid": ATR_EMA_MACD_GRID_SPACE}
+
+
+# ----------------------------- objective -----------------------------
+class Objective:
+    """rr of params on price[:n_bars]; indicator series are shared through an IndicatorMemo."""
+
+    def __init__(self, price, strategy="ATR_EMA_MACD"):
+        self.price = np.asarray(price, dtype=float)
+        self.n = len(self.price)
+        self.strategy = strategy
+        self.bars = 0                  # bars actually backtested (cache hits are free)
+        self.evals = 0
+        self.stale = 0                 # consecutive cache hits
+        self._memo = fb.IndicatorMemo(self.price)
+        self._seen = {}
+
+    @property
+    def budget(self):
+        """Spent budget in full-series backtest equivalents."""
+        return self.bars / self.n
+
+    def exhausted(self, budget):
+        """Budget spent -- or the driver keeps re-proposing cached points (converged)."""
+        return self.budget >= budget or self.stale >= 500
+
+    def __call__(self, params, n_bars=None):
+        n_bars = self.n if n_bars is None else int(min(n_bars, self.n))
+        key = (tuple(sorted(params.items())), n_bars)
+        if key in self._seen:
+            self.stale += 1
+            return self._seen[key]
+        self.stale = 0
+        _, rr = fb.run_atr_ema_macd(self.price, params, pre=self._memo.atr_ema_macd(params), end=n_bars)
+        self.bars += n_bars
+        self.evals += 1
+        self._seen[key] = rr
+        return rr
+
+
+class History:
+    """Full-series evaluations in the order a driver made them, with the budget spent so far."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = []          # (budget, rr, params)
+
+    def add(self, objective, rr, params):
+        self.rows.append((objective.budget, rr, params))
+
+    @property
+    def best(self):
+        return max(self.rows, key=lambda r: r[1]) if self.rows else (0.0, -math.inf, None)
+
+    def budget_to_reach(self, target, tol=0.01):
+        """Budget spent when the best full-series rr first got within `tol` (relative) of target."""
+        goal = target - tol * abs(target)
+        for budget, rr, _ in self.rows:
+            if rr >= goal:
+                return budget
+        return None
+
+
+# ------------------------------ drivers ------------------------------
+def random_search(space, objective, budget, seed=0):
+    rng = np.random.default_rng(seed)
+    hist = History("random")
+    while not objective.exhausted(budget):
+        p = space.sample(rng)
+        hist.add(objective, objective(p), p)
+    return hist
+
+
+def successive_halving(space, objective, budget, seed=0, n_configs=81, eta=3, min_frac=1.0 / 3.0):
+    """
+    Sample n_configs, score all on the first min_frac of the series, keep the top 1/eta,
+    score those on a longer prefix, ... until the survivors run on the full series.
+    Brackets repeat (new samples) until the budget is used. Each rung is cut to the configs
+    the remaining budget can pay for (the best ones so far), so the budget is never exceeded.
+    """
+    rng = np.random.default_rng(seed)
+    hist = History("successive_halving")
+    rungs = max(1, int(round(math.log(1.0 / min_frac, eta))) + 1)
+    while not objective.exhausted(budget):
+        configs = [space.sample(rng) for _ in range(n_configs)]
+        for r in range(rungs):
+            last = r == rungs - 1
+            n_bars = objective.n if last else int(objective.n * min_frac * eta ** r)
+            affordable = int((budget * objective.n - objective.bars) // max(n_bars, 1))
+            if affordable < 1:
+                return hist
+            configs = configs[:affordable]      # ranked by the previous rung (rung 0: random)
+            scores = [objective(p, n_bars) for p in configs]
+            if last:
+                for p, rr in zip(configs, scores):
+                    hist.add(objective, rr, p)
+                break
+            keep = max(1, len(configs) // eta)
+            order = np.argsort(scores, kind="stable")[::-1][:keep]
+            configs = [configs[i] for i in order]
+    return hist
+
+
+def tpe_search(space, objective, budget, seed=0, n_startup=20, gamma=0.25, n_candidates=32):
+    """
+    Tree-structured-Parzen-style sampler: split history into good (top gamma) / bad, fit a
+    per-dimension Gaussian KDE to each in u-space, and evaluate the candidate (drawn around
+    good points) maximising l(u) / g(u).
+    """
+    rng = np.random.default_rng(seed)
+    hist = History("tpe")
+    U, Y = [], []
+
+    def log_kde(x, pts, bw):
+        # x: (c, d), pts: (m, d) -> sum over dims of log mean_j N(x | pts_j, bw)
+        z = (x[:, None, :] - pts[None, :, :]) / bw
+        dens = np.exp(-0.5 * z * z).mean(axis=1) / bw + 1e-12
+        return np.log(dens).sum(axis=1)
+
+    while not objective.exhausted(budget):
+        if len(U) < n_startup:
+            u = rng.random(space.ndim)
+        else:
+            order = np.argsort(Y)[::-1]
+            n_good = max(2, int(math.ceil(gamma * len(Y))))
+            good, bad = np.array(U)[order[:n_good]], np.array(U)[order[n_good:]]
+            bw = max(0.05, 1.0 * len(good) ** (-1.0 / (space.ndim + 4)) * 0.3)
+            base = good[rng.integers(len(good), size=n_candidates)]
+            cand = np.clip(base + bw * rng.standard_normal(base.shape), 0.0, 1.0)
+            score = log_kde(cand, good, bw) - log_kde(cand, bad, bw)
+            u = cand[int(np.argmax(score))]
+        p = space.decode(u)
+        evals = objective.evals
+        rr = objective(p)
+        if objective.evals > evals:        # re-proposals of a seen point add no information
+            U.append(space.encode(p)); Y.append(rr)
+            hist.add(objective, rr, p)
+    return hist
+
+
+def cma_search(space, objective, budget, seed=0, sigma0=0.3, popsize=None):
+    """CMA-style ES in u-space: rank-mu covariance update + cumulative step-size adaptation."""
+    rng = np.random.default_rng(seed)
+    hist = History("cma")
+    d = space.ndim
+    lam = popsize or 4 + int(3 * math.log(d))
+    mu = lam // 2
+    w = np.log(mu + 0.5) - np.log(np.arange(1, mu + 1)); w /= w.sum()
+    mueff = 1.0 / np.sum(w ** 2)
+    cs = (mueff + 2) / (d + mueff + 5)
+    ds = 1 + cs + 2 * max(0.0, math.sqrt((mueff - 1) / (d + 1)) - 1)
+    cmu = min(1.0, 2 * (mueff - 2 + 1 / mueff) / ((d + 2) ** 2 + mueff))
+    chi = math.sqrt(d) * (1 - 1 / (4 * d) + 1 / (21 * d * d))
+    m = rng.random(d); sigma = sigma0
+    C = np.eye(d); ps = np.zeros(d)
+    while not objective.exhausted(budget):
+        vals, vecs = np.linalg.eigh(C)
+        B, D = vecs, np.sqrt(np.maximum(vals, 1e-20))
+        z = rng.standard_normal((lam, d))
+        y = (z * D) @ B.T
+        X = m + sigma * y
+        scores = []
+        for x in X:
+            p = space.decode(x)
+            rr = objective(p)
+            hist.add(objective, rr, p)
+            scores.append(rr)
+            if objective.exhausted(budget):
+                break
+        if len(scores) < lam:
+            break
+        idx = np.argsort(scores)[::-1][:mu]
+        y_w = w @ y[idx]
+        m = np.clip(m + sigma * y_w, 0.0, 1.0)
+        invsqrt = B @ np.diag(1.0 / D) @ B.T
+        ps = (1 - cs) * ps + math.sqrt(cs * (2 - cs) * mueff) * (invsqrt @ y_w)
+        C = (1 - cmu) * C + cmu * (y[idx].T * w) @ y[idx]
+        sigma = min(1.0, sigma * math.exp((cs / ds) * (np.linalg.norm(ps) / chi - 1)))
+    return hist
+
+
+DRIVERS = {
+    "random": random_search,
+    "successive_halving": successive_halving,
+    "tpe": tpe_search,
+    "cma": cma_search,
+}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("csv")
+    ap.add_argument("--budget", type=float, default=400.0, help="full-backtest equivalents per driver")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--space", default="wide", choices=list(SPACES),
+                    help="wide = declared ranges, grid = exactly the coarse-grid values")
+    args = ap.parse_args()
+    from price_store import load_column
+    from tune_atr_ema_macd_fast import coarse_grid
+
+    price = load_column(args.csv, "Adj Close")
+
+    t0 = time.perf_counter()
+    ref = Objective(price)
+    grid_best = max(ref(p) for p in coarse_grid())
+    print(f"coarse grid: {ref.evals} backtests, best rr={grid_best:.6f} ({time.perf_counter() - t0:.1f}s)")
+    print(f"{'driver':>20} {'best rr':>10} {'budget to 1%':>13} {'used':>8}")
+    for name, driver in DRIVERS.items():
+        obj = Objective(price)
+        hist = driver(SPACES[args.space], obj, args.budget, seed=args.seed)
+        hit = hist.budget_to_reach(grid_best)
+        hit_s = "not reached" if hit is None else f"{hit:.1f}"
+        print(f"{name:>20} {hist.best[1]:>10.6f} {hit_s:>13} {obj.budget:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# startup_bench.py
+# Startup cost of the entry points: fresh interpreter -> entry module imported -> prices loaded.
+#  - "lazy"  : the modules as they are now (price_store loader, scipy/numba/pandas deferred)
+#  - "eager" : the same, preceded by the heavy imports the entry points used to run at module
+#              top, and with prices read via pandas.read_csv (the previous startup path)
+#  - heavy packages actually loaded are taken from `python -X importtime` (stderr)
+#
+# Usage:
+#   python startup_bench.py [--repeat 5]
+#   python startup_bench.py --dir ../HW4 --repeat 5        # HW4 rrEstimateOpen
+#
+import os, sys, time, argparse, statistics, subprocess
+
+HEAVY = ("pandas", "scipy", "numba")
+
+# entry module -> (heavy imports it used to do eagerly, price file, loader kind)
+ENTRIES = {
+    "rrEstimate":                  ("import pandas", "public.csv", "csv"),
+    "bestParamByExhaustiveSearch": ("import pandas", "public.csv", "csv"),
+    "tune_atr_ema_macd_fast":      ("import pandas", "public.csv", "csv"),
+    "sweep":                       ("import scipy.signal, numba", "public.csv", "csv"),
+    "auto_tune_atr_ema_macd":      ("import pandas, scipy.signal, numba", "public.csv", "csv"),
+    "auto_tune_bb_kd":             ("import pandas, scipy.signal, numba", "public.csv", "csv"),
+}
+HW4_ENTRIES = {
+    "rrEstimateOpen":              ("import pandas", "priceMat0992.txt", "matrix"),
+}
+
+_LAZY = """
+import time; t0 = time.perf_counter()
+import {mod}
+t1 = time.perf_counter()
+from price_store import load_columns
+load_columns({path!r}, {kind!r})
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+"""
+
+_EAGER = """
+import time; t0 = time.perf_counter()
+{heavy}
+import {mod}
+t1 = time.perf_counter()
+import pandas as pd
+pd.read_csv({path!r}, **({{}} if {kind!r} == "csv" else dict(sep=r"\\s+", header=None)))
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+"""
+
+
+def _run(code, cwd):
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd,
+                         capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - t0
+    imp, load = map(float, out.stdout.split())
+    loaded = set()
+    for line in out.stderr.splitlines():
+        name = line.rsplit("|", 1)[-1].strip()
+        if name.split(".")[0] in HEAVY:
+            loaded.add(name.split(".")[0])
+    return wall, imp, load, loaded
+
+
+def bench(entries, cwd, repeat):
+    print(f"{'entry point':>28} {'mode':>6} {'process':>9} {'import':>9} {'load':>9}  heavy modules")
+    for mod, (heavy, path, kind) in entries.items():
+        for mode, code in (("eager", _EAGER.format(heavy=heavy, mod=mod, path=path, kind=kind)),
+                           ("lazy", _LAZY.format(mod=mod, path=path, kind=kind))):
+            runs = [_run(code, cwd) for _ in range(repeat)]
+            wall, imp, load = (statistics.median(r[i] for r in runs) for i in range(3))
+            loaded = ",".join(sorted(runs[-1][3])) or "-"
+            print(f"{mod:>28} {mode:>6} {wall * 1e3:7.0f}ms {imp * 1e3:7.0f}ms {load * 1e3:7.1f}ms  {loaded}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5, help="median over N fresh interpreters")
+    ap.add_argument("--dir", default=None, help="directory holding HW4's rrEstimateOpen.py")
+    args = ap.parse_args()
+    here = os.path.dirname(os.path.abspath(__file__))
+    if args.dir:
+        bench(HW4_ENTRIES, os.path.abspath(args.dir), args.repeat)
+    else:
+        bench(ENTRIES, here, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# strategy_service.py
+# Long-lived strategy process: prices come in one tick at a time, actions go out.
+#  - state is O(max window): bar_engine.StreamingStrategy (ring buffer of required_window()
+#    prices + the O(1) rolling indicators), never the full price history
+#  - sources: stdin (one price per line), a TCP socket (--listen host:port, one independent
+#    strategy per connection, same line protocol) or an in-process queue (serve_queue)
+#  - line protocol: "<price>" -> "<action>" (1 buy, -1 sell, 0 hold); "reset" starts a new run;
+#    "stats" -> one "# ..." latency line; blank lines and lines starting with "#" are ignored;
+#    a line that is not a finite price -> "# error: ..." and the strategy is not stepped
+#  - per-tick latency (strategy step, and whole tick: parse + step + write) goes into a
+#    fixed log-bucket histogram -> p50/p99/max in O(1) memory however long the stream runs
+#  - replay: feeds public.csv through the service (in-process queue, or --pipe through a
+#    child process's stdin/stdout) and checks every action and the return rate against
+#    rrEstimate's myStrategy(priceVec[0:ic], priceVec[ic]) calls
+#
+# Usage:
+#   python strategy_service.py serve [--strategy BB_KD] [--param MACD_FAST=12 ...] < prices.txt
+#   python strategy_service.py serve --listen 127.0.0.1:9009
+#   python strategy_service.py replay public.csv [--strategy both] [--pipe] [--repeat 4]
+#
+import sys, math, time, argparse
+
+import bar_engine as be
+
+BUCKETS_PER_OCTAVE = 16          # latency histogram resolution: 2**(1/16) -> ~4.4% per bucket
+_MAX_BUCKET = 40 * BUCKETS_PER_OCTAVE   # 2**40 ns ~ 18 min; anything slower lands in the last bucket
+
+
+class LatencyStats:
+    """Streaming latency summary: count / mean / max exactly, percentiles from a log histogram."""
+    __slots__ = ("count", "total", "max", "_hist")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self._hist = [0] * (_MAX_BUCKET + 1)
+
+    def add(self, ns):
+        self.count += 1
+        self.total += ns
+        if ns > self.max: self.max = ns
+        b = int(math.log2(ns) * BUCKETS_PER_OCTAVE) if ns > 1 else 0
+        self._hist[min(b, _MAX_BUCKET)] += 1
+
+    def percentile(self, q):
+        """Approximate q-quantile in ns (geometric middle of the bucket holding it)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1) + 1
+        seen = 0
+        for b, n in enumerate(self._hist):
+            seen += n
+            if seen >= rank:
+                return min(2.0 ** ((b + 0.5) / BUCKETS_PER_OCTAVE), float(self.max))
+        return float(self.max)
+
+    def summary(self, label):
+        if self.count == 0:
+            return f"{label}: no ticks"
+        return (f"{label}: n={self.count} mean={self.total / self.count / 1e3:.2f}us "
+                f"p50={self.percentile(0.50) / 1e3:.2f}us p99={self.percentile(0.99) / 1e3:.2f}us "
+                f"max={self.max / 1e3:.2f}us")
+
+
+class StrategyService:
+    """One strategy run fed tick by tick, with latency accounting."""
+
+    def __init__(self, strategy=None, **params):
+        self.strategy_name = strategy
+        self.params = params
+        self.step_latency = LatencyStats()
+        self.tick_latency = LatencyStats()
+        self.reset()
+
+    def reset(self):
+        self.engine = be.StreamingStrategy(self.strategy_name, **self.params)
+
+    def on_tick(self, price):
+        t0 = time.perf_counter_ns()
+        action = self.engine.on_bar(price)
+        self.step_latency.add(time.perf_counter_ns() - t0)
+        return action
+
+    def handle_line(self, line):
+        """One protocol line -> reply line (without newline) or None."""
+        line = line.strip()
+        if not line or line.startswith("#"):
+            return None
+        if line == "reset":
+            self.reset()
+            return None
+        if line == "stats":
+            return "# " + self.summary()
+        try:
+            price = float(line)
+        except ValueError:
+            return f"# error: not a price: {line[:40]!r}"
+        if not math.isfinite(price):
+            return f"# error: not a finite price: {line[:40]!r}"
+        return str(self.on_tick(price))
+
+    def summary(self):
+        return self.step_latency.summary("step") + " | " + self.tick_latency.summary("tick")
+
+
+# ------------------------------ sources ------------------------------
+def serve_lines(service, lines, write, flush=None):
+    """Line protocol over any iterable of lines; tick latency covers parse + step + write."""
+    for line in lines:
+        t0 = time.perf_counter_ns()
+        reply = service.handle_line(line)
+        if reply is None:
+            continue
+        write(reply + "\n")
+        if flush is not None: flush()
+        if reply[0] != "#":
+            service.tick_latency.add(time.perf_counter_ns() - t0)
+    return service
+
+
+def serve_stdin(service):
+    serve_lines(service, sys.stdin, sys.stdout.write, sys.stdout.flush)
+    print("# " + service.summary(), file=sys.stderr)
+
+
+def serve_queue(in_q, out_q, strategy=None, **params):
+    """
+    Queue source: floats in, actions out; None ends the stream, the string "reset" starts a new
+    run. Works with queue.Queue (thread) and multiprocessing.Queue (process). Returns the service.
+    """
+    service = StrategyService(strategy, **params)
+    while True:
+        item = in_q.get()
+        if item is None:
+            break
+        if isinstance(item, str) and item == "reset":
+            service.reset()
+            continue
+        t0 = time.perf_counter_ns()
+        out_q.put(service.on_tick(item))
+        service.tick_latency.add(time.perf_counter_ns() - t0)
+    return service
+
+
+def serve_socket(host, port, strategy=None, **params):
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            service = StrategyService(strategy, **params)
+            # undecodable bytes become U+FFFD, so the line gets the normal "# error" reply
+            serve_lines(service, (raw.decode("ascii", errors="replace") for raw in self.rfile),
+                        lambda text: self.wfile.write(text.encode("ascii", errors="backslashreplace")))
+            print(f"# {self.client_address[0]}:{self.client_address[1]} {service.summary()}", file=sys.stderr)
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    with socketserver.ThreadingTCPServer((host, port), Handler) as server:
+        print(f"# listening on {host}:{port}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+# ------------------------------ replay harness ------------------------------
+def reference_actions(priceVec, strategy):
+    """rrEstimate's call sequence: myStrategy(priceVec[0:ic], priceVec[ic]) for every day."""
+    import myStrategy as strat
+    import rrEstimate
+    saved = strat.STRATEGY
+    strat.STRATEGY = strategy
+    try:
+        return be.slice_actions(priceVec), rrEstimate.rrEstimate(priceVec)
+    finally:
+        strat.STRATEGY = saved
+
+
+def replay_queue(priceVec, strategy):
+    """Feed the prices through serve_queue running in a thread; (actions, service)."""
+    import queue, threading
+    in_q, out_q = queue.Queue(), queue.Queue()
+    done = {}
+    worker = threading.Thread(target=lambda: done.setdefault("svc", serve_queue(in_q, out_q, strategy)))
+    worker.start()
+    actions = []
+    for p in priceVec:                  # lock-step: one tick in flight, like a live feed
+        in_q.put(float(p))
+        actions.append(out_q.get())
+    in_q.put(None)
+    worker.join()
+    return actions, done["svc"]
+
+
+def replay_pipe(priceVec, strategy):
+    """Feed the prices to a child `serve` process over stdin; (actions, child's stats line)."""
+    import subprocess
+    cmd = [sys.executable, __file__, "serve", "--strategy", strategy]
+    child = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             text=True, bufsize=1)
+    actions = []
+    for p in priceVec:                  # repr(float) round-trips exactly
+        child.stdin.write(repr(float(p)) + "\n")
+        child.stdin.flush()
+        actions.append(int(child.stdout.readline()))
+    child.stdin.close()
+    err = child.stderr.read()
+    child.wait()
+    return actions, err.strip()
+
+
+def _state_growth(priceVec, strategy):
+    """Traced allocation growth of a live service between the middle and the end of the stream."""
+    import tracemalloc
+    service = StrategyService(strategy)
+    half = len(priceVec) // 2
+    tracemalloc.start()
+    for p in priceVec[:half]:
+        service.on_tick(float(p))
+    mid = tracemalloc.get_traced_memory()[0]
+    for p in priceVec[half:]:
+        service.on_tick(float(p))
+    end = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return end - mid
+
+
+def replay(priceVec, strategy, pipe=False):
+    import numpy as np
+    t0 = time.perf_counter()
+    ref, rr_ref = reference_actions(priceVec, strategy)
+    t1 = time.perf_counter()
+    if pipe:
+        actions, stats = replay_pipe(priceVec, strategy)
+    else:
+        actions, service = replay_queue(priceVec, strategy)
+        stats = "# " + service.summary()
+    t2 = time.perf_counter()
+    actions = np.asarray(actions, dtype=int)
+    rr = be.rr_from_actions(priceVec, actions)
+    same = bool(np.array_equal(actions, ref))
+    print(f"{strategy}: {len(priceVec)} ticks via {'stdin pipe' if pipe else 'queue'} in {t2 - t1:.2f}s "
+          f"(rrEstimate reference {t1 - t0:.2f}s)")
+    print(f"  identical actions: {same} ({int(np.count_nonzero(actions))} non-hold)  "
+          f"rr={rr * 100:f}% rrEstimate={rr_ref * 100:f}%")
+    print(f"  {stats.lstrip('# ')}")
+    print(f"  window={be.StreamingStrategy(strategy).ring.capacity} prices, "
+          f"state growth over the second half of the stream: {_state_growth(priceVec, strategy)} bytes")
+    return same and abs(rr - rr_ref) < 1e-12
+
+
+def _parse_params(items):
+    params = {}
+    for item in items:
+        k, v = item.split("=", 1)
+        params[k] = float(v) if any(c in v for c in ".eE") else int(v)
+    return params
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("serve", help="run the service on stdin/stdout or a TCP socket")
+    sp.add_argument("--strategy", default=None, help="BB_KD or ATR_EMA_MACD (default: myStrategy.STRATEGY)")
+    sp.add_argument("--param", action="append", default=[], help="KNOB=value, repeatable")
+    sp.add_argument("--listen", default=None, help="host:port")
+    rp = sub.add_parser("replay", help="replay a price CSV through the service and check vs rrEstimate")
+    rp.add_argument("csv")
+    rp.add_argument("--strategy", default="both", help="BB_KD, ATR_EMA_MACD or both")
+    rp.add_argument("--pipe", action="store_true", help="go through a child process's stdin/stdout")
+    rp.add_argument("--repeat", type=int, default=1, help="tile the return series N times")
+    args = ap.parse_args()
+
+    if args.cmd == "serve":
+        params = _parse_params(args.param)
+        if args.listen:
+            host, port = args.listen.rsplit(":", 1)
+            serve_socket(host, int(port), args.strategy, **params)
+        else:
+            serve_stdin(StrategyService(args.strategy, **params))
+        return
+
+    from price_store import load_column
+    priceVec = load_column(args.csv, "Adj Close")
+    if args.repeat > 1:
+        import numpy as np
+        rets = priceVec[1:] / priceVec[:-1]
+        priceVec = priceVec[0] * np.concatenate([[1.0], np.cumprod(np.tile(rets, args.repeat))])
+    names = ["ATR_EMA_MACD", "BB_KD"] if args.strategy == "both" else [args.strategy]
+    ok = all([replay(priceVec, name, args.pipe) for name in names])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+# sweep.py
+# In-process, parallel parameter sweep for myStrategy (no subprocess per combo, no source patching).
+#  - the CSV is read once; prices are placed in a shared-memory block that every worker maps
+#    zero-copy (multiprocessing.shared_memory)
+#  - parameters are passed explicitly to fast_backtest (never through myStrategy's module globals)
+#  - the grid is fanned out over a process pool in chunks; results are streamed to a CSV
+#    results table as they arrive
+#  - each worker keeps a fast_backtest.IndicatorMemo: every distinct indicator series (per
+#    unique EMA / MACD / ATR / BB / KD parameter subset) is computed once and only the state
+#    machine reruns per combo; the sweep reports how many indicator computations that avoided
+#  - prune=True: a backtest is aborted as soon as its equity times the best growth still
+#    achievable (fast_backtest.suffix_growth) falls below the incumbent best; the incumbent is
+#    shared with the workers, the argmax is the same as the exhaustive grid's, and the sweep
+#    reports the evaluations and bars skipped. Pruned combos have an empty rr in the table.
+#  - checkpoint=path: the grid is a deterministic enumeration (combo index = position in
+#    grid order); the set of finished indices (bitmap), the best result and the counters are
+#    saved atomically every few seconds and on interrupt. A rerun with the same data, strategy
+#    and grid resumes where it stopped (the results table is trimmed to the checkpointed rows
+#    and appended to); the checkpoint is removed once the sweep completes.
+#  - on_progress gets a live line: done/total, evals/s (overall and recent), ETA and the busy
+#    share of every worker process.
+#
+# Usage:
+#   python sweep.py public.csv --strategy BB_KD --out results.csv [--workers 8] [--prune]
+#   python sweep.py public.csv --checkpoint sweep.ckpt.json     # Ctrl-C, rerun -> resumes
+#
+import io, os, sys, csv, json, time, base64, hashlib, argparse, itertools
+from multiprocessing import Pool, RawValue, shared_memory
+import numpy as np
+
+import fast_backtest as fb
+
+
+def grid(space, constraint=None):
+    """Cartesian product of {name: [values]} in declaration order, optionally filtered."""
+    keys = list(space)
+    for values in itertools.product(*(space[k] for k in keys)):
+        params = dict(zip(keys, values))
+        if constraint is None or constraint(params):
+            yield params
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ------------------------------ workers ------------------------------
+_W = {}
+
+
+def _init_worker(shm_name, n, strategy, fixed, incumbent=None):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _W["shm"] = shm                      # keep the mapping alive for the worker's lifetime
+    _W["price"] = np.ndarray((n,), dtype=np.float64, buffer=shm.buf)
+    _W["strategy"] = strategy
+    _W["fixed"] = fixed
+    _W["memo"] = fb.IndicatorMemo(_W["price"])
+    _W["incumbent"] = incumbent          # RawValue: best rr seen by the parent (prune mode)
+    _W["growth"] = fb.suffix_growth(_W["price"]) if incumbent is not None else None
+    _W["best"] = -np.inf                 # best rr this worker has computed itself
+
+
+def _eval_chunk(chunk):
+    """(rows, indicators computed, naive indicator count, pruned evals, bars skipped, pid, busy s)."""
+    t0 = time.perf_counter()
+    price, strategy, fixed, memo = _W["price"], _W["strategy"], _W["fixed"], _W["memo"]
+    growth, incumbent = _W["growth"], _W["incumbent"]
+    computed, naive = memo.computed, memo.naive
+    out = []
+    pruned = skipped = 0
+    for idx, params in chunk:
+        full = {**fixed, **params}
+        pre = memo.indicators(full, strategy)
+        if growth is None:
+            _, rr = fb.run_backtest(price, full, strategy, pre=pre)
+        else:
+            best = max(incumbent.value, _W["best"])
+            actions, rr = fb.run_backtest(price, full, strategy, pre=pre, growth=growth, best_rr=best)
+            if rr is None:
+                pruned += 1; skipped += len(price) - len(actions)
+            elif rr > _W["best"]:
+                _W["best"] = rr
+        out.append((idx, params, rr))
+    return (out, memo.computed - computed, memo.naive - naive, pruned, skipped,
+            os.getpid(), time.perf_counter() - t0)
+
+
+# ------------------------------ driver ------------------------------
+class ResultsTable:
+    """
+    Append-only CSV results table (one row per evaluated combo). keep=set of combo indices:
+    resume an existing table, keeping only those rows (the ones a checkpoint covers).
+    """
+
+    def __init__(self, path, keys, keep=None):
+        self.keys = list(keys)
+        self._fh = None
+        self._w = None
+        if not path:
+            return
+        rows = []
+        if keep and os.path.exists(path):
+            with open(path, newline="", encoding="utf-8") as fh:
+                rows = [r for r in itertools.islice(csv.reader(fh), 1, None) if r and int(r[0]) in keep]
+        # header + kept rows are swapped in atomically: a crash here leaves the old table intact
+        buf = io.StringIO(newline="")
+        w = csv.writer(buf)
+        w.writerow(["idx", *self.keys, "rr"])
+        w.writerows(rows)
+        write_text_atomic(path, buf.getvalue(), newline="")
+        self._fh = open(path, "a", newline="", encoding="utf-8")
+        self._w = csv.writer(self._fh)
+
+    def add(self, idx, params, rr):
+        if self._w:
+            self._w.writerow([idx, *(params[k] for k in self.keys), "" if rr is None else repr(rr)])
+
+    def flush(self):
+        if self._fh: self._fh.flush()
+
+    def close(self):
+        if self._fh: self._fh.close()
+
+
+class Checkpoint:
+    """
+    Resumable sweep state in a JSON file: a bitmap of finished combo indices, the best combo,
+    and the counters. `key` ties it to one (data, strategy, fixed knobs, grid, prune) job.
+    """
+
+    def __init__(self, path, price, strategy, fixed, combos, prune):
+        self.path = str(path)
+        h = hashlib.sha256()
+        h.update(np.ascontiguousarray(price, dtype=np.float64).tobytes())
+        h.update(json.dumps([strategy, fixed, combos, bool(prune)], sort_keys=True, default=str).encode("utf-8"))
+        self.key = h.hexdigest()[:32]
+        self.total = len(combos)
+
+    def load(self):
+        """Saved state dict for this job, or None (missing file, or a different job)."""
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if state.get("key") != self.key:
+            return None
+        bits = np.unpackbits(np.frombuffer(base64.b64decode(state["done"]), dtype=np.uint8))
+        state["done"] = bits[:self.total].astype(bool)
+        return state
+
+    def save(self, done, **state):
+        import tempfile
+        state = dict(state, key=self.key, total=self.total, finished=int(done.sum()),
+                     done=base64.b64encode(np.packbits(done).tobytes()).decode("ascii"),
+                     saved_at=time.time())
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".",
+                                   dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(state, fh)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp): os.unlink(tmp)
+            raise
+
+    def remove(self):
+        if os.path.exists(self.path): os.unlink(self.path)
+
+
+class Progress:
+    """Throughput / ETA / per-worker utilization of a running sweep."""
+
+    def __init__(self, total, done=0, window=10.0):
+        self.total = total
+        self.done = done
+        self.start_done = done
+        self.t0 = time.perf_counter()
+        self.window = window
+        self.busy = {}                   # worker pid -> seconds spent evaluating
+        self._marks = [(self.t0, done)]
+
+    def update(self, n, pid, busy):
+        self.done += n
+        self.busy[pid] = self.busy.get(pid, 0.0) + busy
+        now = time.perf_counter()
+        self._marks.append((now, self.done))
+        while len(self._marks) > 2 and now - self._marks[0][0] > self.window:
+            self._marks.pop(0)
+
+    def rates(self):
+        """(overall evals/s since start, recent evals/s over the last `window` seconds)."""
+        now = time.perf_counter()
+        overall = (self.done - self.start_done) / max(now - self.t0, 1e-9)
+        (t_a, d_a) = self._marks[0]
+        recent = (self.done - d_a) / max(now - t_a, 1e-9)
+        return overall, recent
+
+    def line(self):
+        overall, recent = self.rates()
+        left = self.total - self.done
+        eta = left / recent if recent > 0 else float("inf")
+        wall = max(time.perf_counter() - self.t0, 1e-9)
+        util = " ".join(f"{b / wall:.0%}" for _, b in sorted(self.busy.items()))
+        return (f"{self.done}/{self.total} ({self.done / max(self.total, 1):.1%}) "
+                f"{overall:.0f} evals/s (recent {recent:.0f}) ETA {_fmt_secs(eta)} "
+                f"workers[{len(self.busy)}] busy: {util or '-'}")
+
+
+def _fmt_secs(sec):
+    if not np.isfinite(sec): return "?"
+    sec = int(sec)
+    return f"{sec // 3600}h{sec // 60 % 60:02d}m{sec % 60:02d}s" if sec >= 3600 else f"{sec // 60}m{sec % 60:02d}s"
+
+
+def run_sweep(price, combos, strategy="ATR_EMA_MACD", fixed=None, workers=None,
+              results_path=None, chunksize=64, on_best=None, stats=None, prune=False,
+              checkpoint=None, checkpoint_every=5.0, on_progress=None, progress_every=5.0):
+    """
+    Evaluate every params dict in `combos` on `price`. `fixed` fills in the knobs the grid
+    does not vary (defaults: myStrategy's current values). Returns (best_params, best_rr, count).
+    Ties keep the earliest combo in grid order, like the original nested loops.
+    If `stats` is a dict it receives the indicator counts: "indicators_computed" and
+    "indicators_naive" (what one indicator pass per combo would have computed).
+    prune=True aborts combos that can no longer beat the incumbent (rr=None in the table, same
+    argmax); stats then also gets "pruned", "bars_skipped" and "bars_total".
+    checkpoint=path saves progress every `checkpoint_every` seconds and resumes from it (stats
+    gets "resumed": the number of combos taken from the checkpoint). on_progress(line) is
+    called every `progress_every` seconds and once at the end.
+    """
+    price = np.ascontiguousarray(price, dtype=np.float64)
+    fixed = dict(fb.default_params(strategy) if fixed is None else fixed)
+    combos = list(combos)
+    done = np.zeros(len(combos), dtype=bool)
+    best, best_rr, best_idx, count = None, -np.inf, -1, 0
+    n_computed = n_naive = n_pruned = n_skipped = 0
+    ckpt = Checkpoint(checkpoint, price, strategy, fixed, combos, prune) if checkpoint else None
+    state = ckpt.load() if ckpt else None
+    if state is not None:
+        done = state["done"]
+        best_idx, count = state["best_idx"], int(done.sum())
+        best_rr = state["best_rr"] if best_idx >= 0 else -np.inf
+        best = combos[best_idx] if best_idx >= 0 else None
+        n_computed, n_naive, n_pruned, n_skipped = state["counters"]
+    resumed = count
+    table = ResultsTable(results_path, combos[0].keys(),
+                         keep=set(np.flatnonzero(done).tolist()) if state else None) if combos else None
+    incumbent = RawValue("d", best_rr) if prune else None
+    progress = Progress(len(combos), count)
+    last_save = last_report = time.perf_counter()
+
+    def save():
+        ckpt.save(done, best_idx=best_idx, best_rr=(best_rr if best_idx >= 0 else None),
+                  counters=[n_computed, n_naive, n_pruned, n_skipped])
+
+    def consume(result):
+        nonlocal best, best_rr, best_idx, count, n_computed, n_naive, n_pruned, n_skipped
+        nonlocal last_save, last_report
+        rows, computed, naive, pruned, skipped, pid, busy = result
+        n_computed += computed; n_naive += naive
+        n_pruned += pruned; n_skipped += skipped
+        for idx, params, rr in rows:
+            # best -> table -> done bit: a Ctrl-C anywhere in between only means the combo is
+            # evaluated again after a resume, never that its result is lost
+            if rr is not None and (rr > best_rr or (rr == best_rr and idx < best_idx)):
+                best, best_rr, best_idx = params, rr, idx
+                if incumbent is not None: incumbent.value = best_rr
+                if on_best: on_best(params, rr)
+            table.add(idx, params, rr)
+            done[idx] = True
+            count += 1
+        table.flush()
+        progress.update(len(rows), pid, busy)
+        now = time.perf_counter()
+        if ckpt and now - last_save >= checkpoint_every:
+            save(); last_save = now
+        if on_progress and now - last_report >= progress_every:
+            on_progress(progress.line()); last_report = now
+
+    todo = ((i, c) for i, c in enumerate(combos) if not done[i])
+    tasks = _chunks(todo, chunksize)
+    try:
+        if workers == 1:
+            _W.update(price=price, strategy=strategy, fixed=fixed, memo=fb.IndicatorMemo(price),
+                      incumbent=incumbent, growth=fb.suffix_growth(price) if prune else None, best=-np.inf)
+            for chunk in tasks:
+                consume(_eval_chunk(chunk))
+        else:
+            shm = shared_memory.SharedMemory(create=True, size=max(price.nbytes, 1))
+            try:
+                np.ndarray(price.shape, dtype=np.float64, buffer=shm.buf)[:] = price
+                with Pool(workers, initializer=_init_worker,
+                          initargs=(shm.name, len(price), strategy, fixed, incumbent)) as pool:
+                    for result in pool.imap_unordered(_eval_chunk, tasks):
+                        consume(result)
+            finally:
+                shm.close(); shm.unlink()
+    except BaseException:
+        if ckpt: save()                  # interrupted: keep everything finished so far
+        if table: table.close()
+        raise
+    if table: table.close()
+    if ckpt: ckpt.remove()
+    if on_progress: on_progress(progress.line())
+    if stats is not None:
+        stats.update(indicators_computed=n_computed, indicators_naive=n_naive, resumed=resumed)
+        if prune:
+            stats.update(pruned=n_pruned, bars_skipped=n_skipped, bars_total=count * len(price))
+    return (None if best is None else {**fixed, **best}), best_rr, count
+
+
+def write_text_atomic(path, text, newline=None):
+    """Replace a file in one step (tmp file + os.replace): readers never see a half-written file."""
+    import tempfile, shutil
+    path = str(path)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline=newline) as fh:
+            fh.write(text)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)      # mkstemp creates 0600; keep the file's own permissions
+        else:
+            umask = os.umask(0); os.umask(umask)
+            os.chmod(tmp, 0o666 & ~umask)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp): os.unlink(tmp)
+        raise
+
+
+def format_indicator_stats(stats):
+    computed, naive = stats["indicators_computed"], stats["indicators_naive"]
+    return (f"indicator series: {computed} computed vs {naive} naive "
+            f"({naive - computed} avoided, {1 - computed / max(naive, 1):.1%})")
+
+
+def format_prune_stats(stats, count):
+    pruned, skipped, total = stats["pruned"], stats["bars_skipped"], stats["bars_total"]
+    return (f"pruning: {pruned}/{count} evaluations aborted early ({pruned / max(count, 1):.1%}), "
+            f"{skipped}/{total} bars skipped ({skipped / max(total, 1):.1%})")
+
+
+def load_adj_close(csv_path):
+    from price_store import load_column
+    return load_column(csv_path, "Adj Close")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("csv")
+    ap.add_argument("--strategy", default="ATR_EMA_MACD", choices=["ATR_EMA_MACD", "BB_KD"])
+    ap.add_argument("--out", default=None, help="CSV results table")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--prune", action="store_true", help="abort combos that can no longer beat the best")
+    ap.add_argument("--checkpoint", default=None, help="JSON checkpoint file (resumes if present)")
+    args = ap.parse_args()
+
+    if args.strategy == "BB_KD":
+        from auto_tune_bb_kd import SPACE, valid_params
+    else:
+        from auto_tune_atr_ema_macd import SPACE, valid_params
+    price = load_adj_close(args.csv)
+    t0 = time.perf_counter()
+    stats = {}
+    try:
+        best, rr, n = run_sweep(price, grid(SPACE, valid_params), args.strategy,
+                                workers=args.workers, results_path=args.out, stats=stats, prune=args.prune,
+                                checkpoint=args.checkpoint,
+                                on_progress=lambda line: print(line, file=sys.stderr, flush=True))
+    except KeyboardInterrupt:
+        print("interrupted" + (f"; progress saved to {args.checkpoint}, rerun to resume" if args.checkpoint else ""))
+        sys.exit(130)
+    dt = time.perf_counter() - t0
+    if stats["resumed"]: print(f"resumed from checkpoint: {stats['resumed']} combos already done")
+    print(f"evaluated {n} combos in {dt:.2f}s ({(n - stats['resumed']) / max(dt, 1e-9):.0f} evals/s)")
+    print(format_indicator_stats(stats))
+    if args.prune: print(format_prune_stats(stats, n))
+    print(f"best rr={rr:.6f} params={best}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# trade_report.py
+# Trade log, equity curve and summary metrics for rrEstimate's all-in/all-out account.
+#  - trades are a compact structured array of events (TRADE_DTYPE: bar, side, price, qty),
+#    one row per executed buy/sell; the bookkeeping visits only the bars with a non-zero
+#    suggested action, on plain floats
+#  - equity_curve rebuilds cash / holding / total for every bar from the events in NumPy
+#    (searchsorted over the event bars), bit-identical to rrEstimate's old per-bar arrays
+#  - summary: return rate, max drawdown (with peak/trough bars), annualised Sharpe of the
+#    daily equity returns, exposure (share of bars holding stock) and turnover (traded
+#    notional / mean equity), all vectorized
+#
+# Usage:
+#   rr, trades = rrEstimate.rrEstimate(priceVec, returnTrades=True)
+#   print(format_summary(summary(priceVec, trades)))
+#   python trade_report.py public.csv [--trades trades.csv] [--equity equity.csv] [--bench]
+#
+import sys, time, argparse
+import numpy as np
+
+TRADE_DTYPE = np.dtype([("bar", np.int64), ("side", np.int8), ("price", np.float64), ("qty", np.float64)])
+CAPITAL = 1000.0        # rrEstimate's initial capital
+PERIODS_PER_YEAR = 252  # daily bars
+
+
+def trades_from_actions(priceVec, actions, capital=CAPITAL):
+    """Executed trades of the suggested actions (buy only when flat, sell only when holding)."""
+    priceVec = np.asarray(priceVec, dtype=float)
+    actions = np.asarray(actions).ravel()
+    bad = ~np.isin(actions, (-1, 0, 1))
+    if bad.any():
+        raise ValueError(f"invalid action {actions[bad][0]!r} on bar {int(np.flatnonzero(bad)[0])}")
+    rows = []
+    stock = 0.0
+    for ic in np.flatnonzero(actions).tolist():
+        p = priceVec[ic]
+        if actions[ic] == 1 and stock == 0:
+            stock = capital / p; capital = 0.0
+            rows.append((ic, 1, p, stock))
+        elif actions[ic] == -1 and stock > 0:
+            capital = stock * p
+            rows.append((ic, -1, p, stock))
+            stock = 0.0
+    return np.array(rows, dtype=TRADE_DTYPE)
+
+
+def equity_curve(priceVec, trades, capital=CAPITAL):
+    """(cash, stock, total) per bar, rebuilt from the events; total[-1] gives rrEstimate's rr."""
+    priceVec = np.asarray(priceVec, dtype=float)
+    buy = trades["side"] == 1
+    cash_after = np.where(buy, 0.0, trades["qty"] * trades["price"])
+    stock_after = np.where(buy, trades["qty"], 0.0)
+    k = np.searchsorted(trades["bar"], np.arange(len(priceVec)), side="right") - 1
+    traded = k >= 0
+    k = np.maximum(k, 0)
+    cash = np.where(traded, cash_after[k] if len(trades) else 0.0, capital)
+    stock = np.where(traded, stock_after[k] if len(trades) else 0.0, 0.0)
+    return cash, stock, cash + stock * priceVec
+
+
+def max_drawdown(total):
+    """(depth as a positive fraction, peak bar, trough bar) of the largest peak-to-trough fall."""
+    if len(total) == 0:
+        return 0.0, 0, 0
+    dd = total / np.maximum.accumulate(total) - 1.0
+    trough = int(np.argmin(dd))
+    peak = int(np.argmax(total[:trough + 1]))
+    return abs(float(dd[trough])), peak, trough
+
+
+def sharpe(total, periods=PERIODS_PER_YEAR):
+    """Annualised Sharpe ratio of the bar-to-bar equity returns (zero risk-free rate)."""
+    if len(total) < 3:
+        return 0.0
+    ret = total[1:] / total[:-1] - 1.0
+    sd = ret.std(ddof=1)
+    return float(ret.mean() / sd * np.sqrt(periods)) if sd > 0 else 0.0
+
+
+def summary(priceVec, trades, capital=CAPITAL, periods=PERIODS_PER_YEAR):
+    priceVec = np.asarray(priceVec, dtype=float)
+    _, stock, total = equity_curve(priceVec, trades, capital)
+    mdd, peak, trough = max_drawdown(total)
+    notional = float(np.sum(trades["price"] * trades["qty"]))
+    return {
+        "bars": len(priceVec),
+        "rr": (float(total[-1]) - capital) / capital if len(total) else 0.0,
+        "trades": len(trades),
+        "round_trips": int(np.count_nonzero(trades["side"] == -1)),
+        "max_drawdown": mdd,
+        "drawdown_peak": peak,
+        "drawdown_trough": trough,
+        "sharpe": sharpe(total, periods),
+        "exposure": float(np.mean(stock > 0)) if len(stock) else 0.0,
+        "turnover": notional / float(total.mean()) if len(total) else 0.0,
+    }
+
+
+def format_summary(m):
+    return (f"rr={m['rr'] * 100:f}%  trades={m['trades']} ({m['round_trips']} round trips)  "
+            f"maxDD={m['max_drawdown'] * 100:.2f}% (bar {m['drawdown_peak']} -> {m['drawdown_trough']})  "
+            f"sharpe={m['sharpe']:.3f}  exposure={m['exposure'] * 100:.1f}%  turnover={m['turnover']:.2f}x")
+
+
+def write_trades(path, trades):
+    np.savetxt(path, np.column_stack([trades["bar"], trades["side"], trades["price"], trades["qty"]]),
+               fmt=["%d", "%d", "%.17g", "%.17g"], delimiter=",", header="bar,side,price,qty", comments="")
+
+
+def write_equity(path, priceVec, trades):
+    cash, stock, total = equity_curve(priceVec, trades)
+    np.savetxt(path, np.column_stack([np.arange(len(total)), priceVec, cash, stock, total]),
+               fmt=["%d", "%.17g", "%.17g", "%.17g", "%.17g"], delimiter=",",
+               header="bar,price,cash,stock,total", comments="")
+
+
+def _per_bar_bookkeeping(priceVec, actions):
+    """rrEstimate's previous per-bar loop over (n, 1) arrays, kept as the reference for --bench."""
+    capital = 1000
+    dataCount = len(priceVec)
+    suggestedAction = np.asarray(actions, dtype=float).reshape(dataCount, 1)
+    stockHolding = np.zeros((dataCount, 1))
+    total = np.zeros((dataCount, 1))
+    realAction = np.zeros((dataCount, 1))
+    for ic in range(dataCount):
+        currentPrice = priceVec[ic]
+        if ic > 0:
+            stockHolding[ic] = stockHolding[ic - 1]
+        if suggestedAction[ic] == 1:
+            if stockHolding[ic] == 0:
+                stockHolding[ic] = capital / currentPrice
+                capital = 0
+                realAction[ic] = 1
+        elif suggestedAction[ic] == -1:
+            if stockHolding[ic] > 0:
+                capital = stockHolding[ic] * currentPrice
+                stockHolding[ic] = 0
+                realAction[ic] = -1
+        total[ic] = capital + stockHolding[ic] * currentPrice
+    return total.ravel(), realAction.ravel()
+
+
+def bench(priceVec, actions, repeat=5):
+    """Bookkeeping cost only (the strategy calls are the same in both): per-bar arrays vs events."""
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        ref_total, real = _per_bar_bookkeeping(priceVec, actions)
+    t1 = time.perf_counter()
+    for _ in range(repeat):
+        trades = trades_from_actions(priceVec, actions)
+        _, _, total = equity_curve(priceVec, trades)
+    t2 = time.perf_counter()
+    same = bool(np.array_equal(total, ref_total)) and np.array_equal(trades["bar"], np.flatnonzero(real))
+    print(f"bookkeeping over {len(priceVec)} bars: per-bar (n,1) arrays {(t1 - t0) / repeat * 1e3:.2f}ms, "
+          f"events + vectorized equity {(t2 - t1) / repeat * 1e3:.2f}ms; identical equity curve: {same}")
+    return same
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("csv")
+    ap.add_argument("--trades", default=None, help="write the trade events as CSV")
+    ap.add_argument("--equity", default=None, help="write cash/stock/total per bar as CSV")
+    ap.add_argument("--bench", action="store_true", help="time and check against the per-bar bookkeeping")
+    args = ap.parse_args()
+    from price_store import load_column
+    import rrEstimate
+    priceVec = load_column(args.csv, "Adj Close")
+    rr, trades = rrEstimate.rrEstimate(priceVec, returnTrades=True)
+    print(format_summary(summary(priceVec, trades)))
+    if args.trades:
+        write_trades(args.trades, trades)
+    if args.equity:
+        write_equity(args.equity, priceVec, trades)
+    if args.bench:
+        import bar_engine as be
+        sys.exit(0 if bench(priceVec, be.run_actions(priceVec)) else 1)
+
+
+if __name__ == "__main__":
+    main()
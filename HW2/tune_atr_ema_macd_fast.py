@@ -4,41 +4,41 @@
 #
 # Usage:
 #   python tune_atr_ema_macd_fast.py public.csv
+#   python tune_atr_ema_macd_fast.py public.csv --walk-forward --train 750 --test 250 [--workers 4]
+#   (evaluations are cached in tune_cache.sqlite across runs: --cache PATH / --no-cache;
+#    walk-forward backtests are cheap enough that it only caches when --cache is given)
+# The coarse grid and every coordinate-descent pass are evaluated as one batch
+# (batch_backtest: all parameter sets advance together in a single pass over the prices).
 #
-import sys, json, random
+import sys, json, random, argparse
 from pathlib import Path
 import importlib
 import numpy as np
-import pandas as pd
 
 # ------------------------- helper: load CSV -------------------------
 def load_adj_close(csv_path: Path) -> np.ndarray:
-    df = pd.read_csv(csv_path)
-    if "Adj Close" not in df.columns:
-        raise ValueError(f'CSV must contain "Adj Close". Found: {list(df.columns)}')
-    return df["Adj Close"].astype(float).values
+    from price_store import load_column   # memory-mapped binary cache of the CSV
+    return load_column(csv_path, "Adj Close")
 
 # -------------------- in-process rr evaluator ----------------------
 def evaluate_rr(adj: np.ndarray, params: dict) -> float:
     """
-    Set myStrategy module-level constants, then run a single backtest loop
+    Run a private ATREMAMACDStrategy instance with `params` through a single backtest loop
     that mirrors rrEstimate.py's logic (full in/out). Returns decimal rr.
+    No module globals are touched, so calls are safe from threads / concurrent runs.
     """
-    import myStrategy as strat
+    from myStrategy import ATREMAMACDStrategy
 
-    # select strategy & set constants
-    strat.STRATEGY = "ATR_EMA_MACD"
-    for k, v in params.items():
-        setattr(strat, k, v)
+    strategy = ATREMAMACDStrategy(**params)
 
     capital = 1000.0
     stock = 0.0
     total = 0.0
 
-    # ensure internal states reset on first call (myStrategy already does this when len(past)==0)
+    # the instance resets its states on the first call (len(past)==0)
     for i, p in enumerate(adj):
         past = adj[:i]
-        act = strat.myStrategy(past, float(p))
+        act = strategy(past, float(p))
         if i == 0:
             total = capital
         if act == 1 and stock == 0.0:
@@ -51,6 +51,11 @@ def evaluate_rr(adj: np.ndarray, params: dict) -> float:
 
     return (total - 1000.0) / 1000.0
 
+def evaluate_many(adj: np.ndarray, params_list: list) -> list:
+    """evaluate_rr for many parameter dicts at once, in one pass over the prices (same values)."""
+    from batch_backtest import batch_rr
+    return [float(rr) for rr in batch_rr(adj, params_list, "ATR_EMA_MACD")]
+
 # ------------------------- search utilities ------------------------
 def clamp_int(x, lo, hi): return int(max(lo, min(hi, round(x))))
 
@@ -105,8 +110,12 @@ def coarse_grid():
                                                     "AE_CONFIRM_UP": cu, "AE_COOLDOWN": cd, "AE_MIN_HOLD": mh
                                                 }
 
-def coordinate_descent(adj, start_params, max_passes=5):
-    """Greedy coordinate descent with local neighborhood moves."""
+def coordinate_descent(adj, start_params, max_passes=5, evaluate_rr=evaluate_rr, evaluate_many=None):
+    """
+    Greedy coordinate descent with local neighborhood moves (evaluate_rr is pluggable).
+    With evaluate_many, each pass scores its whole neighbourhood in one batch first; the
+    candidates are then accepted in the same order, so the result is unchanged.
+    """
     best = start_params
     best_rr = evaluate_rr(adj, best)
     improved = True
@@ -114,21 +123,120 @@ def coordinate_descent(adj, start_params, max_passes=5):
     while improved and passes < max_passes:
         improved = False
         passes += 1
-        for cand in neighborhood(best):
-            rr = evaluate_rr(adj, cand)
+        cands = neighborhood(best)
+        scores = evaluate_many(adj, cands) if evaluate_many else None
+        for i, cand in enumerate(cands):
+            rr = scores[i] if scores is not None else evaluate_rr(adj, cand)
             if rr > best_rr:
                 best, best_rr = cand, rr
                 improved = True
     return best, best_rr
 
+# ---------------------- walk-forward (rolling) mode ----------------------
+# Tune on a rolling train window, score the winner on the next (out-of-sample) test window.
+# Indicator series are computed once per indicator-parameter subset over the whole history;
+# they are the strategy's state at every bar, so a window [start, end) starts from that
+# checkpoint (flat position, warm EMAs/MACD/ATR) instead of replaying from day 0.
+_WF = {}
+
+def make_folds(n, train, test, step=None):
+    """[(train_start, train_end, test_end), ...] with train_end == test_start."""
+    step = step or test
+    folds, s = [], 0
+    while s + train + test <= n:
+        folds.append((s, s + train, s + train + test))
+        s += step
+    return folds
+
+def _wf_init(adj, cache_path=None):
+    import fast_backtest as fb
+    _WF["adj"] = adj
+    _WF["memo"] = fb.IndicatorMemo(adj)
+    _WF["cache"] = None
+    if cache_path:
+        from eval_cache import EvalCache
+        _WF["cache"] = EvalCache(cache_path, adj, evaluators=(_window_rr,))
+
+def _window_rr(params, start, end):
+    import fast_backtest as fb
+    adj = _WF["adj"]
+    return fb.run_atr_ema_macd(adj, params, pre=_WF["memo"].atr_ema_macd(params), start=start, end=end)[1]
+
+def window_rr(params, start, end):
+    cache = _WF.get("cache")
+    if cache is None:
+        return _window_rr(params, start, end)
+    return cache.evaluate(params, lambda p: _window_rr(p, start, end), window=(start, end))
+
+def tune_fold(fold, max_passes=5):
+    tr0, tr1, te1 = fold
+    train = lambda adj, params: window_rr(params, tr0, tr1)
+    seed, seed_rr = None, -1e18
+    for params in coarse_grid():
+        rr = train(None, params)
+        if rr > seed_rr:
+            seed, seed_rr = params, rr
+    best, best_rr = coordinate_descent(None, seed, max_passes, evaluate_rr=train)
+    test_rr = window_rr(best, tr1, te1)
+    if _WF.get("cache") is not None:
+        _WF["cache"].flush()
+    return {"fold": fold, "params": best, "train_rr": best_rr, "test_rr": test_rr}
+
+def walk_forward(adj, train, test, step=None, workers=None, cache_path=None):
+    folds = make_folds(len(adj), train, test, step)
+    if not folds:
+        raise ValueError(f"series of {len(adj)} bars is too short for train={train} + test={test}")
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers, initializer=_wf_init, initargs=(adj, cache_path)) as pool:
+        return list(pool.map(tune_fold, folds))
+
+def print_walk_forward(results):
+    print(f"{'fold':>4} {'train':>13} {'test':>13} {'train rr':>10} {'OOS rr':>10}")
+    for i, r in enumerate(results):
+        tr0, tr1, te1 = r["fold"]
+        print(f"{i:>4} {f'[{tr0},{tr1})':>13} {f'[{tr1},{te1})':>13} {r['train_rr']:>10.4f} {r['test_rr']:>10.4f}")
+    oos = np.array([r["test_rr"] for r in results])
+    print(f"OOS: mean={oos.mean():.4f} median={np.median(oos):.4f} "
+          f"positive={np.mean(oos > 0):.0%} chained={np.prod(1.0 + oos) - 1.0:.4f}")
+    print("latest fold params (to schedule next):")
+    print(json.dumps(results[-1]["params"], indent=2))
+
 # ------------------------------ main ------------------------------
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python tune_atr_ema_macd_fast.py <csv_path>")
-        sys.exit(1)
-    csv_path = Path(sys.argv[1]).resolve()
+    ap = argparse.ArgumentParser(usage="python tune_atr_ema_macd_fast.py <csv_path> [--walk-forward ...]")
+    ap.add_argument("csv")
+    ap.add_argument("--walk-forward", action="store_true", help="rolling train/test tuning, no write-back")
+    ap.add_argument("--train", type=int, default=750)
+    ap.add_argument("--test", type=int, default=250)
+    ap.add_argument("--step", type=int, default=None, help="fold step (default: --test)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--cache", default=None, help="persistent evaluation cache (default tune_cache.sqlite)")
+    ap.add_argument("--no-cache", action="store_true")
+    args = ap.parse_args()
+    csv_path = Path(args.csv).resolve()
     adj = load_adj_close(csv_path)
 
+    if args.walk_forward:
+        cache_path = None if args.no_cache else args.cache
+        print_walk_forward(walk_forward(adj, args.train, args.test, args.step, args.workers, cache_path))
+        return
+    cache_path = None if args.no_cache else (args.cache or "tune_cache.sqlite")
+
+    # every evaluation goes through the on-disk cache: neighbours of neighbours, clamped
+    # jitters and re-runs on the same data are looked up instead of backtested
+    cache = None
+    if cache_path:
+        from eval_cache import EvalCache
+        cache = EvalCache(cache_path, adj, evaluators=(evaluate_rr, evaluate_many))
+    def evaluate(adj, params):
+        if cache is None:
+            return evaluate_rr(adj, params)
+        return cache.evaluate(params, lambda p: evaluate_rr(adj, p))
+    def evaluate_batch(adj, params_list):
+        if cache is None:
+            return evaluate_many(adj, params_list)
+        return cache.evaluate_many(params_list, lambda ps: evaluate_many(adj, ps))
+
     # Import myStrategy once
     sys.path.insert(0, str(Path.cwd()))
     importlib.invalidate_caches()
@@ -138,15 +246,15 @@ def main():
     seed = None
     seed_rr = -1e18
     tried = 0
-    for params in coarse_grid():
-        rr = evaluate_rr(adj, params)
+    grid = list(coarse_grid())
+    for params, rr in zip(grid, evaluate_batch(adj, grid)):
         tried += 1
         if rr > seed_rr:
             seed, seed_rr = params, rr
             print(f"[SEED] rr={rr:.6f} params={json.dumps(params)}")
 
     # 2) coordinate descent around the seed
-    best, best_rr = coordinate_descent(adj, seed, max_passes=5)
+    best, best_rr = coordinate_descent(adj, seed, max_passes=5, evaluate_rr=evaluate, evaluate_many=evaluate_batch)
     print("==== CD BEST ====")
     print(json.dumps(best, indent=2)); print(f"rr={best_rr:.6f}")
 
@@ -161,11 +269,15 @@ def main():
         jitter["MACD_SIGNAL"] = clamp_int(jitter["MACD_SIGNAL"] + random.choice([-1,0,1]), 2, 20)
         for k in ["ATR_SL_MULT","ATR_TR_MULT"]:
             jitter[k] = max(0.0, jitter[k] + random.choice([-0.25,0,0.25]))
-        rr = evaluate_rr(adj, jitter)
+        rr = evaluate(adj, jitter)
         if rr > best_rr:
             best, best_rr = jitter, rr
             print(f"[RESTART↑] rr={rr:.6f} params={json.dumps(jitter)}")
 
+    if cache is not None:
+        cache.close()
+        print(cache.stats())
+
     # 4) write back to myStrategy.py
     ms_path = Path("myStrategy.py")
     src = ms_path.read_text(encoding="utf-8")
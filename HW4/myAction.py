@@ -8,7 +8,6 @@ Original file is located at
 """
 
 import numpy as np
-import pandas as pd
 import math
 
 def myAction01_Sample(priceMat, rate1, rate2):
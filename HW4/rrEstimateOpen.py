@@ -1,7 +1,13 @@
+import os
 import sys
 import numpy as np
-import pandas as pd
 from myAction import *
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "HW2"))
+try:
+    from price_store import load_matrix  # shared binary price cache (HW2/price_store.py)
+except ImportError:                      # HW4 used without the sibling HW2 directory
+    def load_matrix(file):
+        return np.loadtxt(file, ndmin=2)  # plain text parse on every run, no cache
 import time
 import copy
 
@@ -84,10 +90,9 @@ if __name__ == "__main__":
 
     print("Reading %s..." % (sys.argv[1]))
     file = sys.argv[1]
-    df = pd.read_csv(file, delimiter=' ', header=None)
     transFeeRate1 = float(sys.argv[2])
     transFeeRate2 = float(sys.argv[3])
-    priceMat = df.values
+    priceMat = load_matrix(file)    # memory-mapped binary cache after the first run
 
     problem_type = 1
     print("------------Problem 1-------------")